@@ -0,0 +1,53 @@
+"""Cold-start benchmark: time to import the app and to finish startup.
+
+Each run is a fresh interpreter, as for a newly started worker:
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints seconds to import the module, then seconds until the lifespan
+# has finished starting up
+PROBE = """
+import asyncio, time
+start = time.perf_counter()
+from src.persistent_sensor_storage.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(imported - start, ready - start)
+"""
+
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    imported, ready = map(float, output.split())
+    return imported, ready
+
+
+def main(runs: int = 5):
+    results = [run_once() for _ in range(runs)]
+    for name, samples in zip(("import", "ready"), zip(*results)):
+        print(
+            f"{name:<8} median {statistics.median(samples) * 1000:7.1f} ms"
+            f"   min {min(samples) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
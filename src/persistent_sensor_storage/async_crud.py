@@ -0,0 +1,395 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from . import models, schemas
+from .cache import (
+    invalidate_async,
+    node_key,
+    peek_async,
+    read_through_async,
+    sensor_key,
+)
+from .database import reads_replica
+from .latest import get_latest_values
+from .singleflight import coalesce_async
+from .crud import (
+    NODE_COLUMNS,
+    SENSOR_COLUMNS,
+    VersionConflict,
+    bump_sensor_versions,
+    check_missed_update,
+    insert_association,
+    insert_returning,
+    latest_response,
+    new_entity_data,
+    node_columns,
+    node_dict,
+    node_dicts,
+    node_fields,
+    node_full_from_rows,
+    nodes_full_from_rows,
+    plan_attachments_bulk,
+    plan_nodes_bulk,
+    plan_sensors_bulk,
+    project_fields,
+    select_attach_targets,
+    select_attachments,
+    select_existing_ids,
+    select_existing_serials,
+    select_latest_readings,
+    select_node,
+    select_node_by_serial,
+    select_node_with_sensors,
+    select_nodes,
+    select_sensor_with_node,
+    select_sensors,
+    select_sensors_of_nodes,
+    select_version,
+    sensor_dict,
+    sensor_dicts,
+    sensor_fields,
+    sensor_node_id,
+    sensor_response,
+    update_versioned,
+)
+
+# Async counterparts of the functions in crud, running the same
+# statements on an AsyncSession.
+
+# --- Node CRUD Operations ---
+
+
+async def get_node(db: AsyncSession, node_id: str):
+    return (await db.execute(select_node(node_id))).scalars().first()
+
+
+@coalesce_async
+async def get_node_cached(db: AsyncSession, node_id: str):
+    async def load():
+        node = await get_node(db, node_id)
+        if node is None:
+            return None
+        return node_dict(node)
+    return await read_through_async(
+        node_key(node_id), load, not reads_replica(db)
+    )
+
+
+async def get_node_version(db: AsyncSession, node_id: str):
+    cached = await peek_async(node_key(node_id))
+    if cached is not None:
+        return cached["version"]
+    return (await db.execute(select_version(models.Node, node_id))).scalar()
+
+
+async def get_node_by_serial(db: AsyncSession, serial_number: str):
+    result = await db.execute(select_node_by_serial(serial_number))
+    return result.scalars().first()
+
+
+@coalesce_async
+async def get_node_with_sensors(db: AsyncSession, node_id: str):
+    rows = (await db.execute(select_node_with_sensors(node_id))).all()
+    return node_full_from_rows(rows)
+
+
+@coalesce_async
+async def get_nodes_with_sensors(
+    db: AsyncSession,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    serial_number: str = None,
+    firmware_version: str = None,
+    cursor: Optional[str] = None,
+    node_ids: Optional[List[str]] = None
+):
+    query = select_nodes(
+        offset=offset,
+        limit=limit,
+        serial_number=serial_number,
+        firmware_version=firmware_version,
+        cursor=cursor,
+        node_ids=node_ids
+    ).with_only_columns(*NODE_COLUMNS)
+    node_rows = (await db.execute(query)).all()
+    sensor_rows = []
+    if node_rows:
+        sensor_rows = (await db.execute(
+            select_sensors_of_nodes([node.id for node in node_rows])
+        )).all()
+    return nodes_full_from_rows(node_rows, sensor_rows)
+
+
+@coalesce_async
+async def get_nodes(
+    db: AsyncSession,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    serial_number: str = None,
+    firmware_version: str = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    names = node_fields(fields)
+    query = select_nodes(
+        offset=offset,
+        limit=limit,
+        serial_number=serial_number,
+        firmware_version=firmware_version,
+        cursor=cursor
+    ).with_only_columns(*node_columns(names))
+    return node_dicts(await db.execute(query), names)
+
+
+async def create_node(db: AsyncSession, node: schemas.NodeCreate):
+    row = (await db.execute(
+        insert_returning(models.Node, new_entity_data(node), NODE_COLUMNS)
+    )).one()
+    await db.commit()
+    await invalidate_async(node_key(row.id))
+    return node_dict(row)
+
+
+async def create_nodes_bulk(
+    db: AsyncSession,
+    nodes: List[schemas.NodeCreate]
+):
+    serials = {n.serial_number for n in nodes if n.serial_number}
+    existing = set()
+    if serials:
+        existing = set((await db.execute(
+            select_existing_serials(models.Node, serials)
+        )).scalars())
+
+    rows, results = plan_nodes_bulk(nodes, existing)
+    if rows:
+        await db.execute(insert(models.Node), rows)
+    await db.commit()
+    await invalidate_async(*(node_key(row['id']) for row in rows))
+    return results
+
+
+async def update_node(
+    db: AsyncSession,
+    node_id: str,
+    node_update: schemas.NodeUpdate,
+    expected_version: Optional[int] = None
+):
+    update_data = node_update.model_dump(exclude_unset=True)
+    try:
+        row = (await db.execute(
+            update_versioned(
+                models.Node, node_id, expected_version, update_data
+            ).returning(*NODE_COLUMNS)
+        )).first()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    if row is None:
+        await db.rollback()
+        version = await db.execute(select_version(models.Node, node_id))
+        check_missed_update(version.scalar(), expected_version)
+        return None
+    await db.commit()
+    await invalidate_async(node_key(node_id))
+    return node_dict(row)
+
+
+async def refresh_latest_values(db: AsyncSession, node_ids: List[str]):
+    pairs = (await db.execute(select_attachments(node_ids))).all()
+    readings = []
+    if pairs:
+        readings = (await db.execute(select_latest_readings(node_ids))).all()
+    get_latest_values().refresh(node_ids, pairs, readings)
+
+
+async def get_nodes_latest(db: AsyncSession, node_ids: List[str]):
+    stale = get_latest_values().stale(node_ids)
+    if stale:
+        await refresh_latest_values(db, stale)
+    found = get_latest_values().for_nodes(node_ids)
+    missing = [node_id for node_id in node_ids if node_id not in found]
+    if missing:
+        result = await db.execute(select_existing_ids(models.Node, missing))
+        for node_id in result.scalars():
+            found[node_id] = []
+    return [
+        latest_response(node_id, found[node_id])
+        for node_id in dict.fromkeys(node_ids)
+        if node_id in found
+    ]
+
+# --- Sensor CRUD Operations ---
+
+
+async def get_sensor(db: AsyncSession, sensor_id: str):
+    result = (await db.execute(
+        select_sensor_with_node().where(models.Sensor.id == sensor_id)
+    )).first()
+    if not result:
+        return None
+
+    sensor, node_id = result
+    return sensor_response(sensor, node_id)
+
+
+@coalesce_async
+async def get_sensor_cached(db: AsyncSession, sensor_id: str):
+    async def load():
+        sensor = await get_sensor(db, sensor_id)
+        return None if sensor is None else sensor.model_dump()
+    return await read_through_async(
+        sensor_key(sensor_id), load, not reads_replica(db)
+    )
+
+
+async def get_sensor_version(db: AsyncSession, sensor_id: str):
+    cached = await peek_async(sensor_key(sensor_id))
+    if cached is not None:
+        return cached["version"]
+    result = await db.execute(select_version(models.Sensor, sensor_id))
+    return result.scalar()
+
+
+async def get_sensor_by_serial(db: AsyncSession, serial_number: str):
+    result = (await db.execute(
+        select_sensor_with_node()
+        .where(models.Sensor.serial_number == serial_number)
+    )).first()
+    if not result:
+        return None
+
+    sensor, node_id = result
+    return sensor_response(sensor, node_id)
+
+
+@coalesce_async
+async def get_sensors(
+    db: AsyncSession,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    manufacturer: str = None,
+    model: str = None,
+    modality: str = None,
+    node_id: str = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    names = sensor_fields(fields)
+    query = select_sensors(
+        offset=offset,
+        limit=limit,
+        manufacturer=manufacturer,
+        model=model,
+        modality=modality,
+        node_id=node_id,
+        cursor=cursor,
+        names=names
+    )
+    return sensor_dicts((await db.execute(query)).all(), names)
+
+
+async def create_sensor(db: AsyncSession, sensor: schemas.SensorCreate):
+    row = (await db.execute(insert_returning(
+        models.Sensor, new_entity_data(sensor), SENSOR_COLUMNS
+    ))).one()
+    await db.commit()
+    await invalidate_async(sensor_key(row.id))
+    return sensor_dict(row, None)
+
+
+async def create_sensors_bulk(
+    db: AsyncSession,
+    sensors: List[schemas.SensorCreate]
+):
+    serials = {s.serial_number for s in sensors if s.serial_number}
+    existing = set()
+    if serials:
+        existing = set((await db.execute(
+            select_existing_serials(models.Sensor, serials)
+        )).scalars())
+
+    rows, results = plan_sensors_bulk(sensors, existing)
+    if rows:
+        await db.execute(insert(models.Sensor), rows)
+    await db.commit()
+    await invalidate_async(*(sensor_key(row['id']) for row in rows))
+    return results
+
+
+async def update_sensor(
+    db: AsyncSession,
+    sensor_id: str,
+    sensor_update: schemas.SensorUpdate,
+    expected_version: Optional[int] = None
+):
+    update_data = sensor_update.model_dump(exclude_unset=True)
+    try:
+        row = (await db.execute(
+            update_versioned(
+                models.Sensor, sensor_id, expected_version, update_data
+            ).returning(*SENSOR_COLUMNS, sensor_node_id(sensor_id))
+        )).first()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    if row is None:
+        await db.rollback()
+        version = await db.execute(select_version(models.Sensor, sensor_id))
+        check_missed_update(version.scalar(), expected_version)
+        return None
+    await db.commit()
+    await invalidate_async(sensor_key(sensor_id))
+    return sensor_dict(row, row.node_id)
+
+
+async def attach_sensor_to_node(
+    db: AsyncSession,
+    node_id: str,
+    sensor_id: str
+):
+    result = await db.execute(insert_association(node_id, sensor_id))
+    if result.rowcount != 1:
+        await db.rollback()
+        return None
+    row = (await db.execute(
+        bump_sensor_versions([sensor_id]).returning(*SENSOR_COLUMNS)
+    )).one()
+    await db.commit()
+    await invalidate_async(sensor_key(sensor_id))
+    get_latest_values().attach([(node_id, sensor_id)])
+    return sensor_dict(row, node_id)
+
+
+async def attach_sensors_bulk(
+    db: AsyncSession,
+    attachments: List[schemas.SensorAttachment]
+):
+    known_nodes = set()
+    sensors = {}
+    attached = set()
+    if attachments:
+        nodes_query, sensors_query, pairs_query = (
+            select_attach_targets(attachments)
+        )
+        known_nodes = set((await db.execute(nodes_query)).scalars())
+        sensors = {
+            s.id: s for s in (await db.execute(sensors_query)).scalars()
+        }
+        attached = {tuple(pair) for pair in await db.execute(pairs_query)}
+
+    rows, results = plan_attachments_bulk(
+        attachments, known_nodes, sensors, attached
+    )
+    if rows:
+        await db.execute(insert(models.NodeSensorAssociation), rows)
+        await db.execute(
+            bump_sensor_versions({row['sensor_id'] for row in rows})
+        )
+    await db.commit()
+    await invalidate_async(*(sensor_key(row['sensor_id']) for row in rows))
+    get_latest_values().attach(
+        (row['node_id'], row['sensor_id']) for row in rows
+    )
+    return results
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .config import CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_TTL, REDIS_URL
+
+# Read-through cache for single-entity reads. Values are plain JSON-able
+# dicts so every backend can store them; writers invalidate by key.
+#
+# Each key also has a generation that delete() bumps before dropping the
+# value. A reader notes it before loading from the database and stores
+# with set(key, value, generation), which keeps a value loaded before a
+# concurrent write out of the cache.
+
+
+def node_key(node_id: str):
+    return f"node:{node_id}"
+
+
+def sensor_key(sensor_id: str):
+    return f"sensor:{sensor_id}"
+
+
+class NullCache:
+    blocking = False
+
+    def get(self, key):
+        return None
+
+    def generation(self, key):
+        return 0
+
+    def set(self, key, value, generation=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache:
+    """In-process LRU with a per-entry time to live, in seconds."""
+
+    blocking = False
+    # Generations are striped over a fixed number of slots so they stay
+    # bounded; two keys sharing a slot only cost a skipped store.
+    generation_slots = 4096
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = [0] * self.generation_slots
+        self._lock = threading.Lock()
+
+    def _slot(self, key):
+        return hash(key) % self.generation_slots
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self, key):
+        with self._lock:
+            return self._generations[self._slot(key)]
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if (
+                generation is not None
+                and self._generations[self._slot(key)] != generation
+            ):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._generations[self._slot(key)] += 1
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Cache shared between workers through a Redis-compatible client.
+
+    Any object with redis-py's get/set(ex=)/incr/expire/delete/scan_iter
+    methods works, so a local stand-in can replace a real server.
+
+    Generations live next to the values, so a write in one worker keeps
+    loads racing it in every other worker out of the cache. They outlive
+    values by far (generation_ttl) since an expired generation reads as
+    0 again.
+    """
+
+    # Every call is a network round trip
+    blocking = True
+    generation_ttl = 3600
+
+    def __init__(self, client, ttl: float = 30.0, prefix: str = "pss:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _generation_key(self, key):
+        return f"{self.prefix}gen:{key}"
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def generation(self, key):
+        return int(self.client.get(self._generation_key(key)) or 0)
+
+    def set(self, key, value, generation=None):
+        self.client.set(
+            self.prefix + key,
+            json.dumps(value),
+            ex=max(1, int(self.ttl))
+        )
+        # Check after storing rather than before: a delete() bumping the
+        # generation after this check also drops the value just stored.
+        if generation is not None and self.generation(key) != generation:
+            self.client.delete(self.prefix + key)
+
+    def delete(self, *keys):
+        if keys:
+            for key in keys:
+                self.client.incr(self._generation_key(key))
+                self.client.expire(
+                    self._generation_key(key), self.generation_ttl
+                )
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def build_cache(backend: str = CACHE_BACKEND):
+    if backend == "none":
+        return NullCache()
+    if backend == "memory":
+        return LRUCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+    if backend == "redis":
+        # Optional dependency, only needed for the shared backend
+        import redis
+        return RedisCache(redis.Redis.from_url(REDIS_URL), ttl=CACHE_TTL)
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = build_cache()
+    return _cache
+
+
+def configure_cache(cache):
+    """Replace the process-wide cache, e.g. with a RedisCache stand-in."""
+    global _cache
+    _cache = cache
+
+
+async def _call(cache, method, *args):
+    """Run a cache method without blocking the event loop on I/O."""
+    if cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+def peek(key):
+    """Cached value for key, or None; never loads."""
+    return get_cache().get(key)
+
+
+async def peek_async(key):
+    cache = get_cache()
+    return await _call(cache, cache.get, key)
+
+
+def read_through(key, load, store: bool = True):
+    """Return the cached value for key, calling load() on a miss.
+
+    Misses (load() returning None) are not cached, and neither is
+    anything when `store` is false, e.g. for loads from a replica, or
+    when the key was invalidated while load() ran.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        generation = cache.generation(key)
+        value = load()
+        if value is not None and store:
+            cache.set(key, value, generation)
+    return value
+
+
+async def read_through_async(key, load, store: bool = True):
+    cache = get_cache()
+    value = await _call(cache, cache.get, key)
+    if value is None:
+        generation = await _call(cache, cache.generation, key)
+        value = await load()
+        if value is not None and store:
+            await _call(cache, cache.set, key, value, generation)
+    return value
+
+
+# Count of invalidations, i.e. of committed writes, in this process.
+# Coalesced reads key on it so none joins a query started before a write.
+_write_lock = threading.Lock()
+_write_generation = 0
+
+
+def write_generation():
+    return _write_generation
+
+
+def _note_write():
+    global _write_generation
+    with _write_lock:
+        _write_generation += 1
+
+
+def invalidate(*keys):
+    _note_write()
+    get_cache().delete(*keys)
+
+
+async def invalidate_async(*keys):
+    _note_write()
+    cache = get_cache()
+    await _call(cache, cache.delete, *keys)
@@ -1,5 +1,132 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 # Read database URL from environment or fallback to SQLite
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 SENTRY_DSN = os.getenv("SENTRY_DSN")
+
+# Read replicas serving the node and sensor GET routes: a comma-separated
+# list of URLs, empty to read from DATABASE_URL. REPLICA_POLICY picks one
+# per request, "round_robin" or "least_loaded" (fewest checked out
+# connections). A client that writes reads from the primary for the next
+# READ_YOUR_WRITES_SECONDS, so it sees its own writes despite replica lag.
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+REPLICA_POLICY = os.getenv("REPLICA_POLICY", "round_robin")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Serve the node and sensor routes from async handlers on an AsyncSession.
+# The async URL defaults to DATABASE_URL with an asyncio driver swapped in.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool tuning, applied to both the sync and async engines.
+# DB_POOL_RECYCLE is in seconds; -1 keeps connections indefinitely.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv(
+    "DB_POOL_PRE_PING", "true"
+).lower() in ("1", "true", "yes")
+
+# Read-through cache for single node / sensor reads: "memory" (per
+# process), "redis" (shared, needs the redis package) or "none".
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# The latest reading per sensor is served from memory. Another worker's
+# ingests and attachments only reach it when a node's entry is refreshed
+# from the database, at most LATEST_REFRESH_SECONDS after the last
+# refresh. 0 never refreshes, which is right for a single process; serve
+# turns refreshing on when it starts several workers.
+LATEST_REFRESH_SECONDS = float(os.getenv("LATEST_REFRESH_SECONDS", "0"))
+
+# Identical node and sensor reads running at the same time share one
+# query and its result instead of each sending their own.
+COALESCE_READS = os.getenv(
+    "COALESCE_READS", "true"
+).lower() in ("1", "true", "yes")
+
+# Retention windows in days; 0 keeps data forever. Raw readings are kept
+# in partitions of READINGS_PARTITION_DAYS days (Postgres) and expire
+# whole partitions at a time; each rollup resolution expires on its own.
+# The retention job runs every RETENTION_INTERVAL_SECONDS (0 disables it).
+READINGS_RETENTION_DAYS = int(os.getenv("READINGS_RETENTION_DAYS", "30"))
+# Readings stamped more than READINGS_FUTURE_SECONDS ahead of the server
+# clock are rejected, so that a device with a wrong clock cannot create
+# partitions far in the future; the margin allows for ordinary skew.
+READINGS_FUTURE_SECONDS = float(os.getenv("READINGS_FUTURE_SECONDS", "300"))
+READINGS_PARTITION_DAYS = int(os.getenv("READINGS_PARTITION_DAYS", "1"))
+ROLLUP_MINUTE_RETENTION_DAYS = int(
+    os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "90")
+)
+ROLLUP_HOUR_RETENTION_DAYS = int(
+    os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "730")
+)
+ROLLUP_DAY_RETENTION_DAYS = int(os.getenv("ROLLUP_DAY_RETENTION_DAYS", "0"))
+RETENTION_INTERVAL_SECONDS = float(
+    os.getenv("RETENTION_INTERVAL_SECONDS", "3600")
+)
+# Of the processes on a host, only the one holding this lock runs the job
+RETENTION_LOCK_FILE = os.getenv(
+    "RETENTION_LOCK_FILE",
+    os.path.join(tempfile.gettempdir(), "pss-retention.lock")
+)
+
+# Prometheus metrics on /metrics: request latency per route, SQL
+# statements per request and per verb. Statements slower than
+# SLOW_QUERY_SECONDS (0 disables) are logged, and the last
+# SLOW_QUERY_LOG_SIZE of them are listed on /metrics/slow-queries.
+METRICS_ENABLED = os.getenv(
+    "METRICS_ENABLED", "true"
+).lower() in ("1", "true", "yes")
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# With several workers, each writes its metrics to METRICS_DIR every
+# METRICS_WRITE_SECONDS, and /metrics sums those of all workers.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_WRITE_SECONDS = float(os.getenv("METRICS_WRITE_SECONDS", "5"))
+
+# Tracing. TRACES_SAMPLE_RATE of requests are traced up front (head
+# sampling, also the Sentry transaction rate). Every other request is
+# traced in process and kept anyway if it fails or takes
+# TRACE_SLOW_SECONDS or longer (tail sampling, 0 disables). The last
+# TRACE_LOG_SIZE kept traces are listed on /admin/traces.
+TRACING_ENABLED = os.getenv(
+    "TRACING_ENABLED", "true"
+).lower() in ("1", "true", "yes")
+TRACES_SAMPLE_RATE = float(os.getenv("TRACES_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "1"))
+TRACE_LOG_SIZE = int(os.getenv("TRACE_LOG_SIZE", "100"))
+
+# Profiling windows are opened on demand through /admin/profile and last
+# at most PROFILE_MAX_SECONDS. The /admin routes take ADMIN_TOKEN as a
+# bearer token and are disabled while it is unset.
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Production server (python -m src.persistent_sensor_storage.serve).
+# WEB_WORKERS=0 starts one worker per available CPU once the state the
+# workers share is out of process (CACHE_BACKEND redis or none, and
+# METRICS_DIR while metrics are on), and a single worker until then.
+# WEB_LOOP is auto, uvloop or asyncio and WEB_HTTP is auto, httptools or
+# h11; auto picks uvloop and httptools when they are installed. On
+# SIGTERM workers stop accepting connections and get
+# WEB_GRACEFUL_TIMEOUT seconds to finish the requests in flight.
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))
+WEB_LOOP = os.getenv("WEB_LOOP", "auto")
+WEB_HTTP = os.getenv("WEB_HTTP", "auto")
+WEB_PRELOAD = os.getenv(
+    "WEB_PRELOAD", "true"
+).lower() in ("1", "true", "yes")
+WEB_KEEPALIVE_SECONDS = int(os.getenv("WEB_KEEPALIVE_SECONDS", "5"))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+WEB_BACKLOG = int(os.getenv("WEB_BACKLOG", "2048"))
@@ -1,114 +1,881 @@
+from sqlalchemy import and_, func, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
+from collections import defaultdict
+from datetime import datetime
 from . import models, schemas
-import uuid
+from .cache import invalidate, node_key, peek, read_through, sensor_key
+from .database import reads_replica
+from .ids import NIL_ID, UUIDKey, new_id
+from .ingest import write_readings
+from .latest import get_latest_values
+from .partitions import ensure_partitions, start_of_day
+from .retention import readings_cutoff, readings_horizon
+from .singleflight import coalesce
+from .rollups import (
+    aggregate,
+    as_utc,
+    ceil_time,
+    floor_time,
+    rollup_resolution,
+    rollup_rows,
+    upsert_rollups,
+)
+from .pagination import decode_id_cursor
+import math
 
-# --- Node CRUD Operations ---
+# Statements and bulk planning below are shared with async_crud, which
+# executes the same SQL on an AsyncSession.
 
 
-def get_node(db: Session, node_id: str):
+class VersionConflict(Exception):
+    """The row's version is not the one the write was conditioned on."""
+
+# --- Statement Builders ---
+
+
+def select_node(node_id: str):
+    return select(models.Node).where(models.Node.id == node_id)
+
+
+def select_node_by_serial(serial_number: str):
+    return select(models.Node).where(
+        models.Node.serial_number == serial_number
+    )
+
+
+def select_nodes(
+    offset: int = 0,
+    limit: Optional[int] = None,
+    serial_number: str = None,
+    firmware_version: str = None,
+    cursor: Optional[str] = None,
+    node_ids: Optional[List[str]] = None
+):
+    query = select(models.Node)
+    if node_ids:
+        query = query.where(models.Node.id.in_(node_ids))
+    if serial_number:
+        query = query.where(models.Node.serial_number == serial_number)
+    if firmware_version:
+        query = query.where(models.Node.firmware_version == firmware_version)
+    if cursor:
+        (last_id,) = decode_id_cursor(cursor, 1)
+        query = query.where(models.Node.id > last_id)
+    query = query.order_by(models.Node.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.offset(offset)
+
+
+def select_sensor_with_node():
+    """Sensors outer-joined to their association, as (Sensor, node_id)."""
     return (
-        db.query(models.Node)
-        .filter(models.Node.id == node_id)
-        .first()
+        select(models.Sensor, models.NodeSensorAssociation.node_id)
+        .outerjoin(models.NodeSensorAssociation)
     )
 
 
-def get_node_by_serial(db: Session, serial_number: str):
+def select_sensors(
+    offset: int = 0,
+    limit: Optional[int] = None,
+    manufacturer: str = None,
+    model: str = None,
+    modality: str = None,
+    node_id: str = None,
+    cursor: Optional[str] = None,
+    names: Optional[tuple] = None
+):
+    query = (
+        select(*sensor_columns(names))
+        .select_from(models.Sensor)
+        .outerjoin(models.NodeSensorAssociation)
+    )
+
+    # Apply filters
+    if manufacturer:
+        query = query.where(models.Sensor.manufacturer == manufacturer)
+    if model:
+        query = query.where(models.Sensor.model == model)
+    if modality:
+        query = query.where(models.Sensor.modality == modality)
+    if node_id:
+        query = query.where(models.NodeSensorAssociation.node_id == node_id)
+
+    # Unattached sensors sort first, under the nil id, on every backend
+    node_order = func.coalesce(
+        models.NodeSensorAssociation.node_id, literal(NIL_ID, UUIDKey)
+    )
+    if cursor:
+        last_id, last_node_id = decode_id_cursor(cursor, 2)
+        query = query.where(
+            or_(
+                models.Sensor.id > last_id,
+                and_(models.Sensor.id == last_id, node_order > last_node_id)
+            )
+        )
+    query = query.order_by(models.Sensor.id, node_order)
+
+    # Apply pagination
+    if limit is not None:
+        query = query.limit(limit)
+    return query.offset(offset)
+
+
+def select_version(model, entity_id: str):
+    return select(model.version).where(model.id == entity_id)
+
+
+def update_versioned(
+    model, entity_id: str, version: Optional[int], values: dict
+):
+    """UPDATE bumping the row's version, optionally only at `version`.
+
+    The version is checked and bumped in the same statement, so of two
+    concurrent writers conditioned on the same version only one matches.
+    """
+    statement = update(model).where(model.id == entity_id)
+    if version is not None:
+        statement = statement.where(model.version == version)
+    return (
+        statement
+        .values(**values, version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_sensor_versions(sensor_ids):
+    # Attaching changes a sensor's node_id, so its ETag must change too
+    return (
+        update(models.Sensor)
+        .where(models.Sensor.id.in_(sensor_ids))
+        .values(version=models.Sensor.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def check_missed_update(version: Optional[int], expected_version):
+    """Raise VersionConflict for an update_versioned that matched no row.
+
+    `version` is the row's current version; None means the row does not
+    exist, which the caller reports as not found.
+    """
+    if version is not None:
+        raise VersionConflict(
+            f"Expected version {expected_version}, found {version}"
+        )
+
+
+NODE_COLUMNS = (
+    models.Node.id,
+    models.Node.serial_number,
+    models.Node.firmware_version,
+    models.Node.version,
+)
+SENSOR_COLUMNS = (
+    models.Sensor.id,
+    models.Sensor.serial_number,
+    models.Sensor.manufacturer,
+    models.Sensor.model,
+    models.Sensor.modality,
+    models.Sensor.version,
+)
+
+# Columns behind each field of a fields= parameter. Key fields identify
+# a row and carry the cursor, so they are selected and returned always.
+NODE_FIELDS = {column.key: column for column in NODE_COLUMNS}
+NODE_KEY_FIELDS = ("id",)
+SENSOR_FIELDS = {
+    **{column.key: column for column in SENSOR_COLUMNS},
+    "node_id": models.NodeSensorAssociation.node_id,
+}
+SENSOR_KEY_FIELDS = ("id", "node_id")
+
+
+def parse_fields(fields: Optional[str], available, key_fields):
+    """Field names of a comma-separated fields= parameter, keys first.
+
+    None, for no parameter, means every field. Raises ValueError for
+    names that are not fields.
+    """
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys((*key_fields, *names)))
+
+
+def node_fields(fields: Optional[str]):
+    return parse_fields(fields, NODE_FIELDS, NODE_KEY_FIELDS)
+
+
+def sensor_fields(fields: Optional[str]):
+    return parse_fields(fields, SENSOR_FIELDS, SENSOR_KEY_FIELDS)
+
+
+def node_columns(names: Optional[tuple]):
+    if names is None:
+        return NODE_COLUMNS
+    return [NODE_FIELDS[name] for name in names]
+
+
+def sensor_columns(names: Optional[tuple]):
+    """Selected columns for sensor `names`; node_id comes last if all."""
+    if names is None:
+        return (*SENSOR_COLUMNS, models.NodeSensorAssociation.node_id)
+    return [SENSOR_FIELDS[name] for name in names]
+
+
+def project_fields(data: Optional[dict], names: Optional[tuple]):
+    """Only the `names` fields of response data; all of it for None."""
+    if data is None or names is None:
+        return data
+    return {name: data[name] for name in names}
+
+
+def sensor_node_id(sensor_id: str):
+    """node_id of a sensor as a scalar subquery, for RETURNING clauses.
+
+    Bound to the id rather than correlated, as SQLite renders RETURNING
+    columns unqualified.
+    """
+    return (
+        select(models.NodeSensorAssociation.node_id)
+        .where(models.NodeSensorAssociation.sensor_id == sensor_id)
+        .limit(1)
+        .scalar_subquery()
+        .label("node_id")
+    )
+
+
+def insert_returning(model, values: dict, columns):
+    return insert(model).values(**values).returning(*columns)
+
+
+def insert_association(node_id: str, sensor_id: str):
+    """INSERT of an association, writing no row unless both ends exist."""
+    data = new_association_data(node_id, sensor_id)
+    return insert(models.NodeSensorAssociation).from_select(
+        list(data),
+        select(*(literal(value, UUIDKey) for value in data.values())).where(
+            select_existing_ids(models.Node, [node_id]).exists(),
+            select_existing_ids(models.Sensor, [sensor_id]).exists()
+        )
+    )
+
+
+def select_node_with_sensors(node_id: str):
+    """A node outer-joined to its sensors, projected to plain columns.
+
+    One round trip; sensor columns are labelled sensor_<name> and are
+    NULL on the single row of a node without sensors.
+    """
+    return (
+        select(
+            *NODE_COLUMNS,
+            *(column.label(f"sensor_{column.key}")
+              for column in SENSOR_COLUMNS)
+        )
+        .select_from(models.Node)
+        .outerjoin(
+            models.NodeSensorAssociation,
+            models.NodeSensorAssociation.node_id == models.Node.id
+        )
+        .outerjoin(
+            models.Sensor,
+            models.Sensor.id == models.NodeSensorAssociation.sensor_id
+        )
+        .where(models.Node.id == node_id)
+        .order_by(models.Sensor.id)
+    )
+
+
+def select_sensors_of_nodes(node_ids):
+    """Sensor columns plus node_id for every sensor on the given nodes."""
     return (
-        db.query(models.Node)
-        .filter(models.Node.serial_number == serial_number)
-        .first()
+        select(models.NodeSensorAssociation.node_id, *SENSOR_COLUMNS)
+        .join(
+            models.Sensor,
+            models.Sensor.id == models.NodeSensorAssociation.sensor_id
+        )
+        .where(models.NodeSensorAssociation.node_id.in_(node_ids))
+        .order_by(models.NodeSensorAssociation.node_id, models.Sensor.id)
+    )
+
+
+def select_existing_serials(model, serials):
+    return select(model.serial_number).where(
+        model.serial_number.in_(serials)
+    )
+
+
+def select_existing_ids(model, ids):
+    return select(model.id).where(model.id.in_(ids))
+
+
+def select_readings(sensor_ids, ranges):
+    """Raw readings of the sensors within any of the [start, end) ranges."""
+    return select(
+        models.Reading.sensor_id,
+        models.Reading.timestamp,
+        models.Reading.value
+    ).where(
+        models.Reading.sensor_id.in_(sensor_ids),
+        or_(*(
+            and_(
+                models.Reading.timestamp >= start,
+                models.Reading.timestamp < end
+            )
+            for start, end in ranges
+        ))
     )
 
 
+def select_attachments(node_ids=None):
+    """(node_id, sensor_id) of every attachment, or of the given nodes."""
+    query = select(
+        models.NodeSensorAssociation.node_id,
+        models.NodeSensorAssociation.sensor_id
+    )
+    if node_ids is not None:
+        query = query.where(models.NodeSensorAssociation.node_id.in_(node_ids))
+    return query
+
+
+def select_latest_readings(node_ids=None):
+    """The newest reading of every sensor that has one.
+
+    Limited to the sensors attached to `node_ids` if given. The newest
+    timestamp per sensor is a lookup on the (sensor_id, timestamp)
+    primary key, so this does not scan the readings.
+    """
+    newest = (
+        select(func.max(models.Reading.timestamp))
+        .where(models.Reading.sensor_id == models.Sensor.id)
+        .scalar_subquery()
+    )
+    latest = select(
+        models.Sensor.id.label("sensor_id"),
+        newest.label("timestamp")
+    )
+    if node_ids is not None:
+        latest = latest.where(models.Sensor.id.in_(
+            select_attachments(node_ids)
+            .with_only_columns(models.NodeSensorAssociation.sensor_id)
+        ))
+    latest = latest.subquery()
+    return select(
+        models.Reading.sensor_id,
+        models.Reading.timestamp,
+        models.Reading.value
+    ).join(latest, and_(
+        models.Reading.sensor_id == latest.c.sensor_id,
+        models.Reading.timestamp == latest.c.timestamp
+    ))
+
+
+def select_rollups(sensor_ids, resolution: int, start, end):
+    return select(
+        models.ReadingRollup.sensor_id,
+        models.ReadingRollup.bucket,
+        models.ReadingRollup.count,
+        models.ReadingRollup.total,
+        models.ReadingRollup.minimum,
+        models.ReadingRollup.maximum
+    ).where(
+        models.ReadingRollup.sensor_id.in_(sensor_ids),
+        models.ReadingRollup.resolution == resolution,
+        models.ReadingRollup.bucket >= start,
+        models.ReadingRollup.bucket < end
+    )
+
+
+def select_attach_targets(attachments: List[schemas.SensorAttachment]):
+    """Set-based existence checks for attach_sensors_bulk.
+
+    Returns statements for known node ids, candidate sensors and the
+    (node_id, sensor_id) pairs that are already attached.
+    """
+    node_ids = {a.node_id for a in attachments}
+    sensor_ids = {a.sensor_id for a in attachments}
+    return (
+        select(models.Node.id).where(models.Node.id.in_(node_ids)),
+        select(models.Sensor).where(models.Sensor.id.in_(sensor_ids)),
+        select(
+            models.NodeSensorAssociation.node_id,
+            models.NodeSensorAssociation.sensor_id
+        ).where(models.NodeSensorAssociation.sensor_id.in_(sensor_ids))
+    )
+
+# --- Row Building ---
+
+
+def new_entity_data(entity: schemas.EntityBase):
+    # The schema fills in a generated id when none is provided
+    return entity.model_dump()
+
+
+def new_association_data(node_id: str, sensor_id: str):
+    return {
+        'id': new_id(),
+        'node_id': node_id,
+        'sensor_id': sensor_id
+    }
+
+
+def sensor_response(sensor: models.Sensor, node_id: Optional[str]):
+    # Loaded from the database, so already valid
+    return schemas.SensorResponse.model_construct(
+        id=sensor.id,
+        serial_number=sensor.serial_number,
+        manufacturer=sensor.manufacturer,
+        model=sensor.model,
+        modality=sensor.modality,
+        version=sensor.version,
+        node_id=node_id
+    )
+
+
+def node_dict(node) -> dict:
+    """NodeResponse data from a node or NODE_COLUMNS row."""
+    return {
+        "id": node.id,
+        "serial_number": node.serial_number,
+        "firmware_version": node.firmware_version,
+        "version": node.version,
+    }
+
+
+def sensor_dict(sensor, node_id: Optional[str]) -> dict:
+    """SensorResponse data from a sensor or SENSOR_COLUMNS row."""
+    return {
+        "id": sensor.id,
+        "serial_number": sensor.serial_number,
+        "manufacturer": sensor.manufacturer,
+        "model": sensor.model,
+        "modality": sensor.modality,
+        "version": sensor.version,
+        "node_id": node_id,
+    }
+
+
+def node_dicts(rows, names: Optional[tuple]) -> list:
+    """Node data from rows of node_columns(names)."""
+    if names is None:
+        return [node_dict(row) for row in rows]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def sensor_dicts(rows, names: Optional[tuple]) -> list:
+    """Sensor data from rows of sensor_columns(names)."""
+    if names is None:
+        return [sensor_dict(row, row.node_id) for row in rows]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def node_full_from_rows(rows):
+    """schemas.Node data from select_node_with_sensors rows."""
+    if not rows:
+        return None
+    node = rows[0]
+    sensors = {}
+    for row in rows:
+        # A sensor attached twice must still be listed once
+        if row.sensor_id is None or row.sensor_id in sensors:
+            continue
+        sensors[row.sensor_id] = {
+            "id": row.sensor_id,
+            "serial_number": row.sensor_serial_number,
+            "manufacturer": row.sensor_manufacturer,
+            "model": row.sensor_model,
+            "modality": row.sensor_modality,
+            "version": row.sensor_version,
+            "node_id": node.id,
+        }
+    return {**node_dict(node), "sensors": list(sensors.values())}
+
+
+def nodes_full_from_rows(node_rows, sensor_rows):
+    """schemas.Node data from node rows and their sensor rows."""
+    sensors_by_node = defaultdict(dict)
+    for row in sensor_rows:
+        sensors_by_node[row.node_id].setdefault(
+            row.id, sensor_dict(row, row.node_id)
+        )
+    return [
+        {
+            **node_dict(node),
+            "sensors": list(sensors_by_node[node.id].values())
+        }
+        for node in node_rows
+    ]
+
+
+def plan_nodes_bulk(nodes: List[schemas.NodeCreate], existing: set):
+    """Split a node batch into rows to insert and per-item results."""
+    results = []
+    rows = []
+    for index, node in enumerate(nodes):
+        node_data = new_entity_data(node)
+
+        if node.serial_number and node.serial_number in existing:
+            results.append(schemas.NodeBulkResult(
+                index=index,
+                status="duplicate",
+                detail="Node already registered"
+            ))
+            continue
+
+        if node.serial_number:
+            existing.add(node.serial_number)
+        rows.append(node_data)
+        results.append(schemas.NodeBulkResult(
+            index=index,
+            status="created",
+            node=schemas.NodeResponse(**node_data)
+        ))
+    return rows, results
+
+
+def plan_sensors_bulk(sensors: List[schemas.SensorCreate], existing: set):
+    """Split a sensor batch into rows to insert and per-item results."""
+    results = []
+    rows = []
+    for index, sensor in enumerate(sensors):
+        sensor_data = new_entity_data(sensor)
+
+        if not all([sensor.manufacturer, sensor.model, sensor.modality]):
+            results.append(schemas.SensorBulkResult(
+                index=index,
+                status="invalid",
+                detail="Manufacturer, model, and modality are required"
+            ))
+            continue
+        if sensor.serial_number and sensor.serial_number in existing:
+            results.append(schemas.SensorBulkResult(
+                index=index,
+                status="duplicate",
+                detail="Sensor already registered"
+            ))
+            continue
+
+        if sensor.serial_number:
+            # Later items in the same batch count as duplicates too
+            existing.add(sensor.serial_number)
+        rows.append(sensor_data)
+        results.append(schemas.SensorBulkResult(
+            index=index,
+            status="created",
+            sensor=schemas.SensorResponse(**sensor_data, node_id=None)
+        ))
+    return rows, results
+
+
+def plan_attachments_bulk(
+    attachments: List[schemas.SensorAttachment],
+    known_nodes: set,
+    sensors: dict,
+    attached: set
+):
+    """Split an attach batch into association rows and per-pair results."""
+    results = []
+    rows = []
+    for index, attachment in enumerate(attachments):
+        pair = (attachment.node_id, attachment.sensor_id)
+        sensor = sensors.get(attachment.sensor_id)
+        if attachment.node_id not in known_nodes or sensor is None:
+            results.append(schemas.SensorAttachBulkResult(
+                index=index,
+                status="not_found",
+                detail="Node or Sensor not found"
+            ))
+            continue
+        if pair in attached:
+            results.append(schemas.SensorAttachBulkResult(
+                index=index,
+                status="duplicate",
+                detail="Sensor already attached to node"
+            ))
+            continue
+
+        attached.add(pair)
+        rows.append(new_association_data(*pair))
+        results.append(schemas.SensorAttachBulkResult(
+            index=index,
+            status="attached",
+            sensor=sensor_response(sensor, attachment.node_id)
+        ))
+    return rows, results
+
+
+def plan_readings_ingest(
+    readings: List[schemas.ReadingCreate],
+    known_sensors: set,
+    cutoff: Optional[datetime] = None,
+    horizon: Optional[datetime] = None
+):
+    """Validate a reading batch into row tuples for write_readings.
+
+    Timestamps are normalised to UTC. Readings from before `cutoff` are
+    rejected as already expired, and readings after `horizon` as dated
+    in the future, which also bounds the partitions a batch can create.
+    Returns the rows, the number of readings repeating an earlier
+    (sensor_id, timestamp) in the batch, and rejections for the rest.
+    """
+    rows = []
+    seen = set()
+    repeated = 0
+    rejected = []
+    for index, reading in enumerate(readings):
+        if reading.sensor_id not in known_sensors:
+            rejected.append(schemas.ReadingRejection(
+                index=index,
+                detail="Sensor not found"
+            ))
+            continue
+        if not math.isfinite(reading.value):
+            rejected.append(schemas.ReadingRejection(
+                index=index,
+                detail="Value must be a finite number"
+            ))
+            continue
+
+        timestamp = as_utc(reading.timestamp)
+        if cutoff is not None and timestamp < cutoff:
+            rejected.append(schemas.ReadingRejection(
+                index=index,
+                detail="Reading is older than the retention window"
+            ))
+            continue
+        if horizon is not None and timestamp > horizon:
+            rejected.append(schemas.ReadingRejection(
+                index=index,
+                detail="Reading is dated in the future"
+            ))
+            continue
+        key = (reading.sensor_id, timestamp)
+        if key in seen:
+            repeated += 1
+            continue
+        seen.add(key)
+        rows.append((reading.sensor_id, timestamp, reading.value))
+    return rows, repeated, rejected
+
+# --- Node CRUD Operations ---
+
+
+def get_node(db: Session, node_id: str):
+    return db.execute(select_node(node_id)).scalars().first()
+
+
+@coalesce
+def get_node_cached(db: Session, node_id: str):
+    """Node response data, served from the read-through cache.
+
+    Rows read from a replica may lag the primary, so they are returned
+    but not cached.
+    """
+    def load():
+        node = get_node(db, node_id)
+        if node is None:
+            return None
+        return node_dict(node)
+    return read_through(node_key(node_id), load, not reads_replica(db))
+
+
+def get_node_version(db: Session, node_id: str):
+    """Current version of a node, without fetching the full row."""
+    cached = peek(node_key(node_id))
+    if cached is not None:
+        return cached["version"]
+    return db.execute(select_version(models.Node, node_id)).scalar()
+
+
+def get_node_by_serial(db: Session, serial_number: str):
+    return db.execute(select_node_by_serial(serial_number)).scalars().first()
+
+
+@coalesce
 def get_nodes(
     db: Session,
     offset: int = 0,
     limit: Optional[int] = None,
     serial_number: str = None,
-    firmware_version: str = None
+    firmware_version: str = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    actual_offset = offset
-    query = db.query(models.Node)
-    if serial_number:
-        query = query.filter(models.Node.serial_number == serial_number)
-    if firmware_version:
-        query = query.filter(models.Node.firmware_version == firmware_version)
-    if limit is not None:
-        query = query.limit(limit)
-    return query.offset(actual_offset).all()
+    """List nodes ordered by id, as NodeResponse dicts.
+
+    `cursor` resumes after the last node of a previous page (keyset
+    pagination), so deep pages cost the same as the first one. `fields`
+    limits the columns read to the named ones, plus the id.
+    """
+    names = node_fields(fields)
+    query = select_nodes(
+        offset=offset,
+        limit=limit,
+        serial_number=serial_number,
+        firmware_version=firmware_version,
+        cursor=cursor
+    ).with_only_columns(*node_columns(names))
+    return node_dicts(db.execute(query), names)
+
+
+@coalesce
+def get_node_with_sensors(db: Session, node_id: str):
+    """A node and its sensors as schemas.Node data, in a single query."""
+    rows = db.execute(select_node_with_sensors(node_id)).all()
+    return node_full_from_rows(rows)
+
+
+@coalesce
+def get_nodes_with_sensors(
+    db: Session,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    serial_number: str = None,
+    firmware_version: str = None,
+    cursor: Optional[str] = None,
+    node_ids: Optional[List[str]] = None
+):
+    """Many nodes with their sensors, in two queries regardless of count.
+
+    Takes the get_nodes filters, plus an optional list of node ids.
+    """
+    query = select_nodes(
+        offset=offset,
+        limit=limit,
+        serial_number=serial_number,
+        firmware_version=firmware_version,
+        cursor=cursor,
+        node_ids=node_ids
+    ).with_only_columns(*NODE_COLUMNS)
+    node_rows = db.execute(query).all()
+    sensor_rows = []
+    if node_rows:
+        sensor_rows = db.execute(
+            select_sensors_of_nodes([node.id for node in node_rows])
+        ).all()
+    return nodes_full_from_rows(node_rows, sensor_rows)
 
 
 def create_node(db: Session, node: schemas.NodeCreate):
-    # Use provided ID or generate UUID
-    node_data = node.model_dump()
-    if not node_data.get('id'):
-        node_data['id'] = str(uuid.uuid4())
-    
-    db_node = models.Node(**node_data)
-    db.add(db_node)
+    """Insert a node with one INSERT ... RETURNING, as NodeResponse data.
+
+    A taken serial number or id raises IntegrityError from the unique
+    constraints; the caller rolls back.
+    """
+    row = db.execute(
+        insert_returning(models.Node, new_entity_data(node), NODE_COLUMNS)
+    ).one()
     db.commit()
-    db.refresh(db_node)
-    return db_node
+    invalidate(node_key(row.id))
+    return node_dict(row)
 
 
-def update_node(db: Session, node_id: str, node_update: schemas.NodeUpdate):
-    db_node = get_node(db, node_id)
-    if not db_node:
-        return None
+def create_nodes_bulk(db: Session, nodes: List[schemas.NodeCreate]):
+    """Insert many nodes in one transaction.
+
+    Works like create_sensors_bulk: one IN query for duplicate serials,
+    one multi-row INSERT, one commit.
+    """
+    serials = {n.serial_number for n in nodes if n.serial_number}
+    existing = set()
+    if serials:
+        existing = set(db.execute(
+            select_existing_serials(models.Node, serials)
+        ).scalars())
+
+    rows, results = plan_nodes_bulk(nodes, existing)
+    if rows:
+        db.execute(insert(models.Node), rows)
+    db.commit()
+    invalidate(*(node_key(row['id']) for row in rows))
+    return results
+
+
+def update_node(
+    db: Session,
+    node_id: str,
+    node_update: schemas.NodeUpdate,
+    expected_version: Optional[int] = None
+):
+    """Apply node_update, optionally only if the node is at expected_version.
+
+    One UPDATE ... RETURNING; the node's version is only read when it
+    matches no row, to tell a missing node (None) from a VersionConflict.
+    A taken serial number or a null firmware version rolls back and
+    re-raises the IntegrityError. Returns NodeResponse data.
+    """
     update_data = node_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_node, key, value)
+    try:
+        row = db.execute(
+            update_versioned(
+                models.Node, node_id, expected_version, update_data
+            ).returning(*NODE_COLUMNS)
+        ).first()
+    except IntegrityError:
+        db.rollback()
+        raise
+    if row is None:
+        db.rollback()
+        check_missed_update(
+            db.execute(select_version(models.Node, node_id)).scalar(),
+            expected_version
+        )
+        return None
     db.commit()
-    db.refresh(db_node)
-    return db_node
+    invalidate(node_key(node_id))
+    return node_dict(row)
 
 # --- Sensor CRUD Operations ---
 
 
 def get_sensor(db: Session, sensor_id: str):
-    result = (
-        db.query(models.Sensor)
-        .outerjoin(models.NodeSensorAssociation)
-        .with_entities(
-            models.Sensor,
-            models.NodeSensorAssociation.node_id
-        )
-        .filter(models.Sensor.id == sensor_id)
-        .first()
-    )
+    result = db.execute(
+        select_sensor_with_node().where(models.Sensor.id == sensor_id)
+    ).first()
     if not result:
         return None
-    
+
     sensor, node_id = result
-    return schemas.SensorResponse(
-        **sensor.__dict__,
-        node_id=node_id
-    )
+    return sensor_response(sensor, node_id)
+
+
+@coalesce
+def get_sensor_cached(db: Session, sensor_id: str):
+    """Sensor response data, served from the read-through cache."""
+    def load():
+        sensor = get_sensor(db, sensor_id)
+        return None if sensor is None else sensor.model_dump()
+    return read_through(sensor_key(sensor_id), load, not reads_replica(db))
+
+
+def get_sensor_version(db: Session, sensor_id: str):
+    """Current version of a sensor, without fetching the full row."""
+    cached = peek(sensor_key(sensor_id))
+    if cached is not None:
+        return cached["version"]
+    return db.execute(select_version(models.Sensor, sensor_id)).scalar()
 
 
 def get_sensor_by_serial(db: Session, serial_number: str):
-    result = (
-        db.query(models.Sensor)
-        .outerjoin(models.NodeSensorAssociation)
-        .with_entities(
-            models.Sensor,
-            models.NodeSensorAssociation.node_id
-        )
-        .filter(models.Sensor.serial_number == serial_number)
-        .first()
-    )
+    result = db.execute(
+        select_sensor_with_node()
+        .where(models.Sensor.serial_number == serial_number)
+    ).first()
     if not result:
         return None
-    
+
     sensor, node_id = result
-    return schemas.SensorResponse(
-        **sensor.__dict__,
-        node_id=node_id
-    )
+    return sensor_response(sensor, node_id)
 
 
+@coalesce
 def get_sensors(
     db: Session,
     offset: int = 0,
@@ -116,112 +883,337 @@ def get_sensors(
     manufacturer: str = None,
     model: str = None,
     modality: str = None,
-    node_id: str = None
+    node_id: str = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    """List sensors with their node_id, ordered by (sensor id, node_id).
+
+    Returns SensorResponse dicts. A sensor attached to several nodes
+    appears once per node, so the node_id is part of the keyset that
+    `cursor` resumes after. `fields` limits the columns read to the
+    named ones, plus that keyset.
+    """
+    names = sensor_fields(fields)
+    query = select_sensors(
+        offset=offset,
+        limit=limit,
+        manufacturer=manufacturer,
+        model=model,
+        modality=modality,
+        node_id=node_id,
+        cursor=cursor,
+        names=names
+    )
+    return sensor_dicts(db.execute(query), names)
+
+
+INVENTORY_COLUMNS = (
+    "id", "serial_number", "manufacturer", "model", "modality", "node_id"
+)
+
+
+def iter_sensor_inventory(db: Session, batch_size: int = 1000):
+    """Yield the sensor inventory (INVENTORY_COLUMNS) in row batches.
+
+    Rows are read through a server-side cursor where the driver supports
+    it, so only one batch is held in memory at a time.
+    """
     query = (
-        db.query(models.Sensor)
-        .outerjoin(models.NodeSensorAssociation)
-        .with_entities(
-            models.Sensor,
+        select(
+            models.Sensor.id,
+            models.Sensor.serial_number,
+            models.Sensor.manufacturer,
+            models.Sensor.model,
+            models.Sensor.modality,
             models.NodeSensorAssociation.node_id
         )
+        .outerjoin(models.NodeSensorAssociation)
+        .order_by(models.Sensor.id)
+        .execution_options(yield_per=batch_size)
     )
-    
-    # Apply filters
-    if manufacturer:
-        query = query.filter(models.Sensor.manufacturer == manufacturer)
-    if model:
-        query = query.filter(models.Sensor.model == model)
-    if modality:
-        query = query.filter(models.Sensor.modality == modality)
-    if node_id:
-        query = query.filter(models.NodeSensorAssociation.node_id == node_id)
-    
-    # Apply pagination
-    if limit is not None:
-        query = query.limit(limit)
-    
-    results = query.offset(offset).all()
-    return [
-        schemas.SensorResponse(
-            **sensor.__dict__,
-            node_id=node_id
+    for partition in db.execute(query).partitions():
+        yield [tuple(row) for row in partition]
+
+
+READING_EXPORT_COLUMNS = ("sensor_id", "timestamp", "value")
+
+
+def iter_readings(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    sensor_ids: Optional[List[str]] = None,
+    batch_size: int = 10000
+):
+    """Yield readings in [start, end) (READING_EXPORT_COLUMNS) in batches.
+
+    Rows come in primary key order, optionally for some sensors only,
+    through a server-side cursor like iter_sensor_inventory.
+    """
+    query = (
+        select(
+            models.Reading.sensor_id,
+            models.Reading.timestamp,
+            models.Reading.value
         )
-        for sensor, node_id in results
-    ]
+        .where(
+            models.Reading.timestamp >= as_utc(start),
+            models.Reading.timestamp < as_utc(end)
+        )
+        .order_by(models.Reading.sensor_id, models.Reading.timestamp)
+        .execution_options(yield_per=batch_size)
+    )
+    if sensor_ids:
+        query = query.where(models.Reading.sensor_id.in_(sensor_ids))
+    for partition in db.execute(query).partitions():
+        yield partition
 
 
 def create_sensor(db: Session, sensor: schemas.SensorCreate):
-    # Use provided ID or generate UUID
-    sensor_data = sensor.model_dump()
-    if not sensor_data.get('id'):
-        sensor_data['id'] = str(uuid.uuid4())
-    
-    db_sensor = models.Sensor(**sensor_data)
-    db.add(db_sensor)
+    """Insert a sensor; works like create_node."""
+    row = db.execute(insert_returning(
+        models.Sensor, new_entity_data(sensor), SENSOR_COLUMNS
+    )).one()
     db.commit()
-    db.refresh(db_sensor)
-    
-    return schemas.SensorResponse(
-        **db_sensor.__dict__,
-        node_id=None
-    )
+    invalidate(sensor_key(row.id))
+    return sensor_dict(row, None)
+
+
+def create_sensors_bulk(db: Session, sensors: List[schemas.SensorCreate]):
+    """Insert many sensors in one transaction.
+
+    Duplicate serials are found with a single IN query against the table
+    (plus a pass over the batch itself), and all new rows go out as one
+    multi-row INSERT. Returns one SensorBulkResult per submitted item.
+    """
+    serials = {s.serial_number for s in sensors if s.serial_number}
+    existing = set()
+    if serials:
+        existing = set(db.execute(
+            select_existing_serials(models.Sensor, serials)
+        ).scalars())
+
+    rows, results = plan_sensors_bulk(sensors, existing)
+    if rows:
+        db.execute(insert(models.Sensor), rows)
+    db.commit()
+    invalidate(*(sensor_key(row['id']) for row in rows))
+    return results
 
 
 def update_sensor(
     db: Session,
     sensor_id: str,
-    sensor_update: schemas.SensorUpdate
+    sensor_update: schemas.SensorUpdate,
+    expected_version: Optional[int] = None
 ):
-    result = (
-        db.query(models.Sensor)
-        .outerjoin(models.NodeSensorAssociation)
-        .with_entities(
-            models.Sensor,
-            models.NodeSensorAssociation.node_id
+    """Apply sensor_update; works like update_node."""
+    update_data = sensor_update.model_dump(exclude_unset=True)
+    try:
+        row = db.execute(
+            update_versioned(
+                models.Sensor, sensor_id, expected_version, update_data
+            ).returning(*SENSOR_COLUMNS, sensor_node_id(sensor_id))
+        ).first()
+    except IntegrityError:
+        db.rollback()
+        raise
+    if row is None:
+        db.rollback()
+        check_missed_update(
+            db.execute(select_version(models.Sensor, sensor_id)).scalar(),
+            expected_version
         )
-        .filter(models.Sensor.id == sensor_id)
-        .first()
-    )
-    if not result:
         return None
-    
-    sensor, node_id = result
-    update_data = sensor_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(sensor, key, value)
     db.commit()
-    db.refresh(sensor)
-    
-    return schemas.SensorResponse(
-        **sensor.__dict__,
-        node_id=node_id
-    )
+    invalidate(sensor_key(sensor_id))
+    return sensor_dict(row, row.node_id)
 
 
 def attach_sensor_to_node(db: Session, node_id: str, sensor_id: str):
-    db_node = get_node(db, node_id)
-    db_sensor = (
-        db.query(models.Sensor)
-        .filter(models.Sensor.id == sensor_id)
-        .first()
-    )
-    if not db_node or not db_sensor:
+    """Attach a sensor, returning its SensorResponse data.
+
+    The association INSERT doubles as the existence check of both ends,
+    and the sensor comes back from the UPDATE bumping its version.
+    Returns None if the node or the sensor does not exist.
+    """
+    if db.execute(insert_association(node_id, sensor_id)).rowcount != 1:
+        db.rollback()
         return None
-    
-    # Create association with UUID
-    association = models.NodeSensorAssociation(
-        id=str(uuid.uuid4()),
-        node_id=node_id,
-        sensor_id=sensor_id
+    row = db.execute(
+        bump_sensor_versions([sensor_id]).returning(*SENSOR_COLUMNS)
+    ).one()
+    db.commit()
+    invalidate(sensor_key(sensor_id))
+    get_latest_values().attach([(node_id, sensor_id)])
+    return sensor_dict(row, node_id)
+
+
+def attach_sensors_bulk(
+    db: Session,
+    attachments: List[schemas.SensorAttachment]
+):
+    """Attach many (node_id, sensor_id) pairs in one transaction.
+
+    Existence of nodes and sensors, and of already attached pairs, is
+    checked with one set-based query each; all new associations are
+    written with a single executemany.
+    """
+    known_nodes = set()
+    sensors = {}
+    attached = set()
+    if attachments:
+        nodes_query, sensors_query, pairs_query = (
+            select_attach_targets(attachments)
+        )
+        known_nodes = set(db.execute(nodes_query).scalars())
+        sensors = {s.id: s for s in db.execute(sensors_query).scalars()}
+        attached = {tuple(pair) for pair in db.execute(pairs_query)}
+
+    rows, results = plan_attachments_bulk(
+        attachments, known_nodes, sensors, attached
     )
-    
-    # Add association and commit
-    db.add(association)
+    if rows:
+        db.execute(insert(models.NodeSensorAssociation), rows)
+        db.execute(bump_sensor_versions({row['sensor_id'] for row in rows}))
     db.commit()
-    db.refresh(db_sensor)
-    
-    return schemas.SensorResponse(
-        **db_sensor.__dict__,
-        node_id=node_id
+    invalidate(*(sensor_key(row['sensor_id']) for row in rows))
+    get_latest_values().attach(
+        (row['node_id'], row['sensor_id']) for row in rows
     )
+    return results
+
+# --- Reading Operations ---
+
+
+def ingest_readings(db: Session, readings: List[schemas.ReadingCreate]):
+    """Store a batch of readings for any number of sensors.
+
+    Sensor ids are checked with one set-based query, and the accepted
+    rows are written by write_readings in a single transaction together
+    with the rollups of the rows that were new.
+    """
+    sensor_ids = {r.sensor_id for r in readings}
+    known_sensors = set()
+    if sensor_ids:
+        known_sensors = set(db.execute(
+            select_existing_ids(models.Sensor, sensor_ids)
+        ).scalars())
+
+    rows, repeated, rejected = plan_readings_ingest(
+        readings, known_sensors, readings_cutoff(), readings_horizon()
+    )
+    ensure_partitions(db.get_bind(), {start_of_day(row[1]) for row in rows})
+    connection = db.connection()
+    written = write_readings(connection, rows)
+    upsert_rollups(connection, rollup_rows(written))
+    db.commit()
+    get_latest_values().update(written)
+    return schemas.ReadingIngestResult(
+        received=len(readings),
+        written=len(written),
+        duplicates=repeated + len(rows) - len(written),
+        rejected=rejected
+    )
+
+
+def load_latest_values(db: Session):
+    """Rebuild the latest-value store from the database."""
+    latest = get_latest_values()
+    latest.clear()
+    latest.attach(db.execute(select_attachments()).all())
+    latest.update(db.execute(select_latest_readings()).all())
+
+
+def refresh_latest_values(db: Session, node_ids: List[str]):
+    """Reload the latest-value store's entries for the given nodes."""
+    pairs = db.execute(select_attachments(node_ids)).all()
+    readings = []
+    if pairs:
+        readings = db.execute(select_latest_readings(node_ids)).all()
+    get_latest_values().refresh(node_ids, pairs, readings)
+
+
+def latest_response(node_id: str, rows):
+    return schemas.NodeLatest(
+        node_id=node_id,
+        readings=[
+            schemas.LatestReading(
+                sensor_id=sensor_id,
+                timestamp=timestamp,
+                value=value
+            )
+            for sensor_id, timestamp, value in rows
+        ]
+    )
+
+
+def get_nodes_latest(db: Session, node_ids: List[str]):
+    """Latest reading per attached sensor for each existing node.
+
+    Served from the latest-value store; the database is only asked
+    whether the nodes it has no sensors for exist, and for the entries
+    the store considers stale, which other workers may have changed.
+    """
+    stale = get_latest_values().stale(node_ids)
+    if stale:
+        refresh_latest_values(db, stale)
+    found = get_latest_values().for_nodes(node_ids)
+    missing = [node_id for node_id in node_ids if node_id not in found]
+    if missing:
+        for node_id in db.execute(
+            select_existing_ids(models.Node, missing)
+        ).scalars():
+            found[node_id] = []
+    return [
+        latest_response(node_id, found[node_id])
+        for node_id in dict.fromkeys(node_ids)
+        if node_id in found
+    ]
+
+
+def get_reading_aggregates(
+    db: Session,
+    sensor_ids: List[str],
+    start: datetime,
+    end: datetime,
+    resolution: int
+):
+    """Count, min, max and mean per sensor per `resolution` seconds.
+
+    The span between the first and last whole bucket of the coarsest
+    fitting rollup is read from the rollups; only the partial buckets at
+    either end are aggregated from raw readings.
+    """
+    start, end = as_utc(start), as_utc(end)
+    rollups = []
+    raw_ranges = [(start, end)]
+    width = rollup_resolution(resolution)
+    if width:
+        inner_start = ceil_time(start, width)
+        inner_end = floor_time(end, width)
+        if inner_start < inner_end:
+            rollups = db.execute(
+                select_rollups(sensor_ids, width, inner_start, inner_end)
+            ).all()
+            raw_ranges = [
+                (lower, upper)
+                for lower, upper in ((start, inner_start), (inner_end, end))
+                if lower < upper
+            ]
+    readings = []
+    if raw_ranges:
+        readings = db.execute(select_readings(sensor_ids, raw_ranges)).all()
+    return [
+        schemas.ReadingAggregate(
+            sensor_id=sensor_id,
+            bucket=bucket,
+            count=count,
+            min=minimum,
+            max=maximum,
+            mean=mean
+        )
+        for sensor_id, bucket, count, minimum, maximum, mean
+        in aggregate(rollups, readings, resolution)
+    ]
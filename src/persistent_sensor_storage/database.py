@@ -1,19 +1,259 @@
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, exc, inspect, text
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URLS,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    METRICS_ENABLED,
+    TRACING_ENABLED,
+)
+from .instrumentation import instrument_engine
+from .metrics import Histogram
+from .tracing import trace_engine
 import os
 import logging
+import time
 
-# For SQLite, set connect_args accordingly
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith(
-    "sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class InstrumentedPoolMixin:
+    """Records how long checkouts wait on the pool and how many time out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_seconds = Histogram()
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_seconds.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep the history with it
+        pool = super().recreate()
+        pool.checkout_seconds = self.checkout_seconds
+        pool.timeouts = self.timeouts
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, poolclass):
+    """Engine keyword arguments for the configured pool settings."""
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    # In-memory SQLite needs its single-connection pool to keep the data
+    if ":memory:" in url or "mode=memory" in url:
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def pool_status(engine):
+    """Live statistics for an engine's connection pool."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    if isinstance(pool, InstrumentedPoolMixin):
+        status["timeouts"] = pool.timeouts
+        status["checkout_seconds"] = pool.checkout_seconds.snapshot()
+    return status
+
+
+def connect_args(url: str):
+    # For SQLite, set connect_args accordingly
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+def build_engine(url: str):
+    engine = create_engine(
+        url,
+        connect_args=connect_args(url),
+        **pool_options(url, InstrumentedQueuePool)
+    )
+    if METRICS_ENABLED:
+        instrument_engine(engine)
+    if TRACING_ENABLED:
+        trace_engine(engine)
+    return engine
+
+
+class RoutingSession(Session):
+    """Session sending its queries to a read replica, if given one.
+
+    Flushes and explicit INSERT/UPDATE/DELETE statements still go to
+    the primary, so a read-only route that happens to write stays correct.
+    """
+
+    def __init__(self, *args, replica=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica is not None
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+        ):
+            return self.replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+def reads_replica(db) -> bool:
+    """Whether a sync or async session sends its reads to a replica."""
+    db = getattr(db, "sync_session", db)
+    return getattr(db, "replica", None) is not None
+
+
+_engine = None
+_replica_engines = None
+# Bound to the engine by get_engine
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False
+)
+
+
+def get_engine():
+    """Create the engine on first use.
+
+    Deferred so that importing the package opens nothing, and so that a
+    server forking workers after loading the app builds one pool per
+    worker. SessionLocal is usable once this has been called.
+    """
+    global _engine
+    if _engine is None:
+        _engine = build_engine(DATABASE_URL)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_replica_engines():
+    """Engines of DATABASE_REPLICA_URLS, created on first use."""
+    global _replica_engines
+    if _replica_engines is None:
+        _replica_engines = [build_engine(url) for url in DATABASE_REPLICA_URLS]
+    return _replica_engines
+
 
 Base = declarative_base()
 
+# asyncio drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+_async_engine = None
+_async_replica_engines = None
+_async_session_factory = None
+
+
+def async_database_url(url: str = DATABASE_URL):
+    """Swap the driver of a sync database URL for its asyncio driver."""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend!r} URLs")
+    return ASYNC_DRIVERS[backend] + sep + rest
+
+
+def build_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    engine = create_async_engine(
+        url, **pool_options(url, InstrumentedAsyncQueuePool)
+    )
+    if METRICS_ENABLED:
+        instrument_engine(engine)
+    if TRACING_ENABLED:
+        trace_engine(engine)
+    return engine
+
+
+def get_async_engine():
+    """Create the async engine on first use.
+
+    Deferred so the asyncio driver is only imported when async mode is
+    actually enabled.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = build_async_engine(
+            ASYNC_DATABASE_URL or async_database_url()
+        )
+    return _async_engine
+
+
+def get_async_replica_engines():
+    """Async engines of DATABASE_REPLICA_URLS, created on first use."""
+    global _async_replica_engines
+    if _async_replica_engines is None:
+        _async_replica_engines = [
+            build_async_engine(async_database_url(url))
+            for url in DATABASE_REPLICA_URLS
+        ]
+    return _async_replica_engines
+
+
+def dispose_after_fork():
+    """Drop the pooled connections inherited from a parent process.
+
+    They are discarded without being closed, since closing them would
+    also close them for the parent. New connections are opened on demand.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+    for replica in _replica_engines or ():
+        replica.dispose(close=False)
+    for engine in [_async_engine, *(_async_replica_engines or ())]:
+        if engine is not None:
+            engine.sync_engine.dispose(close=False)
+
+
+def async_engine_started():
+    return _async_engine is not None
+
+
+def get_async_session_factory():
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        # Attribute access after commit would need implicit IO, which an
+        # AsyncSession cannot do, so loaded state is kept across commits
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(),
+            sync_session_class=RoutingSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_session_factory
+
 
 def init_database():
     """Initialize database tables. For development/testing only."""
@@ -21,26 +261,75 @@ def init_database():
         db_path = DATABASE_URL.replace("sqlite:///", "")
         if os.path.exists(db_path):
             os.remove(db_path)
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
+    Base.metadata.create_all(bind=get_engine())
     logging.info("Database initialized with clean slate")
 
 
-def ensure_database():
-    """Ensure database tables exist. Safe for production use."""
-    inspector = inspect(engine)
-    existing_tables = inspector.get_table_names()
-    if not existing_tables:
-        Base.metadata.create_all(bind=engine)
-        logging.info("Database tables created")
-    else:
-        logging.info("Database tables already exist")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Schema that create_all produced before migrations were introduced
+BASELINE_REVISION = "0001"
+# Serializes migrations when several workers start at once (Postgres)
+MIGRATION_LOCK_KEY = 74_157_001
+
+
+def alembic_config(connection):
+    from alembic.config import Config
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.attributes["connection"] = connection
+    config.attributes["target_metadata"] = Base.metadata
+    return config
+
+
+def ensure_database(bind=None):
+    """Bring the schema up to date with the migrations. Safe for production use.
+
+    An empty database gets the current schema from create_all and is
+    stamped at the latest revision. A database created before migrations
+    existed is stamped at the baseline and upgraded from there.
+    """
+    from alembic import command
+
+    bind = bind if bind is not None else get_engine()
+    with bind.connect() as connection:
+        locking = connection.dialect.name == "postgresql"
+        if locking:
+            connection.execute(
+                text("SELECT pg_advisory_lock(:key)"),
+                {"key": MIGRATION_LOCK_KEY}
+            )
+            connection.commit()
+        try:
+            config = alembic_config(connection)
+            tables = set(inspect(connection).get_table_names())
+            # Alembic must own the transactions it runs in, so that
+            # concurrent index builds can step outside of them
+            connection.commit()
+            if not tables - {"alembic_version"}:
+                Base.metadata.create_all(bind=connection)
+                connection.commit()
+                command.stamp(config, "head")
+                logging.info("Database tables created")
+            else:
+                if "alembic_version" not in tables:
+                    command.stamp(config, BASELINE_REVISION)
+                command.upgrade(config, "head")
+                logging.info("Database schema is up to date")
+            connection.commit()
+        finally:
+            if locking:
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": MIGRATION_LOCK_KEY}
+                )
+                connection.commit()
 
 
 def reset_database():
     """Reset database to clean state. For testing only."""
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
+    Base.metadata.create_all(bind=get_engine())
     logging.info("Database reset to clean state")
 
 
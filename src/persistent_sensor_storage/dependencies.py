@@ -1,4 +1,7 @@
-from .database import SessionLocal
+from fastapi import Request
+
+from .database import SessionLocal, get_async_session_factory
+from .replicas import async_read_engine, read_engine
 
 
 def get_db():
@@ -7,3 +10,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """Session for read-only routes, on a read replica when there is one."""
+    db = SessionLocal(replica=read_engine(request.cookies))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with get_async_session_factory()() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    """get_read_db for the async routers."""
+    replica = async_read_engine(request.cookies)
+    async with get_async_session_factory()(replica=replica) as db:
+        yield db
@@ -0,0 +1,37 @@
+from typing import Optional
+
+# ETags are the quoted row version. They are only compared per resource
+# URL, so the version alone identifies a representation.
+
+
+def make_etag(version: int):
+    return f'"{version}"'
+
+
+def _tags(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(if_none_match: str, version: int):
+    """Weak comparison of an If-None-Match header against a version."""
+    tags = [tag.removeprefix("W/") for tag in _tags(if_none_match)]
+    return "*" in tags or make_etag(version) in tags
+
+
+def parse_if_match(if_match: Optional[str]):
+    """Expected version from an If-Match header.
+
+    Returns None when there is no precondition (no header, or "*").
+    Raises ValueError for anything other than one of our own ETags.
+    """
+    if if_match is None:
+        return None
+    tags = _tags(if_match)
+    if tags == ["*"]:
+        return None
+    if len(tags) != 1 or tags[0].startswith("W/"):
+        raise ValueError("If-Match must name a single strong ETag")
+    value = tags[0].strip('"')
+    if not value.isdigit():
+        raise ValueError("If-Match does not name a known version")
+    return int(value)
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from .rollups import as_utc
+
+# Serializers turning batches of row tuples into response body chunks.
+# Each batch becomes one chunk, so memory is bounded by the batch size
+# regardless of how many rows the export covers.
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+FORMATS = {
+    # format: (media type, file extension)
+    "ndjson": (NDJSON_MEDIA_TYPE, "ndjson"),
+    "csv": (CSV_MEDIA_TYPE, "csv"),
+    "arrow": (ARROW_MEDIA_TYPE, "arrows"),
+    "parquet": (PARQUET_MEDIA_TYPE, "parquet"),
+}
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+
+def _text_cell(value):
+    if isinstance(value, datetime):
+        return as_utc(value).isoformat()
+    return value
+
+
+def ndjson_chunks(columns, batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps(
+                dict(zip(columns, map(_text_cell, row))),
+                separators=(",", ":")
+            ) + "\n"
+            for row in batch
+        )
+
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([map(_text_cell, row) for row in batch])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Columnar formats need pyarrow, which is imported on first use. Each
+# batch of rows is transposed into columns and becomes one Arrow record
+# batch, or one Parquet row group.
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_schema(columns):
+    import pyarrow as pa
+    types = {
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "value": pa.float64(),
+    }
+    return pa.schema([
+        (name, types.get(name, pa.string())) for name in columns
+    ])
+
+
+def _record_batches(schema, batches):
+    import pyarrow as pa
+    for batch in batches:
+        if not batch:
+            continue
+        columns = list(zip(*batch))
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, schema)
+            ],
+            schema=schema
+        )
+
+
+class _DrainingSink(io.RawIOBase):
+    """Write-only file handing out what was written since the last drain.
+
+    tell() keeps counting across drains, as Parquet records absolute
+    offsets in its footer.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_chunks(columns, batches):
+    """Arrow IPC stream: the schema, then one message per batch."""
+    import pyarrow as pa
+    schema = arrow_schema(columns)
+    sink = _DrainingSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for record_batch in _record_batches(schema, batches):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    # End-of-stream marker, and the schema for an empty export
+    yield sink.drain()
+
+
+def parquet_chunks(columns, batches):
+    """Parquet file written one row group per batch."""
+    import pyarrow.parquet as pq
+    schema = arrow_schema(columns)
+    sink = _DrainingSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for record_batch in _record_batches(schema, batches):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    # Footer
+    yield sink.drain()
@@ -0,0 +1,70 @@
+import os
+import time
+import uuid
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Entity ids are UUIDv7 (RFC 9562): a millisecond Unix timestamp followed
+# by random bits, so new keys land at the right edge of every B-tree
+# instead of on a random page. They are stored as native uuid columns on
+# Postgres and 16-byte blobs elsewhere, and handled as canonical
+# lowercase strings everywhere above the database.
+
+# Sorts before every other id; stands in for "no node" in sort keys
+NIL_ID = str(uuid.UUID(int=0))
+
+
+def uuid7() -> uuid.UUID:
+    nanoseconds = time.time_ns()
+    milliseconds, remainder = divmod(nanoseconds, 1_000_000)
+    # The 12 bits after the version carry the sub-millisecond time, so
+    # ids made by one process keep their order within a millisecond
+    fraction = remainder * 4096 // 1_000_000
+    random = int.from_bytes(os.urandom(8), "big") & (2 ** 62 - 1)
+    return uuid.UUID(int=(
+        (milliseconds & (2 ** 48 - 1)) << 80
+        | 0x7 << 76
+        | fraction << 64
+        | 0b10 << 62
+        | random
+    ))
+
+
+def new_id() -> str:
+    """A new entity id; the single place ids are generated."""
+    return str(uuid7())
+
+
+def normalize_id(value) -> str:
+    """Canonical string form of an id; raises ValueError if malformed."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f"Invalid id: {value!r}") from None
+
+
+class UUIDKey(TypeDecorator):
+    """UUID column bound from and loaded as canonical id strings."""
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = uuid.UUID(normalize_id(value))
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
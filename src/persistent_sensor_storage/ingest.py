@@ -0,0 +1,86 @@
+import csv
+import io
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models
+
+# Writers for batches of (sensor_id, timestamp, value) reading tuples.
+# Postgres streams the batch with COPY into a session-local staging
+# table and moves it into readings with a single INSERT ... SELECT;
+# SQLite gets multi-row INSERTs. Readings already stored are skipped,
+# and only the rows actually written are returned, for the rollups.
+
+READING_COLUMNS = ("sensor_id", "timestamp", "value")
+
+# SQLite binds at most 32766 parameters per statement
+INSERT_CHUNK_ROWS = 5000
+
+STAGING_TABLE = "readings_staging"
+
+
+def write_readings(connection, rows) -> list:
+    """Write reading tuples on connection, returning the new ones."""
+    if not rows:
+        return []
+    if (
+        connection.dialect.name == "postgresql"
+        and connection.dialect.driver == "psycopg2"
+    ):
+        return _copy_readings(connection, rows)
+    return _insert_readings(connection, rows)
+
+
+def _copy_readings(connection, rows) -> list:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        (sensor_id, timestamp.isoformat(), repr(value))
+        for sensor_id, timestamp, value in rows
+    )
+    buffer.seek(0)
+
+    # The staging table lives as long as the pooled connection and is
+    # emptied on commit, so repeated batches don't churn the catalog
+    connection.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+        "(LIKE readings INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (sensor_id, \"timestamp\", value) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+    result = connection.exec_driver_sql(
+        "INSERT INTO readings (sensor_id, \"timestamp\", value) "
+        f"SELECT sensor_id, \"timestamp\", value FROM {STAGING_TABLE} "
+        "ON CONFLICT DO NOTHING "
+        "RETURNING sensor_id, \"timestamp\", value"
+    )
+    return [tuple(row) for row in result]
+
+
+def _insert_readings(connection, rows) -> list:
+    if connection.dialect.name == "postgresql":
+        statement = postgresql.insert(models.Reading)
+        statement = statement.on_conflict_do_nothing()
+    elif connection.dialect.name == "sqlite":
+        statement = sqlite.insert(models.Reading).on_conflict_do_nothing()
+    else:
+        statement = insert(models.Reading)
+    statement = statement.returning(
+        models.Reading.sensor_id,
+        models.Reading.timestamp,
+        models.Reading.value
+    )
+
+    written = []
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[start:start + INSERT_CHUNK_ROWS]
+        values = [dict(zip(READING_COLUMNS, row)) for row in chunk]
+        written.extend(
+            tuple(row) for row in connection.execute(statement.values(values))
+        )
+    return written
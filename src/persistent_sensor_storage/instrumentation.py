@@ -0,0 +1,260 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy import event
+
+from .config import (
+    METRICS_DIR,
+    METRICS_WRITE_SECONDS,
+    SLOW_QUERY_LOG_SIZE,
+    SLOW_QUERY_SECONDS,
+)
+from .metrics import Registry, dump_registry, merge_dumps
+
+# Request and SQL instrumentation behind the Prometheus /metrics route.
+# MetricsMiddleware times each request under its route template, and
+# the cursor hooks time each statement and count it against the request
+# that issued it, so an N+1 shows up as a high queries-per-request
+# quantile on a single route.
+#
+# Each worker process has its own registry. With METRICS_DIR set, every
+# worker writes its registry there as <pid>.json, and a scrape answered
+# by any worker sums the files of all of them. Files of exited workers
+# keep their counts, so totals do not drop when a worker is replaced,
+# but lose their gauges, which only describe a live process.
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.summary(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ("method", "route")
+)
+REQUESTS = registry.counter(
+    "http_requests_total",
+    "Requests by route template and status code",
+    ("method", "route", "status")
+)
+REQUEST_QUERIES = registry.summary(
+    "http_request_queries",
+    "SQL statements issued per request, by route template",
+    ("method", "route"),
+    unit=1
+)
+QUERY_SECONDS = registry.summary(
+    "sql_query_duration_seconds",
+    "SQL statement latency by statement verb",
+    ("verb",)
+)
+SLOW_QUERIES = registry.counter(
+    "sql_slow_queries_total",
+    "SQL statements slower than SLOW_QUERY_SECONDS",
+    ("verb",)
+)
+POOL_CONNECTIONS = registry.gauge(
+    "db_pool_connections",
+    "Connection pool state at scrape time",
+    ("engine", "state")
+)
+
+STATEMENT_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+# Most recent slow statements, newest last
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+# [statement count, ASGI scope] of the request being served, if any
+_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def route_label(scope) -> str:
+    # The template, not the raw path, keeps ids out of the label values
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def statement_verb(statement: str) -> str:
+    words = statement.split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in STATEMENT_VERBS else "OTHER"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and query counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500   # Unless the app gets as far as responding
+        request = [0, scope]
+        token = _request.set(request)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request.reset(token)
+            method, route = scope["method"], route_label(scope)
+            REQUEST_SECONDS.labels(method, route).observe(
+                time.perf_counter() - start
+            )
+            REQUEST_QUERIES.labels(method, route).observe(request[0])
+            REQUESTS.labels(method, route, str(status)).inc()
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    elapsed = time.perf_counter() - context._metrics_start
+    verb = statement_verb(statement)
+    QUERY_SECONDS.labels(verb).observe(elapsed)
+    request = _request.get()
+    if request is not None:
+        request[0] += 1
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        SLOW_QUERIES.labels(verb).inc()
+        route = route_label(request[1]) if request is not None else None
+        slow_queries.append({
+            "seconds": elapsed,
+            "route": route,
+            "statement": statement,
+        })
+        logging.warning(
+            "Slow query (%.3fs, %s): %s", elapsed, route, statement
+        )
+
+
+def instrument_engine(engine) -> None:
+    """Time and count the statements of a sync or async engine."""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def record_pool(name: str, status: dict) -> None:
+    """Copy pool_status counts into the pool gauges."""
+    for state in ("size", "checkedin", "checkedout", "overflow", "timeouts"):
+        if state in status:
+            POOL_CONNECTIONS.labels(name, state).set(status[state])
+
+
+def metrics_path(pid: int = None) -> str:
+    return os.path.join(METRICS_DIR, f"{pid or os.getpid()}.json")
+
+
+def _write_dump(path: str, dump: dict) -> None:
+    # Replaced whole, so a reader never sees half a file
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(dump, file)
+    os.replace(temporary, path)
+
+
+def write_metrics() -> None:
+    """Save this process's metrics to METRICS_DIR."""
+    _write_dump(metrics_path(), dump_registry(registry))
+
+
+def read_metrics() -> list:
+    dumps = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as file:
+                dumps.append(json.load(file))
+        except (OSError, ValueError):
+            continue   # Removed since listing
+    return dumps
+
+
+def collected_registry() -> Registry:
+    """The metrics of every worker, or of this process without METRICS_DIR."""
+    if METRICS_DIR is None:
+        return registry
+    write_metrics()
+    return merge_dumps(registry, read_metrics())
+
+
+def retire_metrics(pid: int) -> None:
+    """Drop the gauges of an exited worker, keeping its counts."""
+    gauges = {
+        family.name for family in registry.families()
+        if family.kind == "gauge"
+    }
+    path = metrics_path(pid)
+    try:
+        with open(path) as file:
+            dump = json.load(file)
+    except (OSError, ValueError):
+        return
+    _write_dump(path, {
+        name: metrics for name, metrics in dump.items() if name not in gauges
+    })
+
+
+def clear_metrics() -> None:
+    """Remove the files of a previous server, before workers start."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+
+class MetricsWriter:
+    """Writes this process's metrics every `interval` seconds.
+
+    `before_write` refreshes scrape-time gauges first, so they stay
+    current in the files of workers that are not the ones scraped.
+    """
+
+    def __init__(self, before_write, interval: float = METRICS_WRITE_SECONDS):
+        self.before_write = before_write
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if METRICS_DIR is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            # The last counts of this worker outlive it
+            write_metrics()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.before_write()
+                write_metrics()
+            except Exception:
+                logging.exception("Writing metrics failed")
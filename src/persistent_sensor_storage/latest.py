@@ -0,0 +1,167 @@
+import math
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+from .config import LATEST_REFRESH_SECONDS
+from .rollups import epoch_seconds
+
+# Last known reading per sensor, held in memory so map views never query
+# the readings table. Each sensor owns a slot in two parallel float
+# arrays (epoch seconds and value, NaN until its first reading), and
+# nodes map to the slots of their attached sensors.
+#
+# The store is per process: it is rebuilt from the database at startup
+# and then follows the readings ingested and sensors attached through
+# this process. What other workers write reaches it when a node's entry
+# is older than refresh_seconds and is refreshed from the database. That
+# is off (0) by default; serve turns it on when it starts several workers.
+
+
+class LatestValues:
+    def __init__(
+        self,
+        capacity: int = 1024,
+        refresh_seconds: float = LATEST_REFRESH_SECONDS
+    ):
+        # Reentrant, so refresh() can attach and update in one locked step
+        self._lock = threading.RLock()
+        self.refresh_seconds = refresh_seconds
+        self._slots = {}         # sensor_id -> slot
+        self._sensor_ids = []    # slot -> sensor_id
+        self._node_slots = {}    # node_id -> slots of attached sensors
+        self._timestamps = np.full(capacity, np.nan)
+        self._values = np.full(capacity, np.nan)
+        self._loaded_at = time.monotonic()
+        self._refreshed_at = {}  # node_id -> time of its last refresh
+
+    def _slot(self, sensor_id: str) -> int:
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            slot = len(self._sensor_ids)
+            if slot == len(self._timestamps):
+                grow = np.full(len(self._timestamps), np.nan)
+                self._timestamps = np.concatenate((self._timestamps, grow))
+                self._values = np.concatenate((self._values, grow))
+            self._slots[sensor_id] = slot
+            self._sensor_ids.append(sensor_id)
+        return slot
+
+    def update(self, readings) -> None:
+        """Record (sensor_id, timestamp, value) rows, keeping the newest."""
+        if not readings:
+            return
+        seconds = epoch_seconds(row[1] for row in readings)
+        values = np.array([row[2] for row in readings], dtype=np.float64)
+        with self._lock:
+            slots = np.fromiter(
+                (self._slot(row[0]) for row in readings),
+                dtype=np.int64,
+                count=len(readings)
+            )
+            # Newest reading of each sensor in the batch
+            order = np.lexsort((seconds, slots))
+            last = order[np.concatenate((
+                slots[order][1:] != slots[order][:-1], [True]
+            ))]
+            slots, seconds, values = slots[last], seconds[last], values[last]
+            # Comparisons with NaN are false, so empty slots take any value
+            newer = ~(seconds <= self._timestamps[slots])
+            self._timestamps[slots[newer]] = seconds[newer]
+            self._values[slots[newer]] = values[newer]
+
+    def attach(self, pairs) -> None:
+        """Record (node_id, sensor_id) attachments."""
+        with self._lock:
+            for node_id, sensor_id in pairs:
+                slots = self._node_slots.setdefault(node_id, [])
+                slot = self._slot(sensor_id)
+                if slot not in slots:
+                    slots.append(slot)
+
+    def stale(self, node_ids) -> list:
+        """Nodes not loaded from the database in the last refresh_seconds.
+
+        Always empty when refresh_seconds is 0.
+        """
+        if self.refresh_seconds <= 0:
+            return []
+        oldest = time.monotonic() - self.refresh_seconds
+        with self._lock:
+            return [
+                node_id for node_id in dict.fromkeys(node_ids)
+                if self._refreshed_at.get(node_id, self._loaded_at) < oldest
+            ]
+
+    def refresh(self, node_ids, pairs, readings) -> None:
+        """Replace what is known of nodes with a fresh database read.
+
+        `pairs` are the (node_id, sensor_id) attachments of the nodes and
+        `readings` the latest reading of each of their sensors. Readers
+        see the nodes either before or after, never half replaced.
+        """
+        with self._lock:
+            for node_id in node_ids:
+                self._node_slots.pop(node_id, None)
+                self._refreshed_at.pop(node_id, None)
+            self.attach(pairs)
+            self.update(readings)
+            now = time.monotonic()
+            # Only nodes with sensors are remembered, so that asking for
+            # unknown ids cannot grow the store
+            for node_id, _ in pairs:
+                self._refreshed_at[node_id] = now
+
+    def for_nodes(self, node_ids) -> dict:
+        """Latest reading of each sensor attached to the given nodes.
+
+        Returns {node_id: [(sensor_id, timestamp, value), ...]} for the
+        nodes with attached sensors; timestamp and value are None for
+        sensors without readings.
+        """
+        with self._lock:
+            node_slots = {
+                node_id: list(self._node_slots[node_id])
+                for node_id in dict.fromkeys(node_ids)
+                if node_id in self._node_slots
+            }
+            slots = np.array(
+                [slot for s in node_slots.values() for slot in s],
+                dtype=np.int64
+            )
+            seconds = self._timestamps[slots].tolist()
+            values = self._values[slots].tolist()
+            sensor_ids = [self._sensor_ids[slot] for slot in slots.tolist()]
+
+        rows = [
+            (sensor_id, None, None) if math.isnan(timestamp) else (
+                sensor_id,
+                datetime.fromtimestamp(timestamp, timezone.utc),
+                value
+            )
+            for sensor_id, timestamp, value in zip(sensor_ids, seconds, values)
+        ]
+        result = {}
+        start = 0
+        for node_id, s in node_slots.items():
+            result[node_id] = rows[start:start + len(s)]
+            start += len(s)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._sensor_ids.clear()
+            self._node_slots.clear()
+            self._timestamps.fill(np.nan)
+            self._values.fill(np.nan)
+            self._loaded_at = time.monotonic()
+            self._refreshed_at.clear()
+
+
+_latest = LatestValues()
+
+
+def get_latest_values() -> LatestValues:
+    return _latest
@@ -1,51 +1,194 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .database import ensure_database
-from .routers import nodes, sensors
-from .config import SENTRY_DSN
-import sentry_sdk
+from fastapi.responses import Response
+from .database import (
+    SessionLocal,
+    async_engine_started,
+    ensure_database,
+    get_async_engine,
+    get_async_replica_engines,
+    get_engine,
+    get_replica_engines,
+    pool_status,
+)
+from .routers import admin, export, nodes, readings, sensors
+from .crud import load_latest_values
+from .retention import RetentionJob, premake_partitions
+from .config import (
+    DATABASE_REPLICA_URLS,
+    DB_ASYNC,
+    METRICS_ENABLED,
+    SENTRY_DSN,
+    TRACES_SAMPLE_RATE,
+    TRACING_ENABLED,
+)
+from .instrumentation import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    MetricsWriter,
+    collected_registry,
+    record_pool,
+    slow_queries,
+)
+from .metrics import render_prometheus
+from .replicas import ReadYourWritesMiddleware
+from .tracing import TracingMiddleware
 import logging
-from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
-from sentry_sdk.integrations.logging import LoggingIntegration
 
-sentry_logging = LoggingIntegration(
-    level=logging.INFO,  # Capture info and above as breadcrumbs
-    event_level=logging.INFO,  # Send errors as events
-)
 
-if SENTRY_DSN is not None:
+def init_sentry():
+    """Initialize Sentry, which is only imported when SENTRY_DSN is set."""
+    if SENTRY_DSN is None:
+        logging.warning("SENTRY_DSN not set, Sentry will not be initialized")
+        return
+    import sentry_sdk
+    from sentry_sdk.integrations.logging import LoggingIntegration
+
+    sentry_logging = LoggingIntegration(
+        level=logging.INFO,  # Capture info and above as breadcrumbs
+        event_level=logging.INFO,  # Send errors as events
+    )
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         # Add data like request headers and IP for users
         # See docs for more info
         send_default_pii=True,
         integrations=[sentry_logging],
-        traces_sample_rate=1.0,
-        _experiments={
-            "continuous_profiling_auto_start": True,
-        },
+        # Head sampling only; slow and failed requests outside the sample
+        # still reach Sentry through the tail sampled trace log
+        traces_sample_rate=TRACES_SAMPLE_RATE,
+        # Profiles are taken only in windows opened on /admin/profile
+        profile_session_sample_rate=1.0,
+        profile_lifecycle="manual",
     )
-    sentry_sdk.profiler.start_profiler()
-else:
-    logging.warning("SENTRY_DSN not set, Sentry will not be initialized")
 
 
-app = FastAPI(title="Aclima Nodes & Sensors API")
+def prepare_database(engine):
+    """Bring the schema up to date and premake the readings partitions.
+
+    Run at startup, or once by a server before it forks its workers.
+    """
+    ensure_database(engine)
+    premake_partitions(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything that connects or starts threads happens here, in the
+    # serving process, rather than at import
+    init_sentry()
+    engine = get_engine()
+
+    # Ensure database tables exist (safe for production), unless the
+    # server already did so before starting its workers
+    if app.state.prepare_database:
+        prepare_database(engine)
+
+    # Latest reading per sensor, served by the /nodes/.../latest endpoints
+    with SessionLocal() as db:
+        load_latest_values(db)
+
+    # The background job that downsamples and drops expired readings
+    retention_job = RetentionJob(engine)
+    retention_job.start()
+    metrics_writer = MetricsWriter(record_pools)
+    if METRICS_ENABLED:
+        metrics_writer.start()
+
+    logging.info("Logging is working: Starting application")
+    try:
+        yield
+    finally:
+        metrics_writer.stop()
+        retention_job.stop()
+        engine.dispose()
+        for replica in get_replica_engines():
+            replica.dispose()
+        if async_engine_started():
+            await get_async_engine().dispose()
+            for replica in get_async_replica_engines():
+                await replica.dispose()
+
+
+def engine_pools():
+    """(name, engine) of every engine in use, for the pool metrics."""
+    pools = [("sync", get_engine())]
+    pools += [
+        (f"replica-{number}", replica)
+        for number, replica in enumerate(get_replica_engines())
+    ]
+    if async_engine_started():
+        pools.append(("async", get_async_engine()))
+        pools += [
+            (f"async-replica-{number}", replica)
+            for number, replica in enumerate(get_async_replica_engines())
+        ]
+    return pools
+
+
+def record_pools():
+    for name, engine in engine_pools():
+        record_pool(name, pool_status(engine))
+
+
+def create_app(prepare: bool = True) -> FastAPI:
+    """Build the application; nothing is connected until startup.
+
+    With `prepare` false the startup skips prepare_database, for servers
+    that ran it once before forking their workers.
+    """
+    app = FastAPI(title="Aclima Nodes & Sensors API", lifespan=lifespan)
+    app.state.prepare_database = prepare
+    if TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    if DATABASE_REPLICA_URLS:
+        app.add_middleware(ReadYourWritesMiddleware)
+
+    # Include routers for nodes and sensors
+    if DB_ASYNC:
+        from .routers import async_nodes, async_sensors
+        app.include_router(async_nodes.router)
+        app.include_router(async_sensors.router)
+    else:
+        app.include_router(nodes.router)
+        app.include_router(sensors.router)
+    app.include_router(readings.router)
+    app.include_router(export.router)
+    app.include_router(admin.router)
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "OK"}
 
-# Ensure database tables exist (safe for production)
-ensure_database()
+    @app.get("/metrics/pool")
+    def pool_metrics():
+        """Connection pool statistics for sizing pools per replica."""
+        return {name: pool_status(engine) for name, engine in engine_pools()}
 
-logging.info("Logging is working: FastAPI app initialized")
+    if METRICS_ENABLED:
+        @app.get("/metrics", response_class=Response)
+        def prometheus_metrics():
+            """Request, SQL and pool metrics in the Prometheus text format.
 
-# Include routers for nodes and sensors
-app.include_router(nodes.router)
-app.include_router(sensors.router)
+            Summed over all workers when they share METRICS_DIR.
+            """
+            record_pools()
+            return Response(
+                render_prometheus(collected_registry()),
+                media_type=PROMETHEUS_CONTENT_TYPE
+            )
 
+        @app.get("/metrics/slow-queries")
+        def slow_query_log():
+            """The most recent statements slower than SLOW_QUERY_SECONDS."""
+            return list(slow_queries)
 
-@app.get("/health")
-def health_check():
-    return {"status": "OK"}
+    logging.info("Logging is working: FastAPI app initialized")
+    return app
 
 
-logging.info("Logging is working: Starting application")
-asgi_app = SentryAsgiMiddleware(app)
-sentry_sdk.profiler.stop_profiler()
+# Default instance for `uvicorn src.persistent_sensor_storage.main:app`;
+# building it is cheap, since startup work waits for the lifespan
+app = create_app()
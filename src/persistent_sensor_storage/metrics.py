@@ -0,0 +1,361 @@
+import bisect
+import threading
+import weakref
+
+# Lightweight in-process metrics, exposed through the /metrics routes.
+# The fixed-bucket Histogram backs the JSON pool statistics; Counter,
+# Gauge and HdrHistogram back the Prometheus families in a Registry.
+
+
+class Histogram:
+    """Fixed-bucket histogram of observations, in seconds.
+
+    Bucket counts are cumulative when snapshotted, matching the
+    Prometheus convention, with a final +Inf bucket.
+    """
+
+    DEFAULT_BUCKETS = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+    )
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(bounds, cumulative)),
+            "count": running,
+            "sum": total,
+        }
+
+
+class _ThreadOwner:
+    """Thread-local marker whose collection means its thread exited."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _ThreadCells:
+    """Per-thread accumulators, combined when read.
+
+    Each thread only ever writes its own cell, so recording takes no
+    lock; the lock is only taken to register a thread's first cell, to
+    retire it, and to list the cells for a reader. When a thread exits
+    its cell is merged into the cell of retired threads, so short-lived
+    threads do not leave a cell each behind.
+    """
+
+    def __init__(self, factory, merge):
+        self._factory = factory
+        self._merge = merge
+        self._local = threading.local()
+        self._cells = []
+        self._retired = factory()
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._factory()
+            # Thread-local values are dropped when the thread exits
+            owner = self._local.owner = _ThreadOwner()
+            weakref.finalize(owner, self._retire, cell)
+            with self._lock:
+                self._cells.append(cell)
+            return cell
+
+    def _retire(self, cell):
+        with self._lock:
+            # Replaced rather than updated, so that a reader's list holds
+            # the cell either on its own or merged, never both
+            self._retired = self._merge(self._retired, cell)
+            self._cells.remove(cell)
+
+    def cells(self):
+        with self._lock:
+            return [self._retired, *self._cells]
+
+
+class Counter:
+    """Monotonic counter, incremented without taking a lock."""
+
+    def __init__(self):
+        self._cells = _ThreadCells(
+            lambda: [0], lambda base, cell: [base[0] + cell[0]]
+        )
+
+    def inc(self, amount: float = 1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return sum(cell[0] for cell in self._cells.cells())
+
+    def state(self):
+        return self.value()
+
+    def load(self, state):
+        """Add the state() of another process's counter."""
+        self.inc(state)
+
+
+class Gauge:
+    """Value set at scrape time, e.g. from pool statistics."""
+
+    def __init__(self):
+        self._value = 0
+
+    def set(self, value: float):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+    def state(self):
+        return self._value
+
+    def load(self, state):
+        # Gauges of several processes add up, e.g. to all their connections
+        self._value += state
+
+
+class HdrHistogram:
+    """Log-linear histogram with bounded relative error.
+
+    As in HdrHistogram, values are scaled to integer `unit`s and counted
+    in buckets that are linear within each power of two, with
+    SUB_BUCKET_BITS bits of precision: any reported quantile is within
+    2 / 2**SUB_BUCKET_BITS (about 1.6%) of the recorded value. Buckets
+    are kept sparse, so a wide range costs nothing until it is used.
+    """
+
+    SUB_BUCKET_BITS = 7
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, unit: float = 1e-6):
+        self.unit = unit
+        # Bucket counts and the running sum of each thread
+        self._cells = _ThreadCells(lambda: [{}, 0.0], self._merge)
+
+    @staticmethod
+    def _merge(base, cell):
+        counts = dict(base[0])
+        for index, count in cell[0].items():
+            counts[index] = counts.get(index, 0) + count
+        return [counts, base[1] + cell[1]]
+
+    @classmethod
+    def bucket_index(cls, scaled: int) -> int:
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if scaled < sub_buckets:
+            return max(scaled, 0)
+        shift = scaled.bit_length() - cls.SUB_BUCKET_BITS
+        half = sub_buckets >> 1
+        return sub_buckets + (shift - 1) * half + (scaled >> shift) - half
+
+    @classmethod
+    def bucket_bounds(cls, index: int):
+        """[lower, upper) of a bucket, in units."""
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if index < sub_buckets:
+            return index, index + 1
+        half = sub_buckets >> 1
+        shift, offset = divmod(index - sub_buckets, half)
+        shift += 1
+        return (half + offset) << shift, (half + offset + 1) << shift
+
+    def observe(self, value: float):
+        index = self.bucket_index(int(value / self.unit))
+        cell = self._cells.cell()
+        counts = cell[0]
+        counts[index] = counts.get(index, 0) + 1
+        cell[1] += value
+
+    def totals(self):
+        """Bucket counts and sum over all threads."""
+        counts = {}
+        total = 0.0
+        for cell in self._cells.cells():
+            # copy() is atomic, so a concurrent observe cannot break it
+            for index, count in cell[0].copy().items():
+                counts[index] = counts.get(index, 0) + count
+            total += cell[1]
+        return counts, total
+
+    def state(self):
+        counts, total = self.totals()
+        return {"counts": counts, "sum": total}
+
+    def load(self, state):
+        """Add the state() of another process's histogram."""
+        cell = self._cells.cell()
+        counts = cell[0]
+        # JSON turns the bucket indexes into strings
+        for index, count in state["counts"].items():
+            index = int(index)
+            counts[index] = counts.get(index, 0) + count
+        cell[1] += state["sum"]
+
+    def snapshot(self):
+        counts, total = self.totals()
+        count = sum(counts.values())
+        quantiles = {}
+        if count:
+            ordered = sorted(counts.items())
+            for quantile in self.QUANTILES:
+                rank = quantile * count
+                seen = 0
+                for index, bucket_count in ordered:
+                    seen += bucket_count
+                    if seen >= rank:
+                        break
+                lower, upper = self.bucket_bounds(index)
+                # Buckets one unit wide hold exact values
+                if upper - lower > 1:
+                    lower = (lower + upper) / 2
+                quantiles[quantile] = lower * self.unit
+        return {"count": count, "sum": total, "quantiles": quantiles}
+
+
+class MetricFamily:
+    """Metrics of one name, one per combination of label values."""
+
+    def __init__(
+        self, name, description, kind, labelnames=(), factory=Counter
+    ):
+        self.name = name
+        self.description = description
+        self.kind = kind   # Prometheus type: counter, gauge or summary
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        metric = self._metrics.get(values)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(values, self._factory())
+        return metric
+
+    def items(self):
+        with self._lock:
+            return list(self._metrics.items())
+
+    def empty_copy(self) -> "MetricFamily":
+        return MetricFamily(
+            self.name, self.description, self.kind, self.labelnames,
+            self._factory
+        )
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name, description, labelnames=()):
+        return self.register(
+            MetricFamily(name, description, "counter", labelnames, Counter)
+        )
+
+    def gauge(self, name, description, labelnames=()):
+        return self.register(
+            MetricFamily(name, description, "gauge", labelnames, Gauge)
+        )
+
+    def summary(self, name, description, labelnames=(), unit=1e-6):
+        return self.register(MetricFamily(
+            name,
+            description,
+            "summary",
+            labelnames,
+            lambda: HdrHistogram(unit)
+        ))
+
+    def families(self):
+        return list(self._families.values())
+
+
+def dump_registry(registry: Registry) -> dict:
+    """The label values and state of every metric, as JSON-able data."""
+    return {
+        family.name: [
+            [list(values), metric.state()] for values, metric in family.items()
+        ]
+        for family in registry.families()
+    }
+
+
+def merge_dumps(registry: Registry, dumps) -> Registry:
+    """A registry of the same families, holding the sums of `dumps`."""
+    merged = Registry()
+    for family in registry.families():
+        target = merged.register(family.empty_copy())
+        for dump in dumps:
+            for values, state in dump.get(family.name, ()):
+                target.labels(*values).load(state)
+    return merged
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + "}"
+
+
+def render_prometheus(registry: Registry) -> str:
+    """The registry in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for family in registry.families():
+        lines.append(f"# HELP {family.name} {family.description}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for values, metric in sorted(family.items()):
+            if family.kind != "summary":
+                labels = _label_text(family.labelnames, values)
+                lines.append(f"{family.name}{labels} {metric.value()}")
+                continue
+            snapshot = metric.snapshot()
+            for quantile, value in snapshot["quantiles"].items():
+                labels = _label_text(
+                    family.labelnames, values, [("quantile", quantile)]
+                )
+                lines.append(f"{family.name}{labels} {value}")
+            labels = _label_text(family.labelnames, values)
+            lines.append(f"{family.name}_sum{labels} {snapshot['sum']}")
+            lines.append(f"{family.name}_count{labels} {snapshot['count']}")
+    return "\n".join(lines) + "\n"
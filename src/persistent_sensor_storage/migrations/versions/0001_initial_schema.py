@@ -0,0 +1,61 @@
+"""Initial schema: nodes, sensors and their association
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "nodes",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("serial_number", sa.String(), nullable=True),
+        sa.Column("firmware_version", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_nodes_id", "nodes", ["id"])
+    op.create_index(
+        "ix_nodes_serial_number", "nodes", ["serial_number"], unique=True
+    )
+
+    op.create_table(
+        "sensors",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("serial_number", sa.String(), nullable=True),
+        sa.Column("manufacturer", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("modality", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sensors_id", "sensors", ["id"])
+    op.create_index(
+        "ix_sensors_serial_number", "sensors", ["serial_number"], unique=True
+    )
+
+    op.create_table(
+        "node_sensor_association",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("node_id", sa.String(), nullable=False),
+        sa.Column("sensor_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["node_id"], ["nodes.id"]),
+        sa.ForeignKeyConstraint(["sensor_id"], ["sensors.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_node_sensor_association_id", "node_sensor_association", ["id"]
+    )
+
+
+def downgrade():
+    op.drop_table("node_sensor_association")
+    op.drop_table("sensors")
+    op.drop_table("nodes")
@@ -0,0 +1,42 @@
+"""Add row version columns used for ETags
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TABLES = ("nodes", "sensors")
+
+
+def existing_columns(table):
+    # Offline (--sql) runs have no database to inspect
+    if context.is_offline_mode():
+        return set()
+    inspector = sa.inspect(op.get_bind())
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    for table in TABLES:
+        # Databases built by create_all may already have the column
+        if "version" in existing_columns(table):
+            continue
+        op.add_column(
+            table,
+            sa.Column(
+                "version", sa.Integer(), nullable=False, server_default="1"
+            ),
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("version")
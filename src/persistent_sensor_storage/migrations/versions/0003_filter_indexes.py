@@ -0,0 +1,54 @@
+"""Composite indexes for list filters, keyset paging and joins
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_nodes_firmware_version_id", "nodes", ["firmware_version", "id"]),
+    ("ix_sensors_manufacturer_id", "sensors", ["manufacturer", "id"]),
+    ("ix_sensors_model_id", "sensors", ["model", "id"]),
+    ("ix_sensors_modality_id", "sensors", ["modality", "id"]),
+    (
+        "ix_node_sensor_association_node_sensor",
+        "node_sensor_association",
+        ["node_id", "sensor_id"],
+    ),
+    (
+        "ix_node_sensor_association_sensor_id",
+        "node_sensor_association",
+        ["sensor_id"],
+    ),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY keeps the tables writable while the
+    # indexes build, but cannot run inside a transaction on Postgres
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,85 @@
+"""Range partition readings by timestamp on PostgreSQL
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# One partition per UTC day holding existing readings, named like the
+# ones partitions.ensure_partitions creates
+CREATE_DAY_PARTITIONS = """
+DO $$
+DECLARE
+    day date;
+BEGIN
+    FOR day IN
+        SELECT DISTINCT ("timestamp" AT TIME ZONE 'UTC')::date
+        FROM readings_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF readings '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'readings_' || to_char(day, 'YYYYMMDD')
+                || '_' || to_char(day + 1, 'YYYYMMDD'),
+            day::timestamp AT TIME ZONE 'UTC',
+            (day + 1)::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$
+"""
+
+
+def create_readings(name, **kwargs):
+    op.create_table(
+        name,
+        sa.Column("sensor_id", sa.String(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["sensor_id"], ["sensors.id"]),
+        sa.PrimaryKeyConstraint("sensor_id", "timestamp"),
+        **kwargs
+    )
+
+
+def upgrade():
+    # SQLite has no partitioning; retention deletes by day there instead
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.rename_table("readings", "readings_unpartitioned")
+    op.execute(
+        "ALTER TABLE readings_unpartitioned "
+        "RENAME CONSTRAINT readings_pkey TO readings_unpartitioned_pkey"
+    )
+    create_readings(
+        "readings", postgresql_partition_by='RANGE ("timestamp")'
+    )
+    op.execute(CREATE_DAY_PARTITIONS)
+    op.execute(
+        'INSERT INTO readings (sensor_id, "timestamp", value) '
+        'SELECT sensor_id, "timestamp", value FROM readings_unpartitioned'
+    )
+    op.drop_table("readings_unpartitioned")
+
+
+def downgrade():
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.rename_table("readings", "readings_partitioned")
+    op.execute(
+        "ALTER TABLE readings_partitioned "
+        "RENAME CONSTRAINT readings_pkey TO readings_partitioned_pkey"
+    )
+    create_readings("readings")
+    op.execute(
+        'INSERT INTO readings (sensor_id, "timestamp", value) '
+        'SELECT sensor_id, "timestamp", value FROM readings_partitioned'
+    )
+    # Drops the partitions along with it
+    op.drop_table("readings_partitioned")
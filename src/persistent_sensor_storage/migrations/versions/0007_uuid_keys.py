@@ -0,0 +1,95 @@
+"""Store entity ids as native UUIDs instead of text
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Every column holding an entity id
+ID_COLUMNS = {
+    "nodes": ["id"],
+    "sensors": ["id"],
+    "node_sensor_association": ["id", "node_id", "sensor_id"],
+    "readings": ["sensor_id"],
+    "reading_rollups": ["sensor_id"],
+}
+
+
+def uuid_bytes(value):
+    return None if value is None else uuid.UUID(value).bytes
+
+
+def uuid_text(value):
+    return None if value is None else str(uuid.UUID(bytes=value))
+
+
+def upgrade():
+    # Ids that are not UUIDs make the conversion fail, and the migration
+    # with it, rather than being silently rewritten
+    if op.get_context().dialect.name == "postgresql":
+        convert_postgresql(postgresql.UUID(as_uuid=True), "uuid")
+    else:
+        convert_sqlite(uuid_bytes, sa.LargeBinary(16))
+
+
+def downgrade():
+    if op.get_context().dialect.name == "postgresql":
+        convert_postgresql(sa.String(), "text")
+    else:
+        convert_sqlite(uuid_text, sa.String())
+
+
+def convert_postgresql(type_, cast):
+    # Both sides of a foreign key must change together, so the keys are
+    # dropped for the conversion and recreated after it
+    inspector = sa.inspect(op.get_bind())
+    foreign_keys = [
+        (table, key)
+        for table in ID_COLUMNS
+        for key in inspector.get_foreign_keys(table)
+    ]
+    for table, key in foreign_keys:
+        op.drop_constraint(key["name"], table, type_="foreignkey")
+    for table, columns in ID_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                type_=type_,
+                postgresql_using=f"{column}::{cast}"
+            )
+    for table, key in foreign_keys:
+        op.create_foreign_key(
+            key["name"],
+            table,
+            key["referred_table"],
+            key["constrained_columns"],
+            key["referred_columns"]
+        )
+
+
+def convert_sqlite(function, type_):
+    # SQLite keeps whatever value is stored regardless of the declared
+    # type, so the values are rewritten in place before the tables are
+    # rebuilt with the new declared type
+    connection = op.get_bind().connection.driver_connection
+    connection.create_function(
+        "convert_id", 1, function, deterministic=True
+    )
+    for table, columns in ID_COLUMNS.items():
+        assignments = ", ".join(
+            f"{column} = convert_id({column})" for column in columns
+        )
+        op.execute(f"UPDATE {table} SET {assignments}")
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=type_)
@@ -1,25 +1,43 @@
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import relationship
 from .database import Base
-import uuid
+from .ids import UUIDKey, new_id
 
 
 class NodeSensorAssociation(Base):
     __tablename__ = "node_sensor_association"
+    __table_args__ = (
+        # Joins from nodes, and the node_id filter on sensor listings
+        Index(
+            "ix_node_sensor_association_node_sensor",
+            "node_id",
+            "sensor_id"
+        ),
+        # Joins from sensors
+        Index("ix_node_sensor_association_sensor_id", "sensor_id"),
+    )
     id = Column(
-        String,
+        UUIDKey,
         primary_key=True,
         index=True,
         nullable=False,
-        default=lambda: str(uuid.uuid4())
+        default=new_id
     )
     node_id = Column(
-        String,
+        UUIDKey,
         ForeignKey('nodes.id'),
         nullable=False
     )
     sensor_id = Column(
-        String,
+        UUIDKey,
         ForeignKey('sensors.id'),
         nullable=False
     )
@@ -40,15 +58,21 @@ class NodeSensorAssociation(Base):
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        # Equality filter plus the id ordering used for keyset paging
+        Index("ix_nodes_firmware_version_id", "firmware_version", "id"),
+    )
     id = Column(
-        String,
+        UUIDKey,
         primary_key=True,
         index=True,
         nullable=False,
-        default=lambda: str(uuid.uuid4())
+        default=new_id
     )
     serial_number = Column(String, unique=True, index=True, nullable=True)
     firmware_version = Column(String, nullable=False)
+    # Bumped on every write; served as the resource's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     associations = relationship(
         "NodeSensorAssociation",
@@ -65,17 +89,25 @@ class Node(Base):
 
 class Sensor(Base):
     __tablename__ = "sensors"
+    __table_args__ = (
+        # One per list filter, each followed by the keyset ordering
+        Index("ix_sensors_manufacturer_id", "manufacturer", "id"),
+        Index("ix_sensors_model_id", "model", "id"),
+        Index("ix_sensors_modality_id", "modality", "id"),
+    )
     id = Column(
-        String,
+        UUIDKey,
         primary_key=True,
         index=True,
         nullable=False,
-        default=lambda: str(uuid.uuid4())
+        default=new_id
     )
     serial_number = Column(String, unique=True, index=True, nullable=True)
     manufacturer = Column(String, nullable=False)
     model = Column(String, nullable=False)
     modality = Column(String, nullable=False)
+    # Bumped on every write, including attaching to a node
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     associations = relationship(
         "NodeSensorAssociation",
         back_populates="sensor",
@@ -87,3 +119,35 @@ class Sensor(Base):
         back_populates="sensors",
         overlaps="associations,sensor"
     )
+
+
+class Reading(Base):
+    __tablename__ = "readings"
+    # Range partitioned by time on Postgres; see partitions.py
+    __table_args__ = {"postgresql_partition_by": 'RANGE ("timestamp")'}
+    # The (sensor_id, timestamp) key doubles as the index for per-sensor
+    # time range scans
+    sensor_id = Column(
+        UUIDKey,
+        ForeignKey('sensors.id'),
+        primary_key=True
+    )
+    timestamp = Column(DateTime(timezone=True), primary_key=True)
+    value = Column(Float, nullable=False)
+
+
+class ReadingRollup(Base):
+    __tablename__ = "reading_rollups"
+    sensor_id = Column(
+        UUIDKey,
+        ForeignKey('sensors.id'),
+        primary_key=True
+    )
+    # Bucket width in seconds, one of rollups.ROLLUP_RESOLUTIONS
+    resolution = Column(Integer, primary_key=True)
+    # Start of the bucket
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    minimum = Column(Float, nullable=False)
+    maximum = Column(Float, nullable=False)
@@ -0,0 +1,42 @@
+import base64
+import json
+from .ids import normalize_id
+
+# Keyset cursors are the sort key of the last row on a page, JSON encoded
+# and wrapped in urlsafe base64 so clients treat them as opaque tokens.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*key):
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int):
+    """Decode a cursor into a tuple of `size` strings.
+
+    Raises ValueError if the cursor was not produced by encode_cursor
+    with the same key shape.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if (
+        not isinstance(key, list)
+        or len(key) != size
+        or not all(isinstance(part, str) for part in key)
+    ):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def decode_id_cursor(cursor: str, size: int):
+    """decode_cursor for keys made of entity ids, in canonical form."""
+    key = decode_cursor(cursor, size)
+    try:
+        return tuple(normalize_id(part) for part in key)
+    except ValueError as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -0,0 +1,124 @@
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+from .config import READINGS_PARTITION_DAYS
+
+# On Postgres, readings is range partitioned by timestamp so that expired
+# data goes away by dropping whole partitions instead of deleting rows.
+# Partitions cover whole UTC days and are named readings_<from>_<to>
+# after their bounds, e.g. readings_20260101_20260102. They are created
+# ahead of time by the retention job and on demand by ingest.
+
+PARTITION_NAME = re.compile(r"readings_(\d{8})_(\d{8})")
+
+# Serializes partition DDL across processes
+PARTITION_LOCK_KEY = 0x5053_5052
+
+_known = []   # Sorted (start, end) bounds of the partitions seen so far
+_known_lock = threading.Lock()
+
+
+def partitioned(connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+def start_of_day(timestamp: datetime) -> datetime:
+    return timestamp.astimezone(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def partition_name(start: datetime, end: datetime) -> str:
+    return f"readings_{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+def list_partitions(connection):
+    """(start, end, name) of every readings partition, oldest first."""
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'readings'::regclass"
+    )).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.fullmatch(name)
+        if match:
+            start, end = (
+                datetime.strptime(part, "%Y%m%d").replace(tzinfo=timezone.utc)
+                for part in match.groups()
+            )
+            partitions.append((start, end, name))
+    return sorted(partitions)
+
+
+def partition_bounds(day: datetime, existing, days: int):
+    """Bounds of a new partition holding `day`, or None if one exists.
+
+    Partitions are `days` wide and aligned to the Unix epoch, but are
+    narrowed so they never overlap the `existing` (start, end) bounds,
+    e.g. ones created while the width was configured differently.
+    """
+    width = timedelta(days=days)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    start = epoch + (day - epoch) // width * width
+    end = start + width
+    for lower, upper in existing:
+        if lower <= day < upper:
+            return None
+        if upper <= day:
+            start = max(start, upper)
+        else:
+            end = min(end, lower)
+    return start, end
+
+
+def _covered(day: datetime) -> bool:
+    return any(lower <= day < upper for lower, upper in _known)
+
+
+def ensure_partitions(engine, days) -> None:
+    """Create the partitions that the given UTC days fall into.
+
+    Days already known to be covered are skipped without touching the
+    database, so calling this for every ingested batch is cheap.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with _known_lock:
+        missing = sorted({d for d in days if not _covered(d)})
+        if not missing:
+            return
+        with engine.begin() as connection:
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": PARTITION_LOCK_KEY}
+            )
+            existing = [
+                (start, end)
+                for start, end, _ in list_partitions(connection)
+            ]
+            for day in missing:
+                bounds = partition_bounds(
+                    day, existing, READINGS_PARTITION_DAYS
+                )
+                if bounds is None:
+                    continue
+                start, end = bounds
+                connection.execute(text(
+                    f"CREATE TABLE {partition_name(start, end)} "
+                    "PARTITION OF readings "
+                    f"FOR VALUES FROM ('{start.isoformat()}') "
+                    f"TO ('{end.isoformat()}')"
+                ))
+                existing.append(bounds)
+                existing.sort()
+        _known[:] = existing
+
+
+def forget_partition(start: datetime, end: datetime) -> None:
+    """Drop a partition from the known bounds, once it has been dropped."""
+    with _known_lock:
+        if (start, end) in _known:
+            _known.remove((start, end))
@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+# On-demand profiling windows. Nothing is sampled until a window is opened
+# through the admin API. Then a daemon thread samples the stack of every
+# thread each PROFILE_INTERVAL_SECONDS until the window closes. The Sentry
+# continuous profiler runs alongside it when Sentry is initialized. The
+# stacks are served in the folded format that flame graph tools read.
+
+PROFILE_INTERVAL_SECONDS = 0.01
+
+
+def fold_stack(frame) -> str:
+    """A stack as "outer;...;inner", one function per entry."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Wall-clock stack sampler, run for one bounded window at a time."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.seconds = None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float) -> bool:
+        """Open a window of `seconds`; False if one is already open."""
+        with self._lock:
+            if self.running():
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.seconds = seconds
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds,), name="profiler",
+                daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        """Close the open window early, keeping what it sampled."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running(),
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "samples": self.samples,
+        }
+
+    def folded(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _run(self, seconds: float) -> None:
+        # Imported only when a window opens, to keep it out of startup
+        import sentry_sdk
+
+        sentry = sentry_sdk.get_client().is_active()
+        if sentry:
+            sentry_sdk.profiler.start_profiler()
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        try:
+            while (
+                not self._stop.wait(self.interval)
+                and time.monotonic() < deadline
+            ):
+                frames = sys._current_frames()
+                with self._lock:
+                    for ident, frame in frames.items():
+                        if ident != own:
+                            self._stacks[fold_stack(frame)] += 1
+                    self.samples += 1
+        finally:
+            if sentry:
+                sentry_sdk.profiler.stop_profiler()
+
+
+profiler = Profiler()
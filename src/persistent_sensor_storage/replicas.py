@@ -0,0 +1,99 @@
+import itertools
+import math
+import time
+
+from .config import READ_YOUR_WRITES_SECONDS, REPLICA_POLICY
+from .database import get_async_replica_engines, get_replica_engines
+
+# Routing of read-only requests to the read replicas. Each request picks
+# one replica, per REPLICA_POLICY, and reads everything from it. Replicas
+# lag the primary, so a successful write response sets a cookie that
+# sends that client's reads to the primary until it expires. Replica
+# reads never fill the read-through cache, which the primary's reads and
+# writes keep current for everyone.
+
+REPLICA_POLICIES = ("round_robin", "least_loaded")
+
+PIN_COOKIE = "pss_read_primary"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_turn = itertools.count()
+
+
+def checked_out(engine) -> int:
+    pool = getattr(engine, "sync_engine", engine).pool
+    checkedout = getattr(pool, "checkedout", None)
+    return checkedout() if checkedout is not None else 0
+
+
+def pick_replica(policy: str = REPLICA_POLICY, engines=None):
+    """The replica engine to read from, or None if there are none."""
+    if engines is None:
+        engines = get_replica_engines()
+    if not engines:
+        return None
+    # Start from the next replica in turn, so that ties spread evenly
+    start = next(_turn) % len(engines)
+    engines = engines[start:] + engines[:start]
+    if policy == "least_loaded":
+        return min(engines, key=checked_out)
+    return engines[0]
+
+
+def pinned_to_primary(cookies) -> bool:
+    try:
+        return float(cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_engine(cookies):
+    """Replica for a client's read, or None to read from the primary."""
+    if pinned_to_primary(cookies):
+        return None
+    return pick_replica()
+
+
+def async_read_engine(cookies):
+    """read_engine for an AsyncSession, as the sync side of its engine."""
+    if pinned_to_primary(cookies):
+        return None
+    engine = pick_replica(engines=get_async_replica_engines())
+    return None if engine is None else engine.sync_engine
+
+
+def pin_cookie(now: float = None) -> bytes:
+    until = (now or time.time()) + READ_YOUR_WRITES_SECONDS
+    return (
+        f"{PIN_COOKIE}={until:.3f}; "
+        f"Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+        "Path=/; HttpOnly; SameSite=Lax"
+    ).encode("latin-1")
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware pinning clients that write to the primary."""
+
+    def __init__(self, app):
+        if REPLICA_POLICY not in REPLICA_POLICIES:
+            raise ValueError(f"Unknown REPLICA_POLICY {REPLICA_POLICY!r}")
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"set-cookie", pin_cookie()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -0,0 +1,29 @@
+import json
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    # Optional; the standard library encoder renders the same JSON
+    orjson = None
+
+# Hot read paths build plain dicts straight from projected columns and
+# return them as a FastJSONResponse. Returning a Response skips FastAPI's
+# response_model validation and serialization, so the data is encoded
+# exactly once; the route's response_model only documents the shape.
+
+
+def render_json(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return render_json(content)
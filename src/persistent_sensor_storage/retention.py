@@ -0,0 +1,238 @@
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:   # Windows: no file locks, every process runs the job
+    fcntl = None
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, delete, func, select, text
+
+from . import models
+from .config import (
+    READINGS_FUTURE_SECONDS,
+    READINGS_PARTITION_DAYS,
+    READINGS_RETENTION_DAYS,
+    RETENTION_INTERVAL_SECONDS,
+    RETENTION_LOCK_FILE,
+    ROLLUP_DAY_RETENTION_DAYS,
+    ROLLUP_HOUR_RETENTION_DAYS,
+    ROLLUP_MINUTE_RETENTION_DAYS,
+)
+from .partitions import (
+    ensure_partitions,
+    forget_partition,
+    list_partitions,
+    partitioned,
+    start_of_day,
+)
+from .rollups import DAY, HOUR, MINUTE, as_utc, rollup_rows, upsert_rollups
+
+# Background job keeping storage bounded. Raw readings older than
+# READINGS_RETENTION_DAYS are downsampled into the rollups and then
+# removed, a whole partition at a time on Postgres and one day per
+# transaction on SQLite; rollups are expired per resolution.
+
+# Only one process runs the job at a time: per host, the one holding
+# RETENTION_LOCK_FILE, and on Postgres also this advisory lock
+RETENTION_LOCK_KEY = 0x5053_5254
+
+# Rows read per batch while downsampling a partition
+DOWNSAMPLE_BATCH_ROWS = 10000
+
+ROLLUP_RETENTION_DAYS = {
+    MINUTE: ROLLUP_MINUTE_RETENTION_DAYS,
+    HOUR: ROLLUP_HOUR_RETENTION_DAYS,
+    DAY: ROLLUP_DAY_RETENTION_DAYS,
+}
+
+
+def readings_cutoff(now: datetime = None):
+    """Readings older than this are expired, or None to keep them all."""
+    if not READINGS_RETENTION_DAYS:
+        return None
+    now = now or datetime.now(timezone.utc)
+    return now - timedelta(days=READINGS_RETENTION_DAYS)
+
+
+def readings_horizon(now: datetime = None):
+    """Readings later than this are dated too far in the future."""
+    now = now or datetime.now(timezone.utc)
+    return now + timedelta(seconds=READINGS_FUTURE_SECONDS)
+
+
+def premake_partitions(engine, now: datetime = None) -> None:
+    """Partitions for the coming days, so ingest rarely has to make one."""
+    today = start_of_day(now or datetime.now(timezone.utc))
+    ensure_partitions(engine, [
+        today + timedelta(days=days)
+        for days in range(READINGS_PARTITION_DAYS + 1)
+    ])
+
+
+def expired_ranges(connection, cutoff: datetime):
+    """(start, end, partition name or None) of the expired readings."""
+    if partitioned(connection):
+        return [
+            (start, end, name)
+            for start, end, name in list_partitions(connection)
+            if end <= cutoff
+        ]
+    oldest = connection.execute(
+        select(func.min(models.Reading.timestamp))
+    ).scalar()
+    if oldest is None:
+        return []
+    ranges = []
+    start = start_of_day(as_utc(oldest))
+    while start + timedelta(days=1) <= cutoff:
+        ranges.append((start, start + timedelta(days=1), None))
+        start += timedelta(days=1)
+    return ranges
+
+
+def downsample(connection, start: datetime, end: datetime) -> None:
+    """Rebuild the rollups of [start, end) from its raw readings.
+
+    start and end fall on day boundaries, so the range holds whole
+    buckets of every rollup resolution and recomputing is exact.
+    """
+    connection.execute(delete(models.ReadingRollup).where(
+        models.ReadingRollup.bucket >= start,
+        models.ReadingRollup.bucket < end
+    ))
+    readings = connection.execute(
+        select(
+            models.Reading.sensor_id,
+            models.Reading.timestamp,
+            models.Reading.value
+        )
+        .where(
+            models.Reading.timestamp >= start,
+            models.Reading.timestamp < end
+        )
+        .execution_options(yield_per=DOWNSAMPLE_BATCH_ROWS)
+    )
+    for partition in readings.partitions():
+        upsert_rollups(connection, rollup_rows([tuple(r) for r in partition]))
+
+
+def drop_readings(connection, start: datetime, end: datetime, name) -> None:
+    if name is not None:
+        # Dropping a partition is O(1) in the number of rows it holds
+        connection.execute(text(f"DROP TABLE {name}"))
+    else:
+        connection.execute(delete(models.Reading).where(
+            models.Reading.timestamp >= start,
+            models.Reading.timestamp < end
+        ))
+
+
+def expire_rollups(connection, now: datetime) -> None:
+    for resolution, days in ROLLUP_RETENTION_DAYS.items():
+        if days:
+            connection.execute(delete(models.ReadingRollup).where(and_(
+                models.ReadingRollup.resolution == resolution,
+                models.ReadingRollup.bucket < now - timedelta(days=days)
+            )))
+
+
+def run_retention(engine, now: datetime = None) -> int:
+    """One pass of the retention job; returns how many ranges expired."""
+    now = now or datetime.now(timezone.utc)
+    with engine.connect() as lock:
+        if partitioned(lock):
+            locked = lock.execute(
+                text("SELECT pg_try_advisory_lock(:key)"),
+                {"key": RETENTION_LOCK_KEY}
+            ).scalar()
+            lock.commit()
+            if not locked:
+                return 0
+        try:
+            premake_partitions(engine, now)
+            cutoff = readings_cutoff(now)
+            expired = []
+            if cutoff is not None:
+                with engine.connect() as connection:
+                    expired = expired_ranges(connection, cutoff)
+            for start, end, name in expired:
+                # Separate transactions, so the lock DROP TABLE takes on
+                # readings is held only briefly
+                with engine.begin() as connection:
+                    downsample(connection, start, end)
+                with engine.begin() as connection:
+                    drop_readings(connection, start, end, name)
+                forget_partition(start, end)
+                logging.info("Expired readings from %s to %s", start, end)
+
+            with engine.begin() as connection:
+                expire_rollups(connection, now)
+            return len(expired)
+        finally:
+            if partitioned(lock):
+                lock.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": RETENTION_LOCK_KEY}
+                )
+                lock.commit()
+
+
+class RetentionJob:
+    """Runs run_retention every `interval` seconds on a daemon thread.
+
+    Every worker starts one, but only the one holding the lock file runs
+    retention. The others try to take the lock over at each interval, so
+    the job moves on when its worker exits.
+    """
+
+    def __init__(
+        self,
+        engine,
+        interval: float = RETENTION_INTERVAL_SECONDS,
+        lock_path: str = RETENTION_LOCK_FILE
+    ):
+        self.engine = engine
+        self.interval = interval
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="readings-retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def leads(self) -> bool:
+        """Whether this process runs the job, taking the lock if free."""
+        if fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if self.leads():
+                    run_retention(self.engine)
+            except Exception:
+                logging.exception("Readings retention failed")
@@ -0,0 +1,184 @@
+import re
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models
+
+# Per-bucket aggregates of readings, updated as readings are written so
+# range queries read a handful of rollup rows instead of every reading.
+# Buckets of every width are aligned to the Unix epoch in UTC, so each
+# coarser bucket is made of whole buckets of the finer widths.
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+ROLLUP_RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+RESOLUTION_UNITS = {"s": 1, "m": MINUTE, "h": HOUR, "d": DAY}
+
+
+def parse_resolution(resolution: str) -> int:
+    """Parse a bucket width such as "15m", "1h" or "7d" into seconds."""
+    match = re.fullmatch(r"([1-9][0-9]*)([smhd])", resolution)
+    if not match:
+        raise ValueError("Invalid resolution")
+    return int(match.group(1)) * RESOLUTION_UNITS[match.group(2)]
+
+
+def rollup_resolution(resolution: int):
+    """The coarsest rollup whose buckets tile `resolution` buckets."""
+    fitting = [w for w in ROLLUP_RESOLUTIONS if resolution % w == 0]
+    return max(fitting) if fitting else None
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    # Naive timestamps are UTC; SQLite also hands them back that way
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def floor_time(timestamp: datetime, width: int) -> datetime:
+    seconds = as_utc(timestamp).timestamp()
+    return datetime.fromtimestamp(seconds // width * width, timezone.utc)
+
+
+def ceil_time(timestamp: datetime, width: int) -> datetime:
+    seconds = as_utc(timestamp).timestamp()
+    return datetime.fromtimestamp(-(-seconds // width) * width, timezone.utc)
+
+
+def epoch_seconds(timestamps) -> np.ndarray:
+    return np.array(
+        [as_utc(t).timestamp() for t in timestamps], dtype=np.float64
+    )
+
+
+def _reduce(sensor_ids, buckets, counts, totals, minimums, maximums):
+    """Merge partial aggregates that share a (sensor_id, bucket) key.
+
+    Takes and returns parallel arrays; the result has one entry per key,
+    ordered by sensor_id and bucket.
+    """
+    if not len(sensor_ids):
+        return sensor_ids, buckets, counts, totals, minimums, maximums
+    sensors, sensor_index = np.unique(sensor_ids, return_inverse=True)
+    order = np.lexsort((buckets, sensor_index))
+    sensor_index = sensor_index[order]
+    buckets = buckets[order]
+    starts = np.flatnonzero(np.concatenate((
+        [True],
+        (np.diff(sensor_index) != 0) | (np.diff(buckets) != 0)
+    )))
+    return (
+        sensors[sensor_index[starts]],
+        buckets[starts],
+        np.add.reduceat(counts[order], starts),
+        np.add.reduceat(totals[order], starts),
+        np.minimum.reduceat(minimums[order], starts),
+        np.maximum.reduceat(maximums[order], starts),
+    )
+
+
+def _reading_partials(rows, width: int):
+    """One single-reading aggregate per (sensor_id, timestamp, value)."""
+    sensor_ids = np.array([row[0] for row in rows], dtype=object)
+    seconds = epoch_seconds(row[1] for row in rows)
+    values = np.array([row[2] for row in rows], dtype=np.float64)
+    buckets = (seconds // width * width).astype(np.int64)
+    counts = np.ones(len(rows), dtype=np.int64)
+    return sensor_ids, buckets, counts, values, values, values
+
+
+def rollup_rows(readings) -> list:
+    """Rollup rows for every resolution, aggregating the given readings."""
+    rows = []
+    if not readings:
+        return rows
+    for width in ROLLUP_RESOLUTIONS:
+        sensor_ids, buckets, counts, totals, minimums, maximums = _reduce(
+            *_reading_partials(readings, width)
+        )
+        rows.extend(
+            {
+                "sensor_id": sensor_id,
+                "resolution": width,
+                "bucket": datetime.fromtimestamp(bucket, timezone.utc),
+                "count": count,
+                "total": total,
+                "minimum": minimum,
+                "maximum": maximum,
+            }
+            for sensor_id, bucket, count, total, minimum, maximum in zip(
+                sensor_ids,
+                buckets.tolist(),
+                counts.tolist(),
+                totals.tolist(),
+                minimums.tolist(),
+                maximums.tolist(),
+            )
+        )
+    return rows
+
+
+def upsert_rollups(connection, rows) -> None:
+    """Add rollup rows into the stored buckets, creating missing ones."""
+    if not rows:
+        return
+    table = models.ReadingRollup.__table__
+    if connection.dialect.name == "postgresql":
+        statement = postgresql.insert(table)
+        least, greatest = func.least, func.greatest
+    else:
+        # SQLite's two-argument min() and max() are scalar functions
+        statement = sqlite.insert(table)
+        least, greatest = func.min, func.max
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=["sensor_id", "resolution", "bucket"],
+        set_={
+            "count": table.c["count"] + excluded["count"],
+            "total": table.c.total + excluded.total,
+            "minimum": least(table.c.minimum, excluded.minimum),
+            "maximum": greatest(table.c.maximum, excluded.maximum),
+        }
+    )
+    connection.execute(statement, rows)
+
+
+def aggregate(rollups, readings, resolution: int) -> list:
+    """Combine rollup rows and raw readings into `resolution` buckets.
+
+    `rollups` are (sensor_id, bucket, count, total, minimum, maximum)
+    rows of a resolution dividing `resolution`, `readings` are
+    (sensor_id, timestamp, value) rows. Returns (sensor_id, bucket,
+    count, minimum, maximum, mean) tuples ordered by sensor and bucket.
+    """
+    parts = []
+    if rollups:
+        seconds = epoch_seconds(row[1] for row in rollups)
+        parts.append((
+            np.array([row[0] for row in rollups], dtype=object),
+            (seconds // resolution * resolution).astype(np.int64),
+            np.array([row[2] for row in rollups], dtype=np.int64),
+            np.array([row[3] for row in rollups], dtype=np.float64),
+            np.array([row[4] for row in rollups], dtype=np.float64),
+            np.array([row[5] for row in rollups], dtype=np.float64),
+        ))
+    if readings:
+        parts.append(_reading_partials(readings, resolution))
+    if not parts:
+        return []
+
+    sensor_ids, buckets, counts, totals, minimums, maximums = _reduce(
+        *(np.concatenate(column) for column in zip(*parts))
+    )
+    return list(zip(
+        sensor_ids.tolist(),
+        (datetime.fromtimestamp(b, timezone.utc) for b in buckets.tolist()),
+        counts.tolist(),
+        minimums.tolist(),
+        maximums.tolist(),
+        (totals / counts).tolist(),
+    ))
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from secrets import compare_digest
+from typing import Optional
+
+from ..config import ADMIN_TOKEN, PROFILE_MAX_SECONDS
+from ..profiling import profiler
+from ..tracing import kept_traces
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if ADMIN_TOKEN is None:
+        # Without a token the admin routes do not exist
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Compared as bytes, which compare_digest takes with any characters
+    expected = f"Bearer {ADMIN_TOKEN}".encode()
+    if not compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/traces")
+def read_traces():
+    """The most recent traces kept by head or tail sampling."""
+    return list(kept_traces)
+
+
+@router.post("/profile", status_code=202)
+def start_profile(
+    seconds: float = Query(30, gt=0, le=PROFILE_MAX_SECONDS)
+):
+    """Open a profiling window of `seconds`."""
+    if not profiler.start(seconds):
+        raise HTTPException(
+            status_code=409, detail="A profile is already running"
+        )
+    return profiler.status()
+
+
+@router.get("/profile")
+def read_profile_status():
+    return profiler.status()
+
+
+@router.delete("/profile")
+def stop_profile():
+    """Close the profiling window early."""
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/profile/folded", response_class=PlainTextResponse)
+def read_profile_stacks():
+    """Sampled stacks of the last window, in folded format."""
+    return profiler.folded()
@@ -0,0 +1,223 @@
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from .. import schemas, async_crud
+from ..dependencies import get_async_db, get_async_read_db
+from ..etags import parse_if_match
+from ..responses import FastJSONResponse
+from .common import (
+    already_registered,
+    bad_request,
+    batch_conflict,
+    entity_response,
+    node_cursor,
+    not_found,
+    not_modified,
+    page_response,
+    update_errors,
+    updated_entity,
+)
+
+router = APIRouter(prefix="/nodes", tags=["nodes"])
+
+
+@router.get("/", response_model=List[schemas.NodeResponse])
+async def read_nodes(
+    serial_number: Optional[str] = Query(None),
+    firmware_version: Optional[str] = Query(None),
+    offset: int = 0,
+    limit: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    with bad_request():
+        nodes = await async_crud.get_nodes(
+            db,
+            offset=offset,
+            limit=limit,
+            serial_number=serial_number,
+            firmware_version=firmware_version,
+            cursor=cursor,
+            fields=fields
+        )
+    return page_response(nodes, limit, node_cursor)
+
+
+@router.get("/full", response_model=List[schemas.Node])
+async def read_nodes_with_sensors(
+    node_id: Optional[List[schemas.EntityId]] = Query(None),
+    serial_number: Optional[str] = Query(None),
+    firmware_version: Optional[str] = Query(None),
+    offset: int = 0,
+    limit: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """List nodes with their sensors, in two queries for the whole page."""
+    with bad_request():
+        nodes = await async_crud.get_nodes_with_sensors(
+            db,
+            offset=offset,
+            limit=limit,
+            serial_number=serial_number,
+            firmware_version=firmware_version,
+            cursor=cursor,
+            node_ids=node_id
+        )
+    return page_response(nodes, limit, node_cursor)
+
+
+@router.get("/latest", response_model=List[schemas.NodeLatest])
+async def read_nodes_latest(
+    node_id: List[schemas.EntityId] = Query(...),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Latest reading of every sensor on each of the given nodes.
+
+    Unknown node ids are left out of the result.
+    """
+    return await async_crud.get_nodes_latest(db, node_id)
+
+
+@router.get("/{node_id}", response_model=schemas.NodeResponse)
+async def read_node(
+    node_id: schemas.EntityId,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    with bad_request():
+        names = async_crud.node_fields(fields)
+    if if_none_match:
+        # Answer revalidations from the version alone
+        version = await async_crud.get_node_version(db, node_id)
+        cached = not_modified(if_none_match, version)
+        if cached:
+            return cached
+    node = await async_crud.get_node_cached(db, node_id)
+    return entity_response(node, names, "Node")
+
+
+@router.post("/", response_model=schemas.NodeResponse, status_code=201)
+async def create_node(
+    node: schemas.NodeCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        return await async_crud.create_node(db=db, node=node)
+    except IntegrityError:
+        await db.rollback()
+        raise already_registered("Node")
+
+
+@router.post("/bulk", response_model=List[schemas.NodeBulkResult])
+async def create_nodes_bulk(
+    nodes: List[schemas.NodeCreate],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Register many nodes at once, reporting a result per item."""
+    try:
+        return await async_crud.create_nodes_bulk(db=db, nodes=nodes)
+    except IntegrityError:
+        await db.rollback()
+        raise batch_conflict(
+            "Batch conflicts with concurrently registered nodes"
+        )
+
+
+@router.post(
+    "/sensors/bulk",
+    response_model=List[schemas.SensorAttachBulkResult]
+)
+async def attach_sensors_bulk(
+    attachments: List[schemas.SensorAttachment],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Attach many sensors to nodes at once, reporting a result per pair."""
+    try:
+        return await async_crud.attach_sensors_bulk(
+            db=db, attachments=attachments
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise batch_conflict("Batch conflicts with concurrent changes")
+
+
+@router.put("/{node_id}", response_model=schemas.NodeResponse)
+async def update_node(
+    node_id: schemas.EntityId,
+    node_update: schemas.NodeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    with update_errors():
+        db_node = await async_crud.update_node(
+            db,
+            node_id,
+            node_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(db_node, response, "Node")
+
+
+@router.patch("/{node_id}", response_model=schemas.NodeResponse)
+async def partial_update_node(
+    node_id: schemas.EntityId,
+    node_update: schemas.NodeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    with update_errors():
+        db_node = await async_crud.update_node(
+            db,
+            node_id,
+            node_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(db_node, response, "Node")
+
+
+@router.get("/{node_id}/full", response_model=schemas.Node)
+async def read_node_with_sensors(
+    node_id: schemas.EntityId,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get a node with its associated sensors."""
+    node = await async_crud.get_node_with_sensors(db, node_id)
+    if node is None:
+        raise not_found("Node")
+    return FastJSONResponse(node)
+
+
+@router.get(
+    "/{node_id}/latest",
+    response_model=List[schemas.LatestReading]
+)
+async def read_node_latest(
+    node_id: schemas.EntityId,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Latest reading of every sensor on the node, served from memory."""
+    result = await async_crud.get_nodes_latest(db, [node_id])
+    if not result:
+        raise not_found("Node")
+    return result[0].readings
+
+
+@router.post("/{node_id}/sensors", response_model=schemas.SensorResponse)
+async def attach_sensor(
+    node_id: schemas.EntityId,
+    sensor_request: schemas.SensorAttachRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    result = await async_crud.attach_sensor_to_node(
+        db, node_id, sensor_request.sensor_id
+    )
+    if not result:
+        raise not_found("Node or Sensor")
+    return result
@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from .. import schemas, async_crud
+from ..dependencies import get_async_db, get_async_read_db
+from ..etags import parse_if_match
+from .common import (
+    already_registered,
+    bad_request,
+    batch_conflict,
+    entity_response,
+    not_modified,
+    page_response,
+    require_sensor_fields,
+    sensor_cursor,
+    update_errors,
+    updated_entity,
+)
+
+router = APIRouter(prefix="/sensors", tags=["sensors"])
+
+
+@router.get("/", response_model=List[schemas.SensorResponse])
+async def read_sensors(
+    manufacturer: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    modality: Optional[str] = Query(None),
+    node_id: Optional[schemas.EntityId] = Query(None),
+    offset: int = 0,
+    limit: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    with bad_request():
+        results = await async_crud.get_sensors(
+            db,
+            offset=offset,
+            limit=limit,
+            manufacturer=manufacturer,
+            model=model,
+            modality=modality,
+            node_id=node_id,
+            cursor=cursor,
+            fields=fields
+        )
+    return page_response(results, limit, sensor_cursor)
+
+
+@router.get("/{sensor_id}", response_model=schemas.SensorResponse)
+async def read_sensor(
+    sensor_id: schemas.EntityId,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    with bad_request():
+        names = async_crud.sensor_fields(fields)
+    if if_none_match:
+        # Answer revalidations from the version alone
+        version = await async_crud.get_sensor_version(db, sensor_id)
+        cached = not_modified(if_none_match, version)
+        if cached:
+            return cached
+    result = await async_crud.get_sensor_cached(db, sensor_id)
+    return entity_response(result, names, "Sensor")
+
+
+@router.post("/", response_model=schemas.SensorResponse, status_code=201)
+async def create_sensor(
+    sensor: schemas.SensorCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    require_sensor_fields(sensor)
+    try:
+        return await async_crud.create_sensor(db=db, sensor=sensor)
+    except IntegrityError:
+        await db.rollback()
+        raise already_registered("Sensor")
+
+
+@router.post("/bulk", response_model=List[schemas.SensorBulkResult])
+async def create_sensors_bulk(
+    sensors: List[schemas.SensorCreate],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Register many sensors at once, reporting a result per item."""
+    try:
+        return await async_crud.create_sensors_bulk(
+            db=db, sensors=sensors
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise batch_conflict(
+            "Batch conflicts with concurrently registered sensors"
+        )
+
+
+@router.put("/{sensor_id}", response_model=schemas.SensorResponse)
+async def update_sensor(
+    sensor_id: schemas.EntityId,
+    sensor_update: schemas.SensorUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    with update_errors():
+        result = await async_crud.update_sensor(
+            db,
+            sensor_id,
+            sensor_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(result, response, "Sensor")
+
+
+@router.patch("/{sensor_id}", response_model=schemas.SensorResponse)
+async def partial_update_sensor(
+    sensor_id: schemas.EntityId,
+    sensor_update: schemas.SensorUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    with update_errors():
+        result = await async_crud.update_sensor(
+            db,
+            sensor_id,
+            sensor_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(result, response, "Sensor")
@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+
+from ..crud import VersionConflict, project_fields
+from ..etags import etag_matches, make_etag
+from ..ids import NIL_ID
+from ..pagination import NEXT_CURSOR_HEADER, encode_cursor
+from ..responses import FastJSONResponse
+
+# Request and response handling shared by the sync and async node and
+# sensor routers, which only differ in calling crud or async_crud.
+
+
+@contextmanager
+def bad_request():
+    """Answer a ValueError (bad filter, cursor or field list) with 400."""
+    try:
+        yield
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@contextmanager
+def update_errors():
+    """Map the ways a conditional update fails to a response.
+
+    A malformed or stale If-Match is 412. An IntegrityError, already
+    rolled back by crud, means a taken serial number or a nulled
+    required field and is 400.
+    """
+    try:
+        yield
+    except (ValueError, VersionConflict) as exc:
+        raise HTTPException(status_code=412, detail=str(exc))
+    except IntegrityError:
+        raise HTTPException(
+            status_code=400,
+            detail="Serial number already registered or field missing"
+        )
+
+
+def not_found(label: str):
+    return HTTPException(status_code=404, detail=f"{label} not found")
+
+
+def already_registered(label: str):
+    # The serial number or id is already taken
+    return HTTPException(
+        status_code=400,
+        detail=f"{label} already registered"
+    )
+
+
+def batch_conflict(detail: str):
+    # A concurrent writer claimed one of the serials or ids
+    return HTTPException(status_code=409, detail=detail)
+
+
+def require_sensor_fields(sensor):
+    if not all([sensor.manufacturer, sensor.model, sensor.modality]):
+        raise HTTPException(
+            status_code=400,
+            detail="Manufacturer, model, and modality are required"
+        )
+
+
+def node_cursor(node: dict):
+    return (node["id"],)
+
+
+def sensor_cursor(sensor: dict):
+    return (sensor["id"], sensor["node_id"] or NIL_ID)
+
+
+def page_response(
+    rows: List[dict],
+    limit: Optional[int],
+    cursor_key: Callable[[dict], tuple]
+):
+    """The page as JSON, with a cursor header when it is full.
+
+    A full page may have more rows behind it.
+    """
+    headers = {}
+    if limit and len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*cursor_key(rows[-1]))
+    return FastJSONResponse(rows, headers=headers)
+
+
+def not_modified(if_none_match: str, version: Optional[int]):
+    """A 304 if the client's copy is at version, else None."""
+    if version is not None and etag_matches(if_none_match, version):
+        return Response(
+            status_code=304,
+            headers={"ETag": make_etag(version)}
+        )
+    return None
+
+
+def entity_response(entity: Optional[dict], names, label: str):
+    """The requested fields of entity with its ETag, or 404."""
+    if entity is None:
+        raise not_found(label)
+    return FastJSONResponse(
+        project_fields(entity, names),
+        headers={"ETag": make_etag(entity["version"])}
+    )
+
+
+def updated_entity(entity: Optional[dict], response: Response, label: str):
+    """entity after a write, with its new ETag, or 404."""
+    if not entity:
+        raise not_found(label)
+    response.headers["ETag"] = make_etag(entity["version"])
+    return entity
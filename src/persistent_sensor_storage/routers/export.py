@@ -0,0 +1,100 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+
+from .. import crud, schemas
+from ..dependencies import get_db
+from ..export import (
+    COLUMNAR_FORMATS,
+    FORMATS,
+    arrow_available,
+    arrow_chunks,
+    csv_chunks,
+    ndjson_chunks,
+    parquet_chunks
+)
+from ..rollups import as_utc
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+ExportFormat = Literal["ndjson", "csv", "arrow", "parquet"]
+
+SERIALIZERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+    "arrow": arrow_chunks,
+    "parquet": parquet_chunks,
+}
+
+
+def stream_export(db: Session, name: str, format: str, columns, batches):
+    """Stream row batches from `batches()` in the requested format."""
+    if format in COLUMNAR_FORMATS and not arrow_available():
+        raise HTTPException(
+            status_code=501,
+            detail=f"{format} export requires the pyarrow package"
+        )
+
+    def body():
+        # The generator outlives the request handler, so it owns the
+        # session's cleanup once streaming is done
+        try:
+            yield from SERIALIZERS[format](columns, batches())
+        finally:
+            db.close()
+
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition":
+                f'attachment; filename="{name}.{extension}"'
+        }
+    )
+
+
+@router.get("/inventory")
+def export_inventory(
+    format: ExportFormat = Query("ndjson"),
+    batch_size: int = Query(1000, ge=1, le=50000),
+    db: Session = Depends(get_db)
+):
+    """Stream every sensor with its node_id.
+
+    Formats are NDJSON, CSV, an Arrow IPC stream or Parquet.
+    """
+    return stream_export(
+        db, "inventory", format, crud.INVENTORY_COLUMNS,
+        lambda: crud.iter_sensor_inventory(db, batch_size=batch_size)
+    )
+
+
+@router.get("/readings")
+def export_readings(
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    sensor_id: Optional[List[schemas.EntityId]] = Query(None),
+    format: ExportFormat = Query("arrow"),
+    batch_size: int = Query(10000, ge=1, le=100000),
+    db: Session = Depends(get_db)
+):
+    """Stream the readings in [start, end), optionally for some sensors.
+
+    Columnar formats carry typed columns (timestamps in UTC microseconds,
+    float64 values), one Arrow record batch or Parquet row group per
+    `batch_size` rows.
+    """
+    if as_utc(end) <= as_utc(start):
+        raise HTTPException(
+            status_code=400,
+            detail="end must be later than start"
+        )
+    return stream_export(
+        db, "readings", format, crud.READING_EXPORT_COLUMNS,
+        lambda: crud.iter_readings(
+            db, start, end, sensor_ids=sensor_id, batch_size=batch_size
+        )
+    )
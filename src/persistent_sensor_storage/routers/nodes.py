@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from .. import schemas, crud
-from ..dependencies import get_db
+from ..dependencies import get_db, get_read_db
+from ..etags import parse_if_match
+from ..responses import FastJSONResponse
+from .common import (
+    already_registered,
+    bad_request,
+    batch_conflict,
+    entity_response,
+    node_cursor,
+    not_found,
+    not_modified,
+    page_response,
+    update_errors,
+    updated_entity,
+)
 
 router = APIRouter(prefix="/nodes", tags=["nodes"])
 
@@ -14,95 +29,184 @@ def read_nodes(
     firmware_version: Optional[str] = Query(None),
     offset: int = 0,
     limit: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
 ):
-    nodes = crud.get_nodes(
-        db,
-        offset=offset,
-        limit=limit,
-        serial_number=serial_number,
-        firmware_version=firmware_version
-    )
-    return nodes
+    with bad_request():
+        nodes = crud.get_nodes(
+            db,
+            offset=offset,
+            limit=limit,
+            serial_number=serial_number,
+            firmware_version=firmware_version,
+            cursor=cursor,
+            fields=fields
+        )
+    return page_response(nodes, limit, node_cursor)
+
+
+@router.get("/full", response_model=List[schemas.Node])
+def read_nodes_with_sensors(
+    node_id: Optional[List[schemas.EntityId]] = Query(None),
+    serial_number: Optional[str] = Query(None),
+    firmware_version: Optional[str] = Query(None),
+    offset: int = 0,
+    limit: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    """List nodes with their sensors, in two queries for the whole page."""
+    with bad_request():
+        nodes = crud.get_nodes_with_sensors(
+            db,
+            offset=offset,
+            limit=limit,
+            serial_number=serial_number,
+            firmware_version=firmware_version,
+            cursor=cursor,
+            node_ids=node_id
+        )
+    return page_response(nodes, limit, node_cursor)
+
+
+@router.get("/latest", response_model=List[schemas.NodeLatest])
+def read_nodes_latest(
+    node_id: List[schemas.EntityId] = Query(...),
+    db: Session = Depends(get_read_db)
+):
+    """Latest reading of every sensor on each of the given nodes.
+
+    Unknown node ids are left out of the result.
+    """
+    return crud.get_nodes_latest(db, node_id)
 
 
 @router.get("/{node_id}", response_model=schemas.NodeResponse)
-def read_node(node_id: str, db: Session = Depends(get_db)):
-    node = crud.get_node(db, node_id)
-    if node is None:
-        raise HTTPException(status_code=404, detail="Node not found")
-    return node
+def read_node(
+    node_id: schemas.EntityId,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    with bad_request():
+        names = crud.node_fields(fields)
+    if if_none_match:
+        # Answer revalidations from the version alone
+        version = crud.get_node_version(db, node_id)
+        cached = not_modified(if_none_match, version)
+        if cached:
+            return cached
+    node = crud.get_node_cached(db, node_id)
+    return entity_response(node, names, "Node")
 
 
 @router.post("/", response_model=schemas.NodeResponse, status_code=201)
 def create_node(node: schemas.NodeCreate, db: Session = Depends(get_db)):
-    # Only check for duplicate serial if one is provided
-    if node.serial_number:
-        db_node = crud.get_node_by_serial(
-            db, serial_number=node.serial_number
+    try:
+        return crud.create_node(db=db, node=node)
+    except IntegrityError:
+        db.rollback()
+        raise already_registered("Node")
+
+
+@router.post("/bulk", response_model=List[schemas.NodeBulkResult])
+def create_nodes_bulk(
+    nodes: List[schemas.NodeCreate],
+    db: Session = Depends(get_db)
+):
+    """Register many nodes at once, reporting a result per item."""
+    try:
+        return crud.create_nodes_bulk(db=db, nodes=nodes)
+    except IntegrityError:
+        db.rollback()
+        raise batch_conflict(
+            "Batch conflicts with concurrently registered nodes"
         )
-        if db_node:
-            raise HTTPException(
-                status_code=400,
-                detail="Node already registered"
-            )
-    
-    return crud.create_node(db=db, node=node)
+
+
+@router.post(
+    "/sensors/bulk",
+    response_model=List[schemas.SensorAttachBulkResult]
+)
+def attach_sensors_bulk(
+    attachments: List[schemas.SensorAttachment],
+    db: Session = Depends(get_db)
+):
+    """Attach many sensors to nodes at once, reporting a result per pair."""
+    try:
+        return crud.attach_sensors_bulk(db=db, attachments=attachments)
+    except IntegrityError:
+        db.rollback()
+        raise batch_conflict("Batch conflicts with concurrent changes")
 
 
 @router.put("/{node_id}", response_model=schemas.NodeResponse)
 def update_node(
-    node_id: str,
+    node_id: schemas.EntityId,
     node_update: schemas.NodeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    db_node = crud.update_node(
-        db, node_id, node_update)
-    if not db_node:
-        raise HTTPException(status_code=404, detail="Node not found")
-    return db_node
+    with update_errors():
+        db_node = crud.update_node(
+            db,
+            node_id,
+            node_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(db_node, response, "Node")
 
 
 @router.patch("/{node_id}", response_model=schemas.NodeResponse)
 def partial_update_node(
-    node_id: str,
+    node_id: schemas.EntityId,
     node_update: schemas.NodeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    db_node = crud.update_node(db, node_id, node_update)
-    if not db_node:
-        raise HTTPException(status_code=404, detail="Node not found")
-    return db_node
+    with update_errors():
+        db_node = crud.update_node(
+            db,
+            node_id,
+            node_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(db_node, response, "Node")
 
 
 @router.get("/{node_id}/full", response_model=schemas.Node)
-def read_node_with_sensors(node_id: str, db: Session = Depends(get_db)):
+def read_node_with_sensors(
+    node_id: schemas.EntityId,
+    db: Session = Depends(get_read_db)
+):
     """Get a node with its associated sensors."""
-    node = crud.get_node(db, node_id)
+    node = crud.get_node_with_sensors(db, node_id)
     if node is None:
-        raise HTTPException(status_code=404, detail="Node not found")
-    
-    # Convert each sensor to a SensorResponse
-    sensors = [
-        schemas.SensorResponse(
-            **sensor.__dict__,
-            node_id=node_id
-        )
-        for sensor in node.sensors
-    ]
-    
-    # Return node with sensors list
-    return schemas.Node(
-        id=node.id,
-        serial_number=node.serial_number,
-        firmware_version=node.firmware_version,
-        sensors=sensors
-    )
+        raise not_found("Node")
+    return FastJSONResponse(node)
+
+
+@router.get(
+    "/{node_id}/latest",
+    response_model=List[schemas.LatestReading]
+)
+def read_node_latest(
+    node_id: schemas.EntityId,
+    db: Session = Depends(get_read_db)
+):
+    """Latest reading of every sensor on the node, served from memory."""
+    result = crud.get_nodes_latest(db, [node_id])
+    if not result:
+        raise not_found("Node")
+    return result[0].readings
 
 
 @router.post("/{node_id}/sensors", response_model=schemas.SensorResponse)
 def attach_sensor(
-    node_id: str,
+    node_id: schemas.EntityId,
     sensor_request: schemas.SensorAttachRequest,
     db: Session = Depends(get_db)
 ):
@@ -110,8 +214,5 @@ def attach_sensor(
         db, node_id, sensor_request.sensor_id
     )
     if not result:
-        raise HTTPException(
-            status_code=404,
-            detail="Node or Sensor not found"
-        )
+        raise not_found("Node or Sensor")
     return result
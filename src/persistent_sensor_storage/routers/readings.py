@@ -0,0 +1,63 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List
+
+from .. import schemas, crud
+from ..dependencies import get_db
+from ..rollups import as_utc, parse_resolution
+
+router = APIRouter(prefix="/readings", tags=["readings"])
+
+
+@router.post("/", response_model=schemas.ReadingIngestResult)
+def ingest_readings(
+    readings: List[schemas.ReadingCreate],
+    db: Session = Depends(get_db)
+):
+    """Store a batch of readings, possibly spanning many sensors.
+
+    Readings already stored for the same sensor and timestamp are
+    skipped, so a node can safely retry an upload.
+    """
+    try:
+        return crud.ingest_readings(db=db, readings=readings)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Batch conflicts with concurrent changes"
+        )
+
+
+@router.get("/aggregates", response_model=List[schemas.ReadingAggregate])
+def read_aggregates(
+    sensor_id: List[schemas.EntityId] = Query(...),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    resolution: str = Query("1h"),
+    db: Session = Depends(get_db)
+):
+    """Count, min, max and mean per sensor per time bucket.
+
+    `resolution` is a bucket width such as "1m", "15m", "1h" or "1d".
+    Buckets are aligned to UTC, and buckets without readings are left
+    out.
+    """
+    try:
+        width = parse_resolution(resolution)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if as_utc(end) <= as_utc(start):
+        raise HTTPException(
+            status_code=400,
+            detail="end must be later than start"
+        )
+    return crud.get_reading_aggregates(
+        db,
+        sensor_ids=sensor_id,
+        start=start,
+        end=end,
+        resolution=width
+    )
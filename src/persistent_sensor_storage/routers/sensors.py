@@ -1,9 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from .. import schemas, crud
-from ..dependencies import get_db
+from ..dependencies import get_db, get_read_db
+from ..etags import parse_if_match
+from .common import (
+    already_registered,
+    bad_request,
+    batch_conflict,
+    entity_response,
+    not_modified,
+    page_response,
+    require_sensor_fields,
+    sensor_cursor,
+    update_errors,
+    updated_entity,
+)
 
 router = APIRouter(prefix="/sensors", tags=["sensors"])
 
@@ -13,73 +27,103 @@ def read_sensors(
     manufacturer: Optional[str] = Query(None),
     model: Optional[str] = Query(None),
     modality: Optional[str] = Query(None),
-    node_id: Optional[str] = Query(None),
+    node_id: Optional[schemas.EntityId] = Query(None),
     offset: int = 0,
     limit: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
 ):
-    results = crud.get_sensors(
-        db,
-        offset=offset,
-        limit=limit,
-        manufacturer=manufacturer,
-        model=model,
-        modality=modality,
-        node_id=node_id
-    )
-    return results
+    with bad_request():
+        results = crud.get_sensors(
+            db,
+            offset=offset,
+            limit=limit,
+            manufacturer=manufacturer,
+            model=model,
+            modality=modality,
+            node_id=node_id,
+            cursor=cursor,
+            fields=fields
+        )
+    return page_response(results, limit, sensor_cursor)
 
 
 @router.get("/{sensor_id}", response_model=schemas.SensorResponse)
-def read_sensor(sensor_id: str, db: Session = Depends(get_db)):
-    result = crud.get_sensor(db, sensor_id)
-    if result is None:
-        raise HTTPException(status_code=404, detail="Sensor not found")
-    return result
+def read_sensor(
+    sensor_id: schemas.EntityId,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    with bad_request():
+        names = crud.sensor_fields(fields)
+    if if_none_match:
+        # Answer revalidations from the version alone
+        version = crud.get_sensor_version(db, sensor_id)
+        cached = not_modified(if_none_match, version)
+        if cached:
+            return cached
+    result = crud.get_sensor_cached(db, sensor_id)
+    return entity_response(result, names, "Sensor")
 
 
 @router.post("/", response_model=schemas.SensorResponse, status_code=201)
 def create_sensor(sensor: schemas.SensorCreate, db: Session = Depends(get_db)):
-    # Only check for duplicate serial if one is provided
-    if sensor.serial_number:
-        result = crud.get_sensor_by_serial(
-            db, serial_number=sensor.serial_number
-        )
-        if result:
-            raise HTTPException(
-                status_code=400,
-                detail="Sensor already registered"
-            )
-    
-    # Validate required fields
-    if not all([sensor.manufacturer, sensor.model, sensor.modality]):
-        raise HTTPException(
-            status_code=400,
-            detail="Manufacturer, model, and modality are required"
+    require_sensor_fields(sensor)
+    try:
+        return crud.create_sensor(db=db, sensor=sensor)
+    except IntegrityError:
+        db.rollback()
+        raise already_registered("Sensor")
+
+
+@router.post("/bulk", response_model=List[schemas.SensorBulkResult])
+def create_sensors_bulk(
+    sensors: List[schemas.SensorCreate],
+    db: Session = Depends(get_db)
+):
+    """Register many sensors at once, reporting a result per item."""
+    try:
+        return crud.create_sensors_bulk(db=db, sensors=sensors)
+    except IntegrityError:
+        db.rollback()
+        raise batch_conflict(
+            "Batch conflicts with concurrently registered sensors"
         )
-    
-    return crud.create_sensor(db=db, sensor=sensor)
 
 
 @router.put("/{sensor_id}", response_model=schemas.SensorResponse)
 def update_sensor(
-    sensor_id: str,
+    sensor_id: schemas.EntityId,
     sensor_update: schemas.SensorUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    result = crud.update_sensor(db, sensor_id, sensor_update)
-    if not result:
-        raise HTTPException(status_code=404, detail="Sensor not found")
-    return result
+    with update_errors():
+        result = crud.update_sensor(
+            db,
+            sensor_id,
+            sensor_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(result, response, "Sensor")
 
 
 @router.patch("/{sensor_id}", response_model=schemas.SensorResponse)
 def partial_update_sensor(
-    sensor_id: str,
+    sensor_id: schemas.EntityId,
     sensor_update: schemas.SensorUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    result = crud.update_sensor(db, sensor_id, sensor_update)
-    if not result:
-        raise HTTPException(status_code=404, detail="Sensor not found")
-    return result
+    with update_errors():
+        result = crud.update_sensor(
+            db,
+            sensor_id,
+            sensor_update,
+            expected_version=parse_if_match(if_match)
+        )
+    return updated_entity(result, response, "Sensor")
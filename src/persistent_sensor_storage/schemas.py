@@ -1,12 +1,17 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from uuid import uuid4
+from pydantic import AfterValidator, BaseModel, Field, ConfigDict
+from datetime import datetime
+from typing import Annotated, Optional, List, Literal
+from .ids import new_id, normalize_id
+
+# Ids accepted from clients: any UUID spelling, normalized to the
+# canonical lowercase form the database hands back
+EntityId = Annotated[str, AfterValidator(normalize_id)]
 
 # --- Base Schema ---
 
 
 class EntityBase(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid4()))
+    id: EntityId = Field(default_factory=new_id)
 
     model_config = ConfigDict(validate_default=True)
 
@@ -33,15 +38,35 @@ class SensorUpdate(BaseModel):
 
 
 class SensorAttachRequest(BaseModel):
-    sensor_id: str
+    sensor_id: EntityId
+
+
+class SensorAttachment(BaseModel):
+    node_id: EntityId
+    sensor_id: EntityId
 
 
 class SensorResponse(SensorBase):
     node_id: Optional[str] = None
+    version: int = 1
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class SensorBulkResult(BaseModel):
+    index: int   # Position of the item in the submitted batch
+    status: Literal["created", "duplicate", "invalid"]
+    sensor: Optional[SensorResponse] = None
+    detail: Optional[str] = None
+
+
+class SensorAttachBulkResult(BaseModel):
+    index: int   # Position of the pair in the submitted batch
+    status: Literal["attached", "duplicate", "not_found"]
+    sensor: Optional[SensorResponse] = None
+    detail: Optional[str] = None
+
+
 # --- Node Schemas ---
 
 
@@ -60,8 +85,58 @@ class NodeUpdate(BaseModel):
 
 
 class NodeResponse(NodeBase):
+    version: int = 1
+
     model_config = ConfigDict(from_attributes=True)
 
 
+class NodeBulkResult(BaseModel):
+    index: int   # Position of the item in the submitted batch
+    status: Literal["created", "duplicate"]
+    node: Optional[NodeResponse] = None
+    detail: Optional[str] = None
+
+
 class Node(NodeResponse):
     sensors: List[SensorResponse] = []   # List of attached sensors
+
+
+# --- Reading Schemas ---
+
+
+class ReadingCreate(BaseModel):
+    sensor_id: EntityId
+    timestamp: datetime   # Naive timestamps are taken as UTC
+    value: float
+
+
+class ReadingRejection(BaseModel):
+    index: int   # Position of the reading in the submitted batch
+    detail: str
+
+
+class ReadingIngestResult(BaseModel):
+    received: int
+    written: int
+    duplicates: int   # Already stored, or repeated within the batch
+    rejected: List[ReadingRejection] = []
+
+
+class ReadingAggregate(BaseModel):
+    sensor_id: str
+    bucket: datetime   # Start of the bucket, UTC
+    count: int
+    min: float
+    max: float
+    mean: float
+
+
+class LatestReading(BaseModel):
+    sensor_id: str
+    timestamp: Optional[datetime] = None   # None until the first reading
+    value: Optional[float] = None
+
+
+class NodeLatest(BaseModel):
+    node_id: str
+    readings: List[LatestReading] = []
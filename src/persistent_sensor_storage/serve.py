@@ -0,0 +1,161 @@
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+from .config import (
+    CACHE_BACKEND,
+    LATEST_REFRESH_SECONDS,
+    METRICS_DIR,
+    METRICS_ENABLED,
+    WEB_BACKLOG,
+    WEB_GRACEFUL_TIMEOUT,
+    WEB_HOST,
+    WEB_HTTP,
+    WEB_KEEPALIVE_SECONDS,
+    WEB_LOOP,
+    WEB_PORT,
+    WEB_PRELOAD,
+    WEB_WORKERS,
+)
+from .database import dispose_after_fork, get_engine
+from .instrumentation import clear_metrics, retire_metrics
+from .latest import get_latest_values
+
+# Multi-worker production server: a gunicorn arbiter forking uvicorn
+# workers, started with `python -m src.persistent_sensor_storage.serve`.
+# The arbiter migrates the database once, then forks. With WEB_PRELOAD
+# the app is imported once in the arbiter and shared copy-on-write by
+# the workers. Each worker then runs the lifespan and opens its own pool.
+#
+# Workers share no memory, so more than one is only started when what
+# they must agree on lives outside of them: the read-through cache
+# (CACHE_BACKEND) and the metrics (METRICS_DIR). Each worker's latest-value
+# store then refreshes from the database, and only one worker per host
+# runs the retention job. Traces, profiles, slow queries and pool
+# statistics on /admin and /metrics/* are those of the answering worker.
+
+# Cache backends that cannot go stale in one worker after a write
+# through another
+SHARED_CACHE_BACKENDS = ("redis", "none")
+
+# Seconds after which a worker reloads a node's latest values, to see
+# what other workers ingested, unless LATEST_REFRESH_SECONDS is set
+WORKER_LATEST_REFRESH_SECONDS = 5.0
+
+
+def workers_share_state() -> bool:
+    """Whether several workers would serve the same data and metrics."""
+    return CACHE_BACKEND in SHARED_CACHE_BACKENDS and (
+        METRICS_DIR is not None or not METRICS_ENABLED
+    )
+
+
+def worker_count() -> int:
+    """WEB_WORKERS, or one worker per CPU when workers share state."""
+    if WEB_WORKERS > 0:
+        return WEB_WORKERS
+    if not workers_share_state():
+        return 1
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def latest_refresh_seconds(workers: int) -> float:
+    """Refresh interval of the latest-value store with `workers` workers.
+
+    A single worker sees every write itself and never refreshes unless
+    LATEST_REFRESH_SECONDS asks it to.
+    """
+    if workers > 1:
+        return LATEST_REFRESH_SECONDS or WORKER_LATEST_REFRESH_SECONDS
+    return LATEST_REFRESH_SECONDS
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": WEB_LOOP,
+        "http": WEB_HTTP,
+        "lifespan": "on",
+        # Give up on requests still running just before the arbiter's
+        # graceful timeout, so the lifespan shutdown still gets to run
+        "timeout_graceful_shutdown": max(WEB_GRACEFUL_TIMEOUT - 1, 1),
+    }
+
+
+def post_fork(server, worker):
+    # Nothing connects at import, but anything the arbiter did open must
+    # not be shared with the workers
+    dispose_after_fork()
+
+
+def child_exit(server, worker):
+    if METRICS_ENABLED and METRICS_DIR is not None:
+        retire_metrics(worker.pid)
+
+
+def server_options() -> dict:
+    workers = worker_count()
+    if workers > 1 and not workers_share_state():
+        raise ValueError(
+            f"{workers} workers need CACHE_BACKEND=redis or none and, "
+            "unless METRICS_ENABLED=false, METRICS_DIR; otherwise each "
+            "worker serves its own cache and metrics"
+        )
+    return {
+        "bind": f"{WEB_HOST}:{WEB_PORT}",
+        "workers": workers,
+        "worker_class": f"{__name__}.Worker",
+        "preload_app": WEB_PRELOAD,
+        "keepalive": WEB_KEEPALIVE_SECONDS,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "backlog": WEB_BACKLOG,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+    }
+
+
+class Server(BaseApplication):
+    """gunicorn application serving create_app()."""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .main import create_app
+        return create_app(prepare=False)
+
+
+def prepare():
+    """Startup work done once for all workers, in the arbiter."""
+    from .main import prepare_database
+
+    engine = get_engine()
+    prepare_database(engine)
+    # The workers open connections of their own
+    engine.dispose()
+    if METRICS_ENABLED and METRICS_DIR is not None:
+        clear_metrics()
+
+
+def main():
+    try:
+        options = server_options()
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    prepare()
+    # Set before forking, so every worker inherits it
+    get_latest_values().refresh_seconds = latest_refresh_seconds(
+        options["workers"]
+    )
+    Server(options).run()
+
+
+if __name__ == "__main__":
+    main()
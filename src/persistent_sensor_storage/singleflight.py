@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import threading
+
+from .cache import write_generation
+from .config import COALESCE_READS
+
+# Single-flight coalescing of identical concurrent reads. The first caller
+# for a key runs the query. Callers that arrive while it is in flight wait
+# for it and share its result, or its exception, instead of sending the
+# same query again. Nothing is kept once the query finishes.
+#
+# Keys include the process's write generation, which every committed
+# write bumps through cache.invalidate(). A read arriving after a write
+# therefore never joins a query started before it, and a client reads its
+# own writes. Shared results go to several requests and must not be
+# mutated.
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self, done):
+        self.done = done
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces calls with equal keys across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, load):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(threading.Event())
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = load()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Coalesces calls with equal keys within each event loop."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, load):
+        key = (asyncio.get_running_loop(), key)
+        call = self._calls.get(key)
+        if call is not None:
+            await call.done.wait()
+            if isinstance(call.error, asyncio.CancelledError):
+                # The leader's request went away; it says nothing about
+                # this one, which runs the query itself
+                return await self.do(key[1], load)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        call = self._calls[key] = _Call(asyncio.Event())
+        try:
+            call.result = await load()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            del self._calls[key]
+            call.done.set()
+
+
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+
+def freeze(value):
+    """A hashable stand-in for a call argument."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def call_key(function, bind, args, kwargs):
+    # Sessions on different databases (primary, replicas) never share
+    return (
+        function.__qualname__,
+        bind,
+        write_generation(),
+        freeze(args),
+        tuple(sorted((name, freeze(v)) for name, v in kwargs.items())),
+    )
+
+
+def coalesce(function):
+    """Share the result of identical concurrent calls of a read.
+
+    For functions taking the Session first and returning plain data,
+    never ORM instances, which belong to the session that loaded them.
+    """
+    if not COALESCE_READS:
+        return function
+
+    @functools.wraps(function)
+    def coalesced(db, *args, **kwargs):
+        key = call_key(function, db.get_bind(), args, kwargs)
+        return flights.do(key, lambda: function(db, *args, **kwargs))
+    return coalesced
+
+
+def coalesce_async(function):
+    """coalesce for coroutine functions taking an AsyncSession first."""
+    if not COALESCE_READS:
+        return function
+
+    @functools.wraps(function)
+    async def coalesced(db, *args, **kwargs):
+        key = call_key(function, db.bind, args, kwargs)
+        return await async_flights.do(
+            key, lambda: function(db, *args, **kwargs)
+        )
+    return coalesced
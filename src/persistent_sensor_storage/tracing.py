@@ -0,0 +1,151 @@
+import contextvars
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy import event
+
+from .config import TRACE_LOG_SIZE, TRACE_SLOW_SECONDS, TRACES_SAMPLE_RATE
+from .instrumentation import route_label, statement_verb
+
+# In-process request tracing with head and tail sampling. Every request
+# records a cheap trace (one tuple per SQL statement). When the request
+# ends, the trace is kept only if it was sampled up front, failed, or was
+# slow. Everything else is dropped without leaving the process. Slow and
+# failed traces are also logged, which makes them Sentry events when
+# Sentry is set up.
+
+# Statements recorded per trace; the rest are only counted
+TRACE_MAX_SPANS = 200
+
+# Statement text kept per span
+SPAN_STATEMENT_CHARS = 500
+
+# Kept traces, newest last
+kept_traces = deque(maxlen=TRACE_LOG_SIZE)
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Statement spans of one request, in offsets from its start."""
+
+    __slots__ = ("scope", "start", "started_at", "sampled", "spans",
+                 "dropped_spans")
+
+    def __init__(self, scope, sampled: bool):
+        self.scope = scope
+        self.start = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.sampled = sampled
+        self.spans = []
+        self.dropped_spans = 0
+
+    def add_span(self, statement: str, start: float, end: float) -> None:
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append((statement, start - self.start, end - start))
+        else:
+            self.dropped_spans += 1
+
+    def as_dict(self, reason: str, status: int, seconds: float) -> dict:
+        return {
+            "reason": reason,
+            "method": self.scope["method"],
+            "route": route_label(self.scope),
+            "path": self.scope["path"],
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "seconds": seconds,
+            "spans": [
+                {
+                    "verb": statement_verb(statement),
+                    "offset": offset,
+                    "seconds": duration,
+                    "statement": statement[:SPAN_STATEMENT_CHARS],
+                }
+                for statement, offset, duration in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+def head_sampled() -> bool:
+    return random.random() < TRACES_SAMPLE_RATE
+
+
+def keep_reason(sampled: bool, status: int, seconds: float):
+    """Why a finished trace is kept, or None to drop it."""
+    if status >= 500:
+        return "error"
+    if TRACE_SLOW_SECONDS and seconds >= TRACE_SLOW_SECONDS:
+        return "slow"
+    if sampled:
+        return "sampled"
+    return None
+
+
+class TracingMiddleware:
+    """ASGI middleware tracing each request, keeping the ones that matter."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(scope, head_sampled())
+        status = 500   # Unless the app gets as far as responding
+        token = _trace.set(trace)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _trace.reset(token)
+            finish(trace, status)
+
+
+def finish(trace: Trace, status: int) -> None:
+    seconds = time.perf_counter() - trace.start
+    reason = keep_reason(trace.sampled, status, seconds)
+    if reason is None:
+        return
+    kept = trace.as_dict(reason, status, seconds)
+    kept_traces.append(kept)
+    if reason != "sampled":
+        logging.warning(
+            "Traced %s request %s %s: %.3fs, %d statements",
+            reason, kept["method"], kept["route"], seconds,
+            len(trace.spans) + trace.dropped_spans,
+            extra={"trace": kept}
+        )
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    context._trace_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    trace = _trace.get()
+    if trace is not None:
+        trace.add_span(
+            statement, context._trace_start, time.perf_counter()
+        )
+
+
+def trace_engine(engine) -> None:
+    """Record the statements of a sync or async engine in request traces."""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
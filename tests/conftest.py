@@ -1,10 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
-from src.persistent_sensor_storage.database import engine, reset_database
+from src.persistent_sensor_storage.cache import get_cache
+from src.persistent_sensor_storage.database import get_engine, reset_database
+from src.persistent_sensor_storage.latest import get_latest_values
 from src.persistent_sensor_storage.main import app
 from src.persistent_sensor_storage.dependencies import get_db
 
+engine = get_engine()
 TestingSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -16,6 +20,8 @@ TestingSessionLocal = sessionmaker(
 def db():
     # Reset database to clean state before each test
     reset_database()
+    get_cache().clear()
+    get_latest_values().clear()
 
     # Create a new session for the test
     db = TestingSessionLocal()
@@ -39,3 +45,16 @@ def client(db):
     
     # Remove the override after the test
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def statements():
+    """SQL statements sent to the database while the test runs."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,193 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.persistent_sensor_storage.database import reset_database
+from src.persistent_sensor_storage.dependencies import (
+    get_async_db,
+    get_async_read_db,
+)
+from src.persistent_sensor_storage.routers import async_nodes, async_sensors
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture(scope="function")
+def async_client():
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.persistent_sensor_storage.database import async_database_url
+
+    reset_database()
+    engine = create_async_engine(async_database_url())
+    session_factory = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(async_nodes.router)
+    app.include_router(async_sensors.router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+
+
+def test_async_database_url():
+    from src.persistent_sensor_storage.database import async_database_url
+
+    assert async_database_url("sqlite:///./x.db") == (
+        "sqlite+aiosqlite:///./x.db"
+    )
+    assert async_database_url("postgresql+psycopg2://u:p@h/db") == (
+        "postgresql+asyncpg://u:p@h/db"
+    )
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@h/db")
+
+
+@pytest.mark.integration
+def test_async_node_sensor_roundtrip(async_client):
+    response = async_client.post(
+        "/nodes", json={
+            "serial_number": "ASYNCNODE",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 201
+    node_id = response.json()["id"]
+
+    response = async_client.post(
+        "/nodes", json={
+            "serial_number": "ASYNCNODE",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 400
+
+    response = async_client.post(
+        "/sensors",
+        json={
+            "serial_number": "ASYNCSENSOR",
+            "manufacturer": "Test Mfg",
+            "model": "TempSensor",
+            "modality": "temperature"
+        })
+    assert response.status_code == 201
+    sensor_id = response.json()["id"]
+
+    response = async_client.post(
+        f"/nodes/{node_id}/sensors",
+        json={"sensor_id": sensor_id}
+    )
+    assert response.status_code == 200
+    assert response.json()["node_id"] == node_id
+
+    response = async_client.patch(
+        f"/nodes/{node_id}",
+        json={"firmware_version": "2.0.0"}
+    )
+    assert response.json()["firmware_version"] == "2.0.0"
+
+    response = async_client.get(f"/nodes/{node_id}/full")
+    assert response.status_code == 200
+    assert [s["id"] for s in response.json()["sensors"]] == [sensor_id]
+
+    response = async_client.get(f"/nodes/full?node_id={node_id}")
+    assert response.status_code == 200
+    assert [s["id"] for s in response.json()[0]["sensors"]] == [sensor_id]
+
+    response = async_client.get(f"/sensors/?node_id={node_id}")
+    assert [s["id"] for s in response.json()] == [sensor_id]
+
+    response = async_client.put(
+        f"/sensors/{sensor_id}",
+        json={"manufacturer": "New Mfg"}
+    )
+    assert response.json()["manufacturer"] == "New Mfg"
+    assert response.json()["node_id"] == node_id
+
+
+@pytest.mark.integration
+def test_async_update_constraint_violations(async_client):
+    response = async_client.post(
+        "/nodes", json={
+            "serial_number": "ASYNCTAKEN",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 201
+    response = async_client.post(
+        "/nodes", json={
+            "serial_number": "ASYNCFREE",
+            "firmware_version": "1.0.0"
+        })
+    node_id = response.json()["id"]
+    response = async_client.put(
+        f"/nodes/{node_id}",
+        json={"serial_number": "ASYNCTAKEN"}
+    )
+    assert response.status_code == 400
+    response = async_client.patch(
+        f"/nodes/{node_id}",
+        json={"firmware_version": None}
+    )
+    assert response.status_code == 400
+
+    response = async_client.post(
+        "/sensors",
+        json={
+            "manufacturer": "Test Mfg",
+            "model": "TempSensor",
+            "modality": "temperature"
+        })
+    sensor_id = response.json()["id"]
+    response = async_client.patch(
+        f"/sensors/{sensor_id}",
+        json={"manufacturer": None}
+    )
+    assert response.status_code == 400
+    response = async_client.get(f"/sensors/{sensor_id}")
+    assert response.json()["manufacturer"] == "Test Mfg"
+
+
+@pytest.mark.integration
+def test_async_bulk_endpoints(async_client):
+    nodes = async_client.post(
+        "/nodes/bulk",
+        json=[
+            {"serial_number": f"ABULK{i}", "firmware_version": "1.0.0"}
+            for i in range(2)
+        ]).json()
+    sensors = async_client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"ABULKS{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(2)
+        ]).json()
+    assert [r["status"] for r in nodes + sensors] == ["created"] * 4
+
+    response = async_client.post(
+        "/nodes/sensors/bulk",
+        json=[
+            {
+                "node_id": nodes[0]["node"]["id"],
+                "sensor_id": s["sensor"]["id"]
+            }
+            for s in sensors
+        ])
+    assert [r["status"] for r in response.json()] == ["attached"] * 2
+
+    response = async_client.get(f"/nodes/{nodes[0]['node']['id']}/latest")
+    assert {r["sensor_id"] for r in response.json()} == {
+        s["sensor"]["id"] for s in sensors
+    }
+
+    response = async_client.get("/nodes/?limit=1")
+    assert response.headers.get("X-Next-Cursor")
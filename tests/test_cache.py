@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.persistent_sensor_storage import cache, crud, schemas
+
+
+class FakeRedis:
+    """Minimal stand-in for the redis-py client methods RedisCache uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "redis":
+        cache.configure_cache(cache.RedisCache(FakeRedis()))
+    else:
+        cache.configure_cache(cache.LRUCache())
+    yield request.param
+    cache.configure_cache(None)
+
+
+def test_lru_cache_evicts_and_expires():
+    lru = cache.LRUCache(max_entries=2, ttl=0.05)
+    lru.set("a", {"v": 1})
+    lru.set("b", {"v": 2})
+    assert lru.get("a") == {"v": 1}
+    # "b" is now least recently used
+    lru.set("c", {"v": 3})
+    assert lru.get("b") is None
+    assert lru.get("a") == {"v": 1}
+    time.sleep(0.06)
+    assert lru.get("a") is None
+
+
+@pytest.mark.integration
+def test_repeated_node_reads_hit_cache(client, backend, statements):
+    node_id = client.post(
+        "/nodes", json={
+            "serial_number": "CACHENODE",
+            "firmware_version": "1.0.0"
+        }).json()["id"]
+
+    client.get(f"/nodes/{node_id}")
+    statements.clear()
+    for _ in range(3):
+        response = client.get(f"/nodes/{node_id}")
+        assert response.status_code == 200
+    assert statements == []
+
+    client.patch(f"/nodes/{node_id}", json={"firmware_version": "2.0.0"})
+    response = client.get(f"/nodes/{node_id}")
+    assert response.json()["firmware_version"] == "2.0.0"
+
+
+@pytest.mark.integration
+def test_sensor_cache_invalidated_on_attach(client, backend, statements):
+    node_id = client.post(
+        "/nodes", json={
+            "serial_number": "CACHENODE2",
+            "firmware_version": "1.0.0"
+        }).json()["id"]
+    sensor_id = client.post(
+        "/sensors",
+        json={
+            "serial_number": "CACHESENSOR",
+            "manufacturer": "Test Mfg",
+            "model": "TempSensor",
+            "modality": "temperature"
+        }).json()["id"]
+
+    assert client.get(f"/sensors/{sensor_id}").json()["node_id"] is None
+    statements.clear()
+    assert client.get(f"/sensors/{sensor_id}").json()["node_id"] is None
+    assert statements == []
+
+    client.post(f"/nodes/{node_id}/sensors", json={"sensor_id": sensor_id})
+    assert client.get(f"/sensors/{sensor_id}").json()["node_id"] == node_id
+
+    client.put(f"/sensors/{sensor_id}", json={"model": "NewModel"})
+    assert client.get(f"/sensors/{sensor_id}").json()["model"] == "NewModel"
+
+
+@pytest.mark.integration
+def test_read_through_skips_value_loaded_before_a_write(db, backend):
+    node = crud.create_node(db, schemas.NodeCreate(
+        serial_number="RACENODE",
+        firmware_version="1.0.0"
+    ))
+    key = cache.node_key(node["id"])
+
+    def load():
+        stale = crud.node_dict(crud.get_node(db, node["id"]))
+        # A concurrent write commits before the loaded row is stored
+        crud.update_node(
+            db, node["id"], schemas.NodeUpdate(firmware_version="2.0.0")
+        )
+        return stale
+
+    assert cache.read_through(key, load)["firmware_version"] == "1.0.0"
+    assert cache.peek(key) is None
+    assert crud.get_node_cached(db, node["id"])["firmware_version"] == "2.0.0"
+    assert cache.peek(key)["firmware_version"] == "2.0.0"
+
+
+def test_async_read_through_skips_value_loaded_before_a_write(backend):
+    key = cache.node_key("racy")
+
+    async def load():
+        cache.invalidate(key)
+        return {"version": 1}
+
+    async def fresh():
+        return {"version": 2}
+
+    async def main():
+        assert await cache.read_through_async(key, load) == {"version": 1}
+        assert await cache.peek_async(key) is None
+        assert await cache.read_through_async(key, fresh) == {"version": 2}
+        return await cache.peek_async(key)
+
+    assert asyncio.run(main()) == {"version": 2}
+
+
+def test_async_redis_calls_leave_the_event_loop():
+    client = FakeRedis()
+    cache.configure_cache(cache.RedisCache(client))
+
+    async def main():
+        async def load():
+            return {"version": 1}
+        await cache.read_through_async("key", load)
+        return threading.get_ident()
+
+    try:
+        loop_thread = asyncio.run(main())
+    finally:
+        cache.configure_cache(None)
+    assert client.threads and loop_thread not in client.threads
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def _create_inventory(client):
+    node = client.post(
+        "/nodes", json={
+            "serial_number": "EXPNODE",
+            "firmware_version": "1.0.0"
+        }).json()
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"EXP{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(3)
+        ]).json()
+    client.post(
+        f"/nodes/{node['id']}/sensors",
+        json={"sensor_id": sensors[0]["sensor"]["id"]}
+    )
+    return node["id"], [s["sensor"]["id"] for s in sensors]
+
+
+@pytest.mark.integration
+def test_export_inventory_ndjson(client):
+    node_id, sensor_ids = _create_inventory(client)
+
+    response = client.get("/export/inventory?batch_size=2")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["id"] for r in rows) == sorted(sensor_ids)
+    by_id = {r["id"]: r for r in rows}
+    assert by_id[sensor_ids[0]]["node_id"] == node_id
+    assert by_id[sensor_ids[1]]["node_id"] is None
+
+
+@pytest.mark.integration
+def test_export_inventory_csv(client):
+    _, sensor_ids = _create_inventory(client)
+
+    response = client.get("/export/inventory?format=csv&batch_size=2")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted(r["id"] for r in rows) == sorted(sensor_ids)
+    assert rows[0]["manufacturer"] == "Test Mfg"
+
+
+@pytest.mark.integration
+def test_export_empty_inventory_csv(client):
+    response = client.get("/export/inventory?format=csv")
+    assert response.status_code == 200
+    assert response.text.strip() == (
+        "id,serial_number,manufacturer,model,modality,node_id"
+    )
+
+
+@pytest.mark.integration
+def test_export_inventory_arrow(client):
+    pa = pytest.importorskip("pyarrow")
+    node_id, sensor_ids = _create_inventory(client)
+
+    response = client.get("/export/inventory?format=arrow&batch_size=2")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == (
+        "application/vnd.apache.arrow.stream"
+    )
+    table = pa.ipc.open_stream(response.content).read_all()
+    rows = {r["id"]: r for r in table.to_pylist()}
+    assert sorted(rows) == sorted(sensor_ids)
+    assert rows[sensor_ids[0]]["node_id"] == node_id
+    assert rows[sensor_ids[1]]["node_id"] is None
+
+
+def _ingest_readings(client, sensor_id, start, count):
+    client.post("/readings/", json=[
+        {
+            "sensor_id": sensor_id,
+            "timestamp": (start + timedelta(minutes=i)).isoformat(),
+            "value": float(i)
+        }
+        for i in range(count)
+    ])
+
+
+@pytest.mark.integration
+def test_export_readings_parquet(client):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _, sensor_ids = _create_inventory(client)
+    start = datetime.now(timezone.utc).replace(
+        second=0, microsecond=0
+    ) - timedelta(hours=1)
+    for sensor_id in sensor_ids[:2]:
+        _ingest_readings(client, sensor_id, start, 5)
+
+    response = client.get("/export/readings", params={
+        "start": start.isoformat(),
+        "end": (start + timedelta(minutes=3)).isoformat(),
+        "sensor_id": sensor_ids[0],
+        "format": "parquet",
+        "batch_size": 2
+    })
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    # One row group per batch
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column_names == ["sensor_id", "timestamp", "value"]
+    assert table.column("value").to_pylist() == [0.0, 1.0, 2.0]
+    assert table.column("timestamp").to_pylist()[0] == start
+
+
+@pytest.mark.integration
+def test_export_readings_ndjson(client):
+    _, sensor_ids = _create_inventory(client)
+    start = datetime.now(timezone.utc).replace(microsecond=0)
+    _ingest_readings(client, sensor_ids[0], start, 2)
+
+    response = client.get("/export/readings", params={
+        "start": start.isoformat(),
+        "end": (start + timedelta(hours=1)).isoformat(),
+        "format": "ndjson"
+    })
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["value"] for r in rows] == [0.0, 1.0]
+    assert rows[0]["timestamp"] == start.isoformat()
@@ -107,3 +107,199 @@ def test_attach_sensor_to_node_error(client):
     )
     assert response.status_code == 404
     assert "not found" in response.json()["detail"]
+
+
+@pytest.mark.integration
+def test_pool_metrics(client):
+    # Make sure the pool has served at least one checkout
+    client.get("/nodes/")
+    response = client.get("/metrics/pool")
+    assert response.status_code == 200
+    sync_pool = response.json()["sync"]
+    assert sync_pool["pool"] == "InstrumentedQueuePool"
+    assert sync_pool["checkedout"] >= 0
+    assert sync_pool["timeouts"] == 0
+    histogram = sync_pool["checkout_seconds"]
+    assert histogram["count"] >= 1
+    assert histogram["buckets"]["+Inf"] == histogram["count"]
+
+
+def test_histogram_buckets():
+    from src.persistent_sensor_storage.metrics import Histogram
+
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(2.65)
+
+
+def test_hdr_histogram_quantiles():
+    from src.persistent_sensor_storage.metrics import HdrHistogram
+
+    histogram = HdrHistogram()
+    for micros in range(1, 100001):
+        histogram.observe(micros * 1e-6)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100000
+    # Within the 2 / 2**SUB_BUCKET_BITS relative error bound
+    for quantile, value in snapshot["quantiles"].items():
+        assert value == pytest.approx(quantile * 0.1, rel=0.016)
+
+
+def test_merge_metric_dumps():
+    import json
+    from src.persistent_sensor_storage.metrics import (
+        Registry, dump_registry, merge_dumps, render_prometheus
+    )
+
+    def worker(requests, connections):
+        registry = Registry()
+        registry.counter("requests", "Requests", ("route",)).labels(
+            "/health"
+        ).inc(requests)
+        registry.gauge("connections", "Connections").labels().set(connections)
+        summary = registry.summary("latency", "Latency")
+        for _ in range(requests):
+            summary.labels().observe(0.001)
+        # Through JSON, as the dumps go through files
+        return registry, json.loads(json.dumps(dump_registry(registry)))
+
+    registry, first = worker(2, 1)
+    _, second = worker(3, 4)
+    text = render_prometheus(merge_dumps(registry, [first, second]))
+    assert 'requests{route="/health"} 5' in text
+    assert "connections 5" in text
+    assert "latency_count 5" in text
+
+
+def test_exited_threads_fold_their_cells():
+    import threading
+    from src.persistent_sensor_storage.metrics import Counter, HdrHistogram
+
+    counter = Counter()
+    histogram = HdrHistogram()
+
+    def record():
+        counter.inc()
+        histogram.observe(0.001)
+
+    for _ in range(200):
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+    record()
+    assert counter.value() == 201
+    assert histogram.snapshot()["count"] == 201
+    # This thread's cell and the cell of retired threads
+    assert len(counter._cells.cells()) == 2
+    assert len(histogram._cells.cells()) == 2
+
+
+@pytest.mark.integration
+def test_prometheus_metrics(client):
+    node_id = client.post(
+        "/nodes/", json={"firmware_version": "1.0.0"}
+    ).json()["id"]
+    client.get(f"/nodes/{node_id}")
+    client.get(f"/nodes/{node_id}/full")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    # Labelled by route template, never by the raw path
+    assert any(
+        line.startswith("http_requests_total{")
+        and 'route="/nodes/{node_id}"' in line
+        for line in lines
+    )
+    assert not any(node_id in line for line in lines)
+    # One statement for the node with its sensors
+    assert (
+        'http_request_queries{method="GET",route="/nodes/{node_id}/full",'
+        'quantile="0.99"} 1' in lines
+    )
+    assert 'sql_query_duration_seconds_count{verb="INSERT"}' in response.text
+    assert 'db_pool_connections{engine="sync",state="size"}' in response.text
+
+
+@pytest.mark.integration
+def test_tail_sampled_traces(client, monkeypatch):
+    from src.persistent_sensor_storage import tracing
+    from src.persistent_sensor_storage.routers import admin
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(tracing, "TRACES_SAMPLE_RATE", 0)
+    tracing.kept_traces.clear()
+
+    # Fast and not sampled up front: dropped
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 60)
+    node_id = client.post(
+        "/nodes/", json={"firmware_version": "1.0.0"}
+    ).json()["id"]
+    assert len(tracing.kept_traces) == 0
+
+    # Slower than the threshold: kept with its statements
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 1e-9)
+    client.get(f"/nodes/{node_id}/full")
+    headers = {"Authorization": "Bearer secret"}
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 0)
+    traces = client.get("/admin/traces", headers=headers).json()
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["reason"] == "slow"
+    assert trace["route"] == "/nodes/{node_id}/full"
+    assert trace["status"] == 200
+    assert [span["verb"] for span in trace["spans"]] == ["SELECT"]
+
+
+@pytest.mark.integration
+def test_admin_profile(client, monkeypatch):
+    from src.persistent_sensor_storage.routers import admin
+    assert client.get("/admin/profile").status_code == 404
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profile").status_code == 401
+    non_ascii = {"Authorization": "Bearer s\xe9cret".encode("latin-1")}
+    response = client.get("/admin/profile", headers=non_ascii)
+    assert response.status_code == 401
+    headers = {"Authorization": "Bearer secret"}
+    response = client.post(
+        "/admin/profile", params={"seconds": 30}, headers=headers
+    )
+    assert response.status_code == 202
+    assert response.json()["running"] is True
+    response = client.post(
+        "/admin/profile", params={"seconds": 30}, headers=headers
+    )
+    assert response.status_code == 409
+    status = client.delete("/admin/profile", headers=headers).json()
+    assert status["running"] is False
+
+    response = client.get("/admin/profile/folded", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+@pytest.mark.integration
+def test_import_opens_no_connections(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    # Connecting to SQLite creates the file, so its absence shows that
+    # importing the app did not touch the database
+    database = tmp_path / "import.db"
+    subprocess.run(
+        [sys.executable, "-c", "import src.persistent_sensor_storage.main"],
+        cwd=Path(__file__).resolve().parents[1],
+        env=dict(os.environ, DATABASE_URL=f"sqlite:///{database}"),
+        check=True
+    )
+    assert not database.exists()
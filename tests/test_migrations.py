@@ -0,0 +1,79 @@
+import uuid
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+from src.persistent_sensor_storage.database import (
+    Base,
+    alembic_config,
+    ensure_database,
+)
+
+
+LEGACY_ID = "0b5b1c8e-9f3a-4d2e-8c71-5a4f2e9d3b10"
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _head():
+    return ScriptDirectory.from_config(alembic_config(None)).get_current_head()
+
+
+def _revision(engine):
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def test_migrations_match_models(scratch_engine):
+    with scratch_engine.connect() as connection:
+        command.upgrade(alembic_config(connection), "head")
+        connection.commit()
+        diff = compare_metadata(
+            MigrationContext.configure(connection), Base.metadata
+        )
+    assert diff == []
+
+
+def test_ensure_database_creates_and_stamps(scratch_engine):
+    ensure_database(scratch_engine)
+    assert _revision(scratch_engine) == _head()
+    tables = inspect(scratch_engine).get_table_names()
+    assert {
+        "nodes", "sensors", "node_sensor_association", "readings"
+    } <= set(tables)
+
+
+def test_ensure_database_upgrades_legacy_schema(scratch_engine):
+    # A database built by create_all before migrations existed
+    with scratch_engine.connect() as connection:
+        command.upgrade(alembic_config(connection), "0001")
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text(
+            "INSERT INTO nodes (id, serial_number, firmware_version) "
+            f"VALUES ('{LEGACY_ID}', 'LEGACY', '0.9')"
+        ))
+        connection.commit()
+
+    ensure_database(scratch_engine)
+
+    assert _revision(scratch_engine) == _head()
+    with scratch_engine.connect() as connection:
+        # Text ids are converted to 16-byte UUIDs
+        version = connection.execute(
+            text("SELECT version FROM nodes WHERE id = :id"),
+            {"id": uuid.UUID(LEGACY_ID).bytes}
+        ).scalar()
+    assert version == 1
+    indexes = {
+        index["name"]
+        for index in inspect(scratch_engine).get_indexes("sensors")
+    }
+    assert "ix_sensors_manufacturer_id" in indexes
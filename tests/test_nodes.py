@@ -1,5 +1,9 @@
+import uuid
 import pytest
 
+# Well formed, but never registered
+MISSING_ID = "123e4567-e89b-12d3-a456-426614174000"
+
 
 @pytest.mark.integration
 def test_create_and_get_node(client):
@@ -133,15 +137,45 @@ def test_attach_sensor_to_node(client):
 @pytest.mark.integration
 def test_node_id_format(client):
     # Test invalid node ID format
-    # There are no invalid node IDs in the current implementation
-    # response = client.get("/nodes/invalid-id")
-    # assert response.status_code == 422  # Validation error
+    response = client.get("/nodes/invalid-id")
+    assert response.status_code == 422  # Validation error
 
     # Test non-existent but valid format node ID
     response = client.get("/nodes/123e4567-e89b-12d3-a456-426614174000")
     assert response.status_code == 404  # Not found error
 
 
+@pytest.mark.integration
+def test_node_ids_are_time_ordered_uuids(client):
+    ids = [
+        client.post("/nodes/", json={"firmware_version": "1.0.0"}).json()["id"]
+        for _ in range(5)
+    ]
+    assert all(uuid.UUID(node_id).version == 7 for node_id in ids)
+    # Generated ids sort in creation order
+    assert ids == sorted(ids)
+
+
+@pytest.mark.integration
+def test_node_id_is_normalized(client):
+    node_id = str(uuid.uuid4())
+    response = client.post("/nodes/", json={
+        "id": node_id.upper(),
+        "firmware_version": "1.0.0"
+    })
+    assert response.status_code == 201
+    assert response.json()["id"] == node_id
+    response = client.get(f"/nodes/{node_id.upper()}")
+    assert response.status_code == 200
+    assert response.json()["id"] == node_id
+
+    response = client.post("/nodes/", json={
+        "id": "not-a-uuid",
+        "firmware_version": "1.0.0"
+    })
+    assert response.status_code == 422
+
+
 @pytest.mark.integration
 def test_node_update_optional_fields(client):
     # Create a node
@@ -162,3 +196,349 @@ def test_node_update_optional_fields(client):
     data = response.json()
     assert data["firmware_version"] == "2.0.0"
     assert data["serial_number"] == "SN101"  # Unchanged
+
+
+@pytest.mark.integration
+def test_node_update_constraint_violations(client):
+    response = client.post(
+        "/nodes", json={
+            "serial_number": "SN102",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 201
+    response = client.post(
+        "/nodes", json={
+            "serial_number": "SN103",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 201
+    node = response.json()
+
+    # Taking another node's serial number is rejected, not a 500
+    response = client.put(
+        f"/nodes/{node['id']}",
+        json={"serial_number": "SN102"}
+    )
+    assert response.status_code == 400
+
+    # The firmware version is required
+    response = client.patch(
+        f"/nodes/{node['id']}",
+        json={"firmware_version": None}
+    )
+    assert response.status_code == 400
+
+    # Nothing was written and the session is usable again
+    response = client.get(f"/nodes/{node['id']}")
+    assert response.status_code == 200
+    assert response.json() == node
+
+
+@pytest.mark.integration
+def test_bulk_create_nodes(client):
+    response = client.post(
+        "/nodes", json={
+            "serial_number": "BULKNODE0",
+            "firmware_version": "1.0.0"
+        })
+    assert response.status_code == 201
+
+    batch = [
+        {"serial_number": f"BULKNODE{i}", "firmware_version": "1.0.0"}
+        for i in range(4)
+    ]
+    response = client.post("/nodes/bulk", json=batch)
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [
+        "duplicate", "created", "created", "created"
+    ]
+    assert all(
+        isinstance(r["node"]["id"], str)
+        for r in results if r["status"] == "created"
+    )
+
+    response = client.get("/nodes/?firmware_version=1.0.0")
+    assert len(response.json()) == 4
+
+
+@pytest.mark.integration
+def test_bulk_attach_sensors(client):
+    nodes = client.post(
+        "/nodes/bulk",
+        json=[
+            {"serial_number": f"ATTNODE{i}", "firmware_version": "1.0.0"}
+            for i in range(2)
+        ]).json()
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"ATTSENSOR{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(3)
+        ]).json()
+    node_ids = [n["node"]["id"] for n in nodes]
+    sensor_ids = [s["sensor"]["id"] for s in sensors]
+
+    pairs = [
+        {"node_id": node_ids[0], "sensor_id": sensor_ids[0]},
+        {"node_id": node_ids[0], "sensor_id": sensor_ids[1]},
+        {"node_id": node_ids[1], "sensor_id": sensor_ids[2]},
+        # Same pair twice, then an unknown sensor
+        {"node_id": node_ids[1], "sensor_id": sensor_ids[2]},
+        {"node_id": node_ids[1], "sensor_id": MISSING_ID},
+    ]
+    response = client.post("/nodes/sensors/bulk", json=pairs)
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [
+        "attached", "attached", "attached", "duplicate", "not_found"
+    ]
+    assert results[2]["sensor"]["node_id"] == node_ids[1]
+
+    response = client.get(f"/nodes/{node_ids[0]}/full")
+    assert len(response.json()["sensors"]) == 2
+    response = client.get(f"/sensors/?node_id={node_ids[1]}")
+    assert [s["id"] for s in response.json()] == [sensor_ids[2]]
+
+
+@pytest.mark.integration
+def test_list_nodes_cursor_pagination(client):
+    client.post(
+        "/nodes/bulk",
+        json=[
+            {"serial_number": f"PAGE{i}", "firmware_version": "1.0.0"}
+            for i in range(5)
+        ])
+
+    seen = []
+    response = client.get("/nodes/?limit=2")
+    while True:
+        assert response.status_code == 200
+        seen.extend(n["id"] for n in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get(f"/nodes/?limit=2&cursor={cursor}")
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+    response = client.get("/nodes/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_node_conditional_requests(client):
+    response = client.post(
+        "/nodes", json={
+            "serial_number": "ETAGNODE",
+            "firmware_version": "1.0.0"
+        })
+    node_id = response.json()["id"]
+
+    response = client.get(f"/nodes/{node_id}")
+    etag = response.headers["ETag"]
+    assert etag == '"1"'
+
+    response = client.get(
+        f"/nodes/{node_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # A write with a stale precondition is rejected
+    response = client.patch(
+        f"/nodes/{node_id}",
+        json={"firmware_version": "2.0.0"},
+        headers={"If-Match": '"7"'}
+    )
+    assert response.status_code == 412
+
+    response = client.patch(
+        f"/nodes/{node_id}",
+        json={"firmware_version": "2.0.0"},
+        headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    # The old ETag no longer matches, so the new document is sent
+    response = client.get(
+        f"/nodes/{node_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["firmware_version"] == "2.0.0"
+
+    # Replaying the first conditional write now fails
+    response = client.put(
+        f"/nodes/{node_id}",
+        json={"firmware_version": "3.0.0"},
+        headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+
+
+@pytest.mark.integration
+def test_node_writes_use_returning(client, statements):
+    statements.clear()
+    response = client.post("/nodes/", json={
+        "serial_number": "RETNODE",
+        "firmware_version": "1.0.0"
+    })
+    assert response.status_code == 201
+    assert len(statements) == 1
+    assert statements[0].startswith("INSERT INTO nodes")
+    node_id = response.json()["id"]
+
+    # The unique constraint catches the duplicate serial
+    response = client.post("/nodes/", json={
+        "serial_number": "RETNODE",
+        "firmware_version": "1.0.0"
+    })
+    assert response.status_code == 400
+
+    statements.clear()
+    response = client.patch(
+        f"/nodes/{node_id}", json={"firmware_version": "2.0.0"}
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert len(statements) == 1
+
+    sensor_id = client.post("/sensors/", json={
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "temperature"
+    }).json()["id"]
+    statements.clear()
+    response = client.post(
+        f"/nodes/{node_id}/sensors", json={"sensor_id": sensor_id}
+    )
+    assert response.status_code == 200
+    assert response.json()["node_id"] == node_id
+    assert response.json()["version"] == 2
+    assert len(statements) == 2
+
+    response = client.post(
+        f"/nodes/{node_id}/sensors", json={"sensor_id": MISSING_ID}
+    )
+    assert response.status_code == 404
+    response = client.patch(
+        f"/nodes/{MISSING_ID}", json={"firmware_version": "2.0.0"}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.integration
+def test_node_with_sensors_single_query(client, statements):
+    node_id = client.post(
+        "/nodes", json={
+            "serial_number": "FULLNODE",
+            "firmware_version": "1.0.0"
+        }).json()["id"]
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"FULLSENSOR{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(3)
+        ]).json()
+    for result in sensors:
+        client.post(
+            f"/nodes/{node_id}/sensors",
+            json={"sensor_id": result["sensor"]["id"]}
+        )
+
+    statements.clear()
+    response = client.get(f"/nodes/{node_id}/full")
+    assert response.status_code == 200
+    assert len(statements) == 1
+    data = response.json()
+    assert data["serial_number"] == "FULLNODE"
+    assert sorted(s["id"] for s in data["sensors"]) == sorted(
+        r["sensor"]["id"] for r in sensors
+    )
+    assert all(s["node_id"] == node_id for s in data["sensors"])
+
+    response = client.get("/nodes/123e4567-e89b-12d3-a456-426614174000/full")
+    assert response.status_code == 404
+
+
+@pytest.mark.integration
+def test_nodes_with_sensors_batch(client, statements):
+    nodes = client.post(
+        "/nodes/bulk",
+        json=[
+            {"serial_number": f"BATCHNODE{i}", "firmware_version": "1.0.0"}
+            for i in range(3)
+        ]).json()
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"BATCHSENSOR{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(4)
+        ]).json()
+    node_ids = [n["node"]["id"] for n in nodes]
+    sensor_ids = [s["sensor"]["id"] for s in sensors]
+    client.post(
+        "/nodes/sensors/bulk",
+        json=[
+            {"node_id": node_ids[0], "sensor_id": sensor_ids[0]},
+            {"node_id": node_ids[0], "sensor_id": sensor_ids[1]},
+            {"node_id": node_ids[1], "sensor_id": sensor_ids[2]},
+        ])
+
+    statements.clear()
+    response = client.get("/nodes/full")
+    assert response.status_code == 200
+    assert len(statements) == 2
+    by_id = {n["id"]: n for n in response.json()}
+    assert len(by_id[node_ids[0]]["sensors"]) == 2
+    assert [s["id"] for s in by_id[node_ids[1]]["sensors"]] == [sensor_ids[2]]
+    assert by_id[node_ids[2]]["sensors"] == []
+
+    response = client.get(
+        f"/nodes/full?node_id={node_ids[1]}&node_id={node_ids[2]}"
+    )
+    assert sorted(n["id"] for n in response.json()) == sorted(node_ids[1:])
+
+
+@pytest.mark.integration
+def test_node_sparse_fieldsets(client, statements):
+    node_id = client.post(
+        "/nodes", json={
+            "serial_number": "SPARSENODE",
+            "firmware_version": "2.0.0"
+        }).json()["id"]
+
+    statements.clear()
+    response = client.get("/nodes/?fields=firmware_version")
+    assert response.status_code == 200
+    assert {"id": node_id, "firmware_version": "2.0.0"} in response.json()
+    assert all(list(n) == ["id", "firmware_version"] for n in response.json())
+    assert len(statements) == 1
+    selected = statements[0].split(" FROM ")[0]
+    assert "serial_number" not in selected
+    assert "nodes.version" not in selected
+
+    response = client.get(f"/nodes/{node_id}?fields=serial_number")
+    assert response.status_code == 200
+    assert response.json() == {"id": node_id, "serial_number": "SPARSENODE"}
+    assert response.headers["ETag"] == '"1"'
+
+    response = client.get("/nodes/?fields=sensors")
+    assert response.status_code == 400
@@ -0,0 +1,302 @@
+import pytest
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
+
+from src.persistent_sensor_storage import models
+from src.persistent_sensor_storage.crud import load_latest_values
+from src.persistent_sensor_storage.ingest import INSERT_CHUNK_ROWS
+from src.persistent_sensor_storage.latest import (
+    LatestValues,
+    get_latest_values,
+)
+
+# Readings are dated yesterday (UTC), well inside the retention window
+YESTERDAY = datetime.now(timezone.utc) - timedelta(days=1)
+DAY = f"{YESTERDAY:%Y-%m-%d}"
+NEXT_DAY = f"{YESTERDAY + timedelta(days=1):%Y-%m-%d}"
+
+# Well formed, but never registered
+MISSING_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+
+def _create_sensor(client, serial):
+    response = client.post("/sensors/", json={
+        "serial_number": serial,
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "temperature"
+    })
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _readings(sensor_id, count, start=0):
+    # One reading per minute from midnight
+    return [
+        {
+            "sensor_id": sensor_id,
+            "timestamp": f"{DAY}T{minute // 60:02d}:{minute % 60:02d}Z",
+            "value": float(minute)
+        }
+        for minute in range(start, start + count)
+    ]
+
+
+@pytest.mark.integration
+def test_ingest_readings_for_many_sensors(client, db):
+    first = _create_sensor(client, "READ-1")
+    second = _create_sensor(client, "READ-2")
+
+    response = client.post(
+        "/readings/", json=_readings(first, 3) + _readings(second, 2)
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "received": 5, "written": 5, "duplicates": 0, "rejected": []
+    }
+
+    stored = db.execute(
+        select(models.Reading.sensor_id, func.count())
+        .group_by(models.Reading.sensor_id)
+    ).all()
+    assert dict(stored) == {first: 3, second: 2}
+
+
+@pytest.mark.integration
+def test_ingest_readings_skips_duplicates(client):
+    sensor_id = _create_sensor(client, "READ-DUP")
+    batch = _readings(sensor_id, 3)
+
+    assert client.post("/readings/", json=batch).json()["written"] == 3
+
+    # Retried upload overlapping the first one, with a repeat inside it;
+    # +01:00 names the same instant as the first reading
+    retry = batch + _readings(sensor_id, 2, start=3) + [{
+        "sensor_id": sensor_id,
+        "timestamp": f"{DAY}T01:00:00+01:00",
+        "value": 0.0
+    }]
+    result = client.post("/readings/", json=retry).json()
+    assert result["received"] == 6
+    assert result["written"] == 2
+    assert result["duplicates"] == 4
+
+
+@pytest.mark.integration
+def test_ingest_readings_rejects_unknown_sensors(client):
+    sensor_id = _create_sensor(client, "READ-KNOWN")
+    batch = _readings(sensor_id, 1) + _readings(MISSING_ID, 1)
+
+    result = client.post("/readings/", json=batch).json()
+    assert result["written"] == 1
+    assert result["rejected"] == [{"index": 1, "detail": "Sensor not found"}]
+
+
+@pytest.mark.integration
+def test_ingest_readings_batches_inserts(client, statements):
+    sensor_id = _create_sensor(client, "READ-BULK")
+    count = INSERT_CHUNK_ROWS + 10
+    batch = [
+        {
+            "sensor_id": sensor_id,
+            "timestamp": f"{DAY}T00:00:00.{i:06d}Z",
+            "value": 1.5
+        }
+        for i in range(count)
+    ]
+    statements.clear()
+
+    result = client.post("/readings/", json=batch).json()
+    assert result["written"] == count
+
+    inserts = [s for s in statements if s.startswith("INSERT INTO readings")]
+    assert len(inserts) == 2
+
+
+def _aggregates(client, sensor_id, start, end, resolution):
+    return client.get("/readings/aggregates", params={
+        "sensor_id": sensor_id,
+        "start": start,
+        "end": end,
+        "resolution": resolution
+    })
+
+
+@pytest.mark.integration
+def test_aggregates_match_raw_readings(client):
+    sensor_id = _create_sensor(client, "AGG-1")
+    # Three hours of one reading per minute, values 0..179
+    client.post("/readings/", json=_readings(sensor_id, 180))
+
+    # Edges off the minute grid come from raw readings, the rest from
+    # the rollups
+    response = _aggregates(
+        client, sensor_id,
+        f"{DAY}T00:30:30Z", f"{DAY}T02:10:30Z", "1h"
+    )
+    assert response.status_code == 200
+    buckets = [
+        (b["bucket"], b["count"], b["min"], b["max"], b["mean"])
+        for b in response.json()
+    ]
+    assert buckets == [
+        (f"{DAY}T00:00:00Z", 29, 31.0, 59.0, 45.0),
+        (f"{DAY}T01:00:00Z", 60, 60.0, 119.0, 89.5),
+        (f"{DAY}T02:00:00Z", 11, 120.0, 130.0, 125.0),
+    ]
+
+
+@pytest.mark.integration
+def test_aggregates_served_from_rollups(client, statements):
+    sensor_id = _create_sensor(client, "AGG-2")
+    client.post("/readings/", json=_readings(sensor_id, 120))
+    # A retried upload must not be counted twice
+    client.post("/readings/", json=_readings(sensor_id, 120))
+    statements.clear()
+
+    response = _aggregates(
+        client, sensor_id,
+        f"{DAY}T00:00:00Z", f"{NEXT_DAY}T00:00:00Z", "1d"
+    )
+    assert response.json() == [{
+        "sensor_id": sensor_id,
+        "bucket": f"{DAY}T00:00:00Z",
+        "count": 120,
+        "min": 0.0,
+        "max": 119.0,
+        "mean": 59.5
+    }]
+    assert not any("FROM readings" in s for s in statements)
+
+
+@pytest.mark.integration
+def test_aggregates_validate_range(client):
+    response = _aggregates(
+        client, MISSING_ID, f"{DAY}T00:00:00Z", f"{DAY}T01:00:00Z", "2x"
+    )
+    assert response.status_code == 400
+    response = _aggregates(
+        client, MISSING_ID, f"{DAY}T01:00:00Z", f"{DAY}T00:00:00Z", "1h"
+    )
+    assert response.status_code == 400
+
+
+def _create_node_with_sensors(client, serial, sensor_count):
+    node_id = client.post("/nodes/", json={
+        "serial_number": serial,
+        "firmware_version": "1.0.0"
+    }).json()["id"]
+    sensor_ids = [
+        _create_sensor(client, f"{serial}-S{i}") for i in range(sensor_count)
+    ]
+    for sensor_id in sensor_ids:
+        client.post(f"/nodes/{node_id}/sensors", json={"sensor_id": sensor_id})
+    return node_id, sensor_ids
+
+
+@pytest.mark.integration
+def test_node_latest_served_from_memory(client, statements, monkeypatch):
+    # As in a single worker, which never refreshes from the database
+    monkeypatch.setattr(get_latest_values(), "refresh_seconds", 0)
+    node_id, (first, second) = _create_node_with_sensors(client, "LKV", 2)
+    client.post("/readings/", json=_readings(first, 10))
+    # A late upload of older readings does not replace the latest one
+    client.post("/readings/", json=_readings(first, 5))
+    statements.clear()
+
+    response = client.get(f"/nodes/{node_id}/latest")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "sensor_id": first,
+            "timestamp": f"{DAY}T00:09:00Z",
+            "value": 9.0
+        },
+        {"sensor_id": second, "timestamp": None, "value": None},
+    ]
+    assert statements == []
+
+
+@pytest.mark.integration
+def test_nodes_latest_bulk(client):
+    node_a, (sensor_a,) = _create_node_with_sensors(client, "LKV-A", 1)
+    node_b, (sensor_b,) = _create_node_with_sensors(client, "LKV-B", 1)
+    bare = client.post("/nodes/", json={
+        "serial_number": "LKV-BARE",
+        "firmware_version": "1.0.0"
+    }).json()["id"]
+    client.post(
+        "/readings/",
+        json=_readings(sensor_a, 2) + _readings(sensor_b, 3)
+    )
+
+    response = client.get("/nodes/latest", params={
+        "node_id": [node_b, MISSING_ID, node_a, bare]
+    })
+    assert response.status_code == 200
+    assert [
+        (n["node_id"], [r["value"] for r in n["readings"]])
+        for n in response.json()
+    ] == [(node_b, [2.0]), (node_a, [1.0]), (bare, [])]
+
+    assert client.get(f"/nodes/{MISSING_ID}/latest").status_code == 404
+    assert client.get(f"/nodes/{bare}/latest").json() == []
+
+
+@pytest.mark.integration
+def test_latest_values_refresh_from_database(client, db, monkeypatch):
+    monkeypatch.setattr(get_latest_values(), "refresh_seconds", 0)
+    node_id, (sensor_id,) = _create_node_with_sensors(client, "LKV-S", 1)
+    client.post("/readings/", json=_readings(sensor_id, 2))
+    # Written by another worker, which this one's store does not see
+    db.execute(insert(models.Reading).values(
+        sensor_id=sensor_id,
+        timestamp=YESTERDAY.replace(hour=23, minute=0),
+        value=99.0
+    ))
+    db.commit()
+    assert client.get(f"/nodes/{node_id}/latest").json()[0]["value"] == 1.0
+
+    monkeypatch.setattr(get_latest_values(), "refresh_seconds", 1e-9)
+    assert client.get(f"/nodes/{node_id}/latest").json()[0]["value"] == 99.0
+
+
+
+def test_latest_values_refresh_is_atomic():
+    seen = []
+    readers = []
+
+    class Store(LatestValues):
+        def attach(self, pairs):
+            # A reader arrives after the node's old entry was dropped
+            reader = threading.Thread(
+                target=lambda: seen.append(self.for_nodes(["node"]))
+            )
+            reader.start()
+            reader.join(0.1)
+            readers.append(reader)
+            super().attach(pairs)
+
+    store = Store(refresh_seconds=0)
+    pairs = [("node", "sensor")]
+    readings = [("sensor", datetime.now(timezone.utc), 1.0)]
+    store.refresh(["node"], pairs, readings)
+    store.refresh(["node"], pairs, readings)
+    for reader in readers:
+        reader.join()
+    # The second reader waited for the refresh instead of finding the
+    # node without sensors
+    assert seen[1]["node"][0][2] == 1.0
+
+@pytest.mark.integration
+def test_latest_values_rebuild_from_database(client, db):
+    node_id, (sensor_id,) = _create_node_with_sensors(client, "LKV-R", 1)
+    client.post("/readings/", json=_readings(sensor_id, 30))
+    before = client.get(f"/nodes/{node_id}/latest").json()
+
+    get_latest_values().clear()
+    load_latest_values(db)
+
+    assert client.get(f"/nodes/{node_id}/latest").json() == before
+    assert before[0]["value"] == 29.0
@@ -0,0 +1,141 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.persistent_sensor_storage import cache, crud, database, main
+from src.persistent_sensor_storage import replicas, schemas
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch, db):
+    # A second SQLite file stands in for a replica that has not caught up
+    engine = database.build_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "_replica_engines", [engine])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def replica_client(replica, monkeypatch):
+    monkeypatch.setattr(main, "DATABASE_REPLICA_URLS", ["replica"])
+    with TestClient(main.create_app()) as client:
+        yield client
+
+
+@pytest.mark.integration
+def test_reads_go_to_replica_and_writers_read_primary(
+    replica, replica_client
+):
+    with database.SessionLocal(bind=replica) as session:
+        on_replica = crud.create_node(
+            session, schemas.NodeCreate(firmware_version="replica")
+        )
+
+    response = replica_client.post(
+        "/nodes/", json={"firmware_version": "primary"}
+    )
+    assert response.status_code == 201
+    assert replicas.PIN_COOKIE in response.headers["set-cookie"]
+
+    # Pinned by the write, so the new node is visible
+    listed = replica_client.get("/nodes/").json()
+    assert [node["firmware_version"] for node in listed] == ["primary"]
+
+    # Without the pin, reads come from the replica
+    replica_client.cookies.clear()
+    listed = replica_client.get("/nodes/").json()
+    assert [node["id"] for node in listed] == [on_replica["id"]]
+    response = replica_client.get(f"/nodes/{on_replica['id']}/full")
+    assert response.status_code == 200
+
+    # Failed writes do not pin
+    response = replica_client.post("/nodes/", json={})
+    assert response.status_code == 422
+    assert "set-cookie" not in response.headers
+
+
+@pytest.mark.integration
+def test_writer_reads_own_write_after_replica_read(replica, replica_client):
+    node = replica_client.post(
+        "/nodes/", json={"firmware_version": "v1"}
+    ).json()
+    # The replica has the node, but lags behind the update below
+    with database.SessionLocal(bind=replica) as session:
+        crud.create_node(
+            session,
+            schemas.NodeCreate(id=node["id"], firmware_version="v1")
+        )
+    response = replica_client.put(
+        f"/nodes/{node['id']}", json={"firmware_version": "v2"}
+    )
+    assert response.status_code == 200
+    pin = replica_client.cookies[replicas.PIN_COOKIE]
+
+    # Another client reads the stale node from the replica
+    replica_client.cookies.clear()
+    response = replica_client.get(f"/nodes/{node['id']}")
+    assert response.json()["firmware_version"] == "v1"
+
+    # which does not put it in the cache the writer reads through
+    replica_client.cookies.set(replicas.PIN_COOKIE, pin)
+    response = replica_client.get(
+        f"/nodes/{node['id']}", headers={"If-None-Match": '"1"'}
+    )
+    assert response.status_code == 200
+    assert response.json()["firmware_version"] == "v2"
+    assert response.json()["version"] == 2
+
+
+@pytest.mark.integration
+def test_async_reads_go_to_replica(tmp_path, monkeypatch, replica):
+    pytest.importorskip("aiosqlite")
+    engine = database.build_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    )
+    monkeypatch.setattr(database, "_async_replica_engines", [engine])
+    monkeypatch.setattr(main, "DB_ASYNC", True)
+    monkeypatch.setattr(main, "DATABASE_REPLICA_URLS", ["replica"])
+    with database.SessionLocal(bind=replica) as session:
+        on_replica = crud.create_node(
+            session, schemas.NodeCreate(firmware_version="replica")
+        )
+
+    with TestClient(main.create_app()) as client:
+        response = client.post("/nodes/", json={"firmware_version": "primary"})
+        assert response.status_code == 201
+        listed = client.get("/nodes/").json()
+        assert [node["firmware_version"] for node in listed] == ["primary"]
+
+        client.cookies.clear()
+        listed = client.get("/nodes/").json()
+        assert [node["id"] for node in listed] == [on_replica["id"]]
+        response = client.get(f"/nodes/{on_replica['id']}")
+        assert response.json()["firmware_version"] == "replica"
+    assert cache.peek(cache.node_key(on_replica["id"])) is None
+
+
+def test_replica_policies(tmp_path, monkeypatch):
+    engines = [
+        database.build_engine(f"sqlite:///{tmp_path / name}")
+        for name in ("a.db", "b.db")
+    ]
+    monkeypatch.setattr(database, "_replica_engines", engines)
+    try:
+        picks = [replicas.pick_replica("round_robin") for _ in range(4)]
+        assert picks.count(engines[0]) == picks.count(engines[1]) == 2
+
+        with engines[0].connect():
+            picks = [replicas.pick_replica("least_loaded") for _ in range(4)]
+        assert picks == [engines[1]] * 4
+    finally:
+        for engine in engines:
+            engine.dispose()
+
+
+def test_pin_expires():
+    assert replicas.pinned_to_primary({}) is False
+    assert replicas.pinned_to_primary({replicas.PIN_COOKIE: "junk"}) is False
+    cookie = replicas.pin_cookie().decode().split(";")[0]
+    name, until = cookie.split("=")
+    assert replicas.pinned_to_primary({name: until}) is True
+    assert replicas.pinned_to_primary({name: "1.0"}) is False
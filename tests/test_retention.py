@@ -0,0 +1,147 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+
+from src.persistent_sensor_storage import models
+from src.persistent_sensor_storage.database import get_engine
+from src.persistent_sensor_storage.ingest import write_readings
+from src.persistent_sensor_storage.partitions import partition_bounds
+from src.persistent_sensor_storage.rollups import DAY, HOUR, MINUTE
+from src.persistent_sensor_storage.retention import RetentionJob, run_retention
+
+NOW = datetime.now(timezone.utc)
+
+
+def _day(days_ago):
+    return (NOW - timedelta(days=days_ago)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def test_partition_bounds():
+    day = datetime(2026, 1, 10, tzinfo=timezone.utc)
+    assert partition_bounds(day, [], 1) == (day, day + timedelta(days=1))
+    # Weekly partitions narrowed to fit between existing ones
+    existing = [
+        (datetime(2026, 1, 7, tzinfo=timezone.utc),
+         datetime(2026, 1, 9, tzinfo=timezone.utc)),
+        (datetime(2026, 1, 12, tzinfo=timezone.utc),
+         datetime(2026, 1, 13, tzinfo=timezone.utc)),
+    ]
+    assert partition_bounds(day, existing, 7) == (
+        datetime(2026, 1, 9, tzinfo=timezone.utc),
+        datetime(2026, 1, 12, tzinfo=timezone.utc),
+    )
+    assert partition_bounds(existing[0][0], existing, 7) is None
+
+
+def test_one_retention_job_leads(tmp_path):
+    pytest.importorskip("fcntl")
+    lock_path = str(tmp_path / "retention.lock")
+    first = RetentionJob(None, lock_path=lock_path)
+    second = RetentionJob(None, lock_path=lock_path)
+    assert first.leads()
+    assert first.leads()
+    assert not second.leads()
+    # The job moves on once its process lets go of the lock
+    first.stop()
+    assert second.leads()
+    second.stop()
+
+
+@pytest.mark.integration
+def test_ingest_rejects_expired_readings(client):
+    sensor_id = client.post("/sensors/", json={
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "temperature"
+    }).json()["id"]
+
+    result = client.post("/readings/", json=[
+        {
+            "sensor_id": sensor_id,
+            "timestamp": _day(400).isoformat(),
+            "value": 1.0
+        },
+        {"sensor_id": sensor_id, "timestamp": NOW.isoformat(), "value": 2.0},
+    ]).json()
+    assert result["written"] == 1
+    assert result["rejected"] == [{
+        "index": 0,
+        "detail": "Reading is older than the retention window"
+    }]
+
+
+@pytest.mark.integration
+def test_ingest_rejects_future_readings(client, db):
+    sensor_id = client.post("/sensors/", json={
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "temperature"
+    }).json()["id"]
+
+    # A device clock years ahead, and one a minute ahead
+    result = client.post("/readings/", json=[
+        {
+            "sensor_id": sensor_id,
+            "timestamp": (NOW + timedelta(days=3650)).isoformat(),
+            "value": 1.0
+        },
+        {
+            "sensor_id": sensor_id,
+            "timestamp": (NOW + timedelta(minutes=1)).isoformat(),
+            "value": 2.0
+        },
+    ]).json()
+    assert result["written"] == 1
+    assert result["rejected"] == [{
+        "index": 0,
+        "detail": "Reading is dated in the future"
+    }]
+    assert db.scalar(select(func.max(models.Reading.value))) == 2.0
+
+
+@pytest.mark.integration
+def test_retention_downsamples_then_drops_readings(client, db):
+    sensor_id = client.post("/sensors/", json={
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "temperature"
+    }).json()["id"]
+    # Written without rollups, as before rollups existed
+    old, expired, recent = _day(100), _day(40), _day(1)
+    write_readings(db.connection(), [
+        (sensor_id, day + timedelta(minutes=minute), float(minute))
+        for day in (old, expired, recent)
+        for minute in range(3)
+    ])
+    db.commit()
+
+    assert run_retention(get_engine(), NOW) > 0
+
+    remaining = db.execute(select(models.Reading.timestamp)).scalars().all()
+    assert len(remaining) == 3
+    rollups = db.execute(
+        select(
+            models.ReadingRollup.resolution,
+            models.ReadingRollup.bucket,
+            models.ReadingRollup.count,
+            models.ReadingRollup.total
+        ).order_by(
+            models.ReadingRollup.bucket, models.ReadingRollup.resolution
+        )
+    ).all()
+    by_day = [
+        (resolution, count, total)
+        for resolution, bucket, count, total in rollups
+        if bucket.replace(tzinfo=timezone.utc) == old
+    ]
+    # Minute rollups are kept for 90 days, hours and days for longer
+    assert by_day == [(HOUR, 3, 3.0), (DAY, 3, 3.0)]
+    assert db.execute(
+        select(func.count()).where(
+            models.ReadingRollup.resolution == MINUTE,
+            models.ReadingRollup.bucket >= expired,
+            models.ReadingRollup.bucket < expired + timedelta(days=1)
+        )
+    ).scalar() == 3
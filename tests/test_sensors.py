@@ -166,11 +166,47 @@ def test_sensor_update_optional_fields(client):
     assert data["modality"] == "temperature"  # Unchanged
 
 
+@pytest.mark.integration
+def test_sensor_update_constraint_violations(client):
+    sensors = []
+    for serial in ("SENSOR005", "SENSOR006"):
+        response = client.post(
+            "/sensors",
+            json={
+                "serial_number": serial,
+                "manufacturer": "Test Mfg",
+                "model": "TestModel",
+                "modality": "temperature"
+            })
+        assert response.status_code == 201
+        sensors.append(response.json())
+    sensor = sensors[1]
+
+    # Taking another sensor's serial number is rejected, not a 500
+    response = client.put(
+        f"/sensors/{sensor['id']}",
+        json={"serial_number": "SENSOR005"}
+    )
+    assert response.status_code == 400
+
+    # The manufacturer is required
+    response = client.patch(
+        f"/sensors/{sensor['id']}",
+        json={"manufacturer": None}
+    )
+    assert response.status_code == 400
+
+    # Nothing was written and the session is usable again
+    response = client.get(f"/sensors/{sensor['id']}")
+    assert response.status_code == 200
+    assert response.json() == sensor
+
+
 @pytest.mark.integration
 def test_sensor_id_format(client):
     # Test invalid sensor ID format
-    # response = client.get("/sensors/invalid-id")
-    # assert response.status_code == 422  # Validation error
+    response = client.get("/sensors/invalid-id")
+    assert response.status_code == 422  # Validation error
 
     # Test non-existent but valid format sensor ID
     response = client.get("/sensors/123e4567-e89b-12d3-a456-426614174000")
@@ -219,3 +255,204 @@ def test_sensor_node_relationship(client):
     assert sensor_response.status_code == 200
     sensor_data = sensor_response.json()
     assert sensor_data["node_id"] == node_id
+
+
+@pytest.mark.integration
+def test_bulk_create_sensors(client):
+    # Register one sensor up front so the batch hits a stored duplicate
+    response = client.post(
+        "/sensors",
+        json={
+            "serial_number": "BULK000",
+            "manufacturer": "Test Mfg",
+            "model": "TempSensor",
+            "modality": "temperature"
+        })
+    assert response.status_code == 201
+
+    batch = [
+        {
+            "serial_number": f"BULK{i:03d}",
+            "manufacturer": "Test Mfg",
+            "model": "TempSensor",
+            "modality": "temperature"
+        }
+        for i in range(5)
+    ]
+    # Repeat a serial inside the batch and add an item with no serial
+    batch.append(dict(batch[1]))
+    batch.append({
+        "manufacturer": "Test Mfg",
+        "model": "TempSensor",
+        "modality": "humidity"
+    })
+
+    response = client.post("/sensors/bulk", json=batch)
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["index"] for r in results] == list(range(len(batch)))
+    assert [r["status"] for r in results] == [
+        "duplicate", "created", "created", "created", "created",
+        "duplicate", "created"
+    ]
+    created = [r["sensor"] for r in results if r["status"] == "created"]
+    assert all(isinstance(s["id"], str) for s in created)
+
+    # Every created sensor is retrievable afterwards
+    response = client.get("/sensors/?manufacturer=Test Mfg")
+    assert response.status_code == 200
+    assert len(response.json()) == 6
+
+
+@pytest.mark.integration
+def test_bulk_create_sensors_invalid_item(client):
+    response = client.post(
+        "/sensors/bulk",
+        json=[{
+            "serial_number": "BULKBAD",
+            "manufacturer": "",
+            "model": "TempSensor",
+            "modality": "temperature"
+        }])
+    assert response.status_code == 200
+    result = response.json()[0]
+    assert result["status"] == "invalid"
+    assert result["sensor"] is None
+
+
+@pytest.mark.integration
+def test_list_sensors_cursor_pagination(client):
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"PAGE{i}",
+                "manufacturer": "Test Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(4)
+        ]).json()
+    nodes = client.post(
+        "/nodes/bulk",
+        json=[
+            {"serial_number": f"PAGENODE{i}", "firmware_version": "1.0.0"}
+            for i in range(2)
+        ]).json()
+    # One sensor on two nodes shows up once per node
+    shared = sensors[0]["sensor"]["id"]
+    client.post(
+        "/nodes/sensors/bulk",
+        json=[
+            {"node_id": n["node"]["id"], "sensor_id": shared}
+            for n in nodes
+        ])
+
+    seen = []
+    response = client.get("/sensors/?limit=2")
+    while True:
+        assert response.status_code == 200
+        seen.extend((s["id"], s["node_id"]) for s in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get(f"/sensors/?limit=2&cursor={cursor}")
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+    assert [s for s, _ in seen].count(shared) == 2
+
+
+@pytest.mark.integration
+def test_sensor_etag_changes_on_attach(client):
+    node_id = client.post(
+        "/nodes",
+        json={
+            "serial_number": "ETAGNODE2",
+            "firmware_version": "1.0.0"
+        }).json()["id"]
+    sensor_id = client.post(
+        "/sensors",
+        json={
+            "serial_number": "ETAGSENSOR",
+            "manufacturer": "Test Mfg",
+            "model": "TestModel",
+            "modality": "temperature"
+        }).json()["id"]
+
+    etag = client.get(f"/sensors/{sensor_id}").headers["ETag"]
+    response = client.get(
+        f"/sensors/{sensor_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    client.post(f"/nodes/{node_id}/sensors", json={"sensor_id": sensor_id})
+    response = client.get(
+        f"/sensors/{sensor_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["node_id"] == node_id
+    assert response.headers["ETag"] != etag
+
+    response = client.patch(
+        f"/sensors/{sensor_id}",
+        json={"model": "Other"},
+        headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+
+
+@pytest.mark.integration
+def test_sensor_sparse_fieldsets(client, statements):
+    sensors = client.post(
+        "/sensors/bulk",
+        json=[
+            {
+                "serial_number": f"SPARSE{i}",
+                "manufacturer": "Sparse Mfg",
+                "model": "TempSensor",
+                "modality": "temperature"
+            }
+            for i in range(3)
+        ]).json()
+    node_id = client.post(
+        "/nodes", json={
+            "serial_number": "SPARSENODE",
+            "firmware_version": "1.0.0"
+        }).json()["id"]
+    sensor_id = sensors[0]["sensor"]["id"]
+    client.post(f"/nodes/{node_id}/sensors", json={"sensor_id": sensor_id})
+
+    statements.clear()
+    response = client.get(
+        "/sensors/?manufacturer=Sparse%20Mfg&fields=serial_number&limit=2"
+    )
+    assert response.status_code == 200
+    page = response.json()
+    # The keyset is always returned, and is enough to page on
+    assert [list(s) for s in page] == [["id", "node_id", "serial_number"]] * 2
+    assert len(statements) == 1
+    selected = statements[0].split(" FROM ")[0]
+    assert "serial_number" in selected
+    assert "modality" not in selected and "version" not in selected
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(
+        "/sensors/?manufacturer=Sparse%20Mfg&fields=serial_number"
+        f"&cursor={cursor}"
+    )
+    assert len(page + response.json()) == 3
+
+    response = client.get(f"/sensors/{sensor_id}?fields=model,version")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": sensor_id,
+        "node_id": node_id,
+        "model": "TempSensor",
+        "version": 2,
+    }
+    assert response.headers["ETag"] == '"2"'
+
+    for path in ("/sensors/", f"/sensors/{sensor_id}"):
+        response = client.get(f"{path}?fields=model,colour")
+        assert response.status_code == 400
+        assert "colour" in response.json()["detail"]
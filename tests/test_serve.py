@@ -0,0 +1,139 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("gunicorn")
+pytest.importorskip("uvicorn_worker")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_server_options():
+    from src.persistent_sensor_storage import serve
+
+    options = serve.server_options()
+    assert options["workers"] >= 1
+    assert options["worker_class"].endswith(".Worker")
+    assert options["post_fork"] is serve.post_fork
+    assert options["child_exit"] is serve.child_exit
+    assert serve.Worker.CONFIG_KWARGS["lifespan"] == "on"
+    assert (
+        serve.Worker.CONFIG_KWARGS["timeout_graceful_shutdown"]
+        < options["graceful_timeout"]
+    )
+
+
+def test_one_worker_until_state_is_shared(monkeypatch):
+    from src.persistent_sensor_storage import serve
+
+    monkeypatch.setattr(serve, "WEB_WORKERS", 0)
+    monkeypatch.setattr(serve, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(serve, "METRICS_DIR", None)
+    assert serve.worker_count() == 1
+
+    monkeypatch.setattr(serve, "WEB_WORKERS", 2)
+    with pytest.raises(ValueError, match="CACHE_BACKEND"):
+        serve.server_options()
+
+    monkeypatch.setattr(serve, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(serve, "METRICS_DIR", "/tmp/metrics")
+    assert serve.server_options()["workers"] == 2
+
+
+def test_latest_refresh_only_with_several_workers(monkeypatch):
+    from src.persistent_sensor_storage import serve
+
+    monkeypatch.setattr(serve, "LATEST_REFRESH_SECONDS", 0.0)
+    assert serve.latest_refresh_seconds(1) == 0
+    assert serve.latest_refresh_seconds(4) == (
+        serve.WORKER_LATEST_REFRESH_SECONDS
+    )
+    monkeypatch.setattr(serve, "LATEST_REFRESH_SECONDS", 30.0)
+    assert serve.latest_refresh_seconds(1) == 30.0
+    assert serve.latest_refresh_seconds(4) == 30.0
+
+
+def metric_value(text, sample):
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.integration
+def test_serve_workers_and_drain_on_sigterm(tmp_path):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.persistent_sensor_storage.serve"],
+        cwd=ROOT,
+        env=dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{tmp_path / 'serve.db'}",
+            WEB_HOST="127.0.0.1",
+            WEB_PORT=str(port),
+            WEB_WORKERS="2",
+            CACHE_BACKEND="none",
+            METRICS_DIR=str(tmp_path / "metrics"),
+            METRICS_WRITE_SECONDS="0.1",
+            RETENTION_LOCK_FILE=str(tmp_path / "retention.lock"),
+        ),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/health", timeout=1
+                ) as response:
+                    assert response.status == 200
+                    break
+            except OSError:
+                assert server.poll() is None, server.stderr.read()
+                assert time.monotonic() < deadline
+                time.sleep(0.1)
+
+        # Whichever worker answers, /metrics counts the requests of both
+        for _ in range(20):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health").close()
+        sample = (
+            'http_requests_total{method="GET",route="/health",status="200"}'
+        )
+        deadline = time.monotonic() + 30
+        while True:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{port}/metrics"
+            ) as response:
+                counted = metric_value(response.read().decode(), sample)
+            if counted == 21:
+                break
+            assert counted < 21 and time.monotonic() < deadline
+            time.sleep(0.1)
+
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+        log = server.stderr.read()
+        assert log.count("Booting worker") == 2
+        # Every worker that finished starting up also shut down cleanly
+        started = log.count("Application startup complete")
+        assert started >= 1
+        assert log.count("Application shutdown complete") == started
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from src.persistent_sensor_storage import cache
+from src.persistent_sensor_storage.database import get_engine
+from src.persistent_sensor_storage.singleflight import (
+    AsyncSingleFlight,
+    SingleFlight,
+    coalesce,
+)
+
+
+def test_concurrent_calls_share_one_load():
+    flight = SingleFlight()
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": len(calls)}
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: flight.do("key", load), range(8)))
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+    # Nothing is kept once the load is done
+    assert flight.do("key", load) == {"value": 2}
+
+
+def test_concurrent_calls_share_errors_and_keys_stay_apart():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(3) as pool:
+        leader = pool.submit(flight.do, "bad", fail)
+        started.wait()
+        follower = pool.submit(flight.do, "bad", lambda: "not shared")
+        other = pool.submit(flight.do, "good", lambda: "separate")
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+        assert other.result() == "separate"
+
+
+def test_reads_after_a_write_do_not_join_earlier_flights():
+    release = threading.Event()
+    calls = []
+
+    class Session:
+        def get_bind(self):
+            return "primary"
+
+    @coalesce
+    def read(db, node_id):
+        calls.append(node_id)
+        release.wait(5)
+        return len(calls)
+
+    with ThreadPoolExecutor(2) as pool:
+        before = pool.submit(read, Session(), "node")
+        while not calls:
+            time.sleep(0.01)
+        # A write commits while the first read is still in flight
+        cache.invalidate(cache.node_key("node"))
+        after = pool.submit(read, Session(), "node")
+        deadline = time.monotonic() + 5
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        assert before.result() == 2
+        assert after.result() == 2
+    assert len(calls) == 2
+
+
+def test_async_concurrent_calls_share_one_load():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ["row"]
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("key", load) for _ in range(8))
+        )
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_async_followers_survive_a_cancelled_leader():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == 2
+
+
+@pytest.mark.integration
+def test_identical_sensor_reads_share_a_query(client, statements):
+    node_id = client.post(
+        "/nodes/", json={"firmware_version": "1.0.0"}
+    ).json()["id"]
+
+    # Slow queries down, so that the requests overlap
+    def slow(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(0.2)
+
+    barrier = threading.Barrier(4)
+
+    def request(_):
+        barrier.wait()
+        return client.get("/sensors/", params={"node_id": node_id})
+
+    statements.clear()
+    event.listen(get_engine(), "before_cursor_execute", slow)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(pool.map(request, range(4)))
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", slow)
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len(statements) == 1